@@ -4,18 +4,21 @@ import pandas as pd
 import uvicorn
 import os
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta # Necessário para a simulação de KPIs
+from src.data.schema import apply_final_schema
+from src.data.rollup_cube import ROLLUP_CUBE_PATH, CATEGORY_LEVELS, TIME_GRAINS, read_rollup
 
 # --- Configurações de Caminho ---
 # Assume que a API está sendo executada a partir da raiz do projeto (python -m src.api.main)
 DATA_PATH = os.path.join('data', 'processed', 'powerbi_dataset_final.parquet')
 METRICS_PATH = os.path.join('data', 'processed', 'model_metrics_optimized.csv')
+TTR_KPIS_PATH = os.path.join('data', 'processed', 'ttr_kpis.csv') # P50/P90 de TTR (sketches do transform)
 
 # --- Carregamento de Dados ---
 # Tenta carregar os dados uma única vez na inicialização
 try:
-    df_final = pd.read_parquet(DATA_PATH)
+    df_final = apply_final_schema(pd.read_parquet(DATA_PATH)) # Schema compacto (menos RAM por worker)
     df_metrics = pd.read_csv(METRICS_PATH)
     print(f"✅ API: Dados carregados com sucesso de {DATA_PATH}")
 
@@ -33,6 +36,19 @@ except Exception as e:
     print(f"🚨 ERRO API CRÍTICO: Falha ao carregar ou processar dados: {e}")
     df_final = pd.DataFrame()
 
+# KPIs de TTR P50/P90 (opcional: gerado pelo src.data.transform a partir dos sketches de quantis)
+try:
+    df_ttr_kpis = pd.read_csv(TTR_KPIS_PATH)
+except FileNotFoundError:
+    df_ttr_kpis = pd.DataFrame()
+
+# Cubo de agregados (opcional: gerado pelo src.data.transform); uma célula por nível/granularidade
+try:
+    rollup_cube = {(level, grain): read_rollup(level, grain, ROLLUP_CUBE_PATH)
+                   for level in CATEGORY_LEVELS for grain in TIME_GRAINS}
+except FileNotFoundError:
+    rollup_cube = {}
+
 
 # --- Inicialização da Aplicação FastAPI ---
 app = FastAPI(
@@ -125,7 +141,7 @@ def get_kpis():
     """
     Retorna os KPIs oficiais do TCC: MAPE, TTR e SLA (RF09).
     """
-    return {
+    kpis = {
         "KPI03_SLA_COMPLIANCE": {
             "value": f"{SLA_COMPLIANCE:.2f}%",
             "description": "Taxa de chamados resolvidos dentro do SLA."
@@ -140,6 +156,43 @@ def get_kpis():
         }
     }
 
+    if not df_ttr_kpis.empty:
+        ttr_global = df_ttr_kpis[df_ttr_kpis['normalized_category'] == 'GLOBAL'].iloc[0]
+        kpis["KPI02_TTR_P50_P90"] = {
+            "value": f"{ttr_global['ttr_p50_hours']:.2f} / {ttr_global['ttr_p90_hours']:.2f} horas",
+            "description": "Mediana (P50) e P90 do TTR dos chamados resolvidos.",
+            "by_category": df_ttr_kpis[df_ttr_kpis['normalized_category'] != 'GLOBAL'].to_dict(orient='records')
+        }
+    return kpis
+
+@app.get("/rollup", tags=["KPIs"], response_class=JSONResponse)
+def get_rollup(level: str = 'family', grain: str = 'week', category: Optional[str] = None,
+               entities_id: Optional[int] = None):
+    """
+    Volume e TTR médio pré-agregados por categoria (level=leaf) ou família (level=family),
+    entidade e período (grain=day|week|month), direto do cubo do ETL.
+    """
+    if not rollup_cube:
+        raise HTTPException(status_code=503, detail="Cubo de agregados indisponível.")
+    if (level, grain) not in rollup_cube:
+        raise HTTPException(status_code=400, detail=f"Use level em {CATEGORY_LEVELS} e grain em {TIME_GRAINS}.")
+
+    df = rollup_cube[(level, grain)]
+    if category is not None:
+        df = df[df['category'] == category]
+    if entities_id is not None:
+        df = df[df['entities_id'] == entities_id]
+
+    df_output = df[['period_start', 'category', 'entities_id', 'volume', 'avg_ttr_hours']].copy()
+    df_output['period_start'] = df_output['period_start'].dt.strftime('%Y-%m-%d')
+    df_output['category'] = df_output['category'].astype(str)
+    df_output['avg_ttr_hours'] = df_output['avg_ttr_hours'].astype('float64').round(2)
+    data = df_output.to_dict(orient='records')
+    return {
+        "metadata": {"level": level, "grain": grain, "count": len(data)},
+        "data": data
+    }
+
 # --- Execução Local (Para testes) ---
 if __name__ == '__main__':
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,231 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional
+import duckdb
+import numpy as np
+import pandas as pd
+from src.data.quantile_sketch import TDigest, digest_from_counts
+from src.data.raw_store import RAW_STORE_PATH
+from src.data.transform import (
+    TRANSFORM_COLUMNS, TTR_GLOBAL_KEY, build_category_trie, resolve_category_path,
+    finalize_daily_fact, process_data,
+)
+
+# Backend DuckDB do ETL (RF02): limpeza, deduplicação por id (RN03), fallback do TTR (KPI02),
+# taxonomia (RN01) e agregação diária executados como SQL direto sobre o dataset bruto em
+# Parquet, com paralelismo e agregação fora da memória (spill em disco) do próprio DuckDB.
+# As regras que não são SQL (resolução da taxonomia na trie, mediana pelo sketch e calendário)
+# reaproveitam as mesmas funções do caminho pandas.
+
+# Limites opcionais do DuckDB (ex.: DUCKDB_MEMORY_LIMIT=4GB, DUCKDB_THREADS=8)
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT")
+DUCKDB_THREADS = os.getenv("DUCKDB_THREADS")
+DUCKDB_TEMP_DIRECTORY = os.getenv("DUCKDB_TEMP_DIRECTORY", 'data/tmp/duckdb')
+
+# Mesma regra do compute_ttr_hours: time_to_resolve (segundos) quando > 0, senão hours_to_solve
+TTR_HOURS_EXPR = """
+    CASE WHEN time_to_resolve IS NOT NULL AND time_to_resolve > 0
+         THEN time_to_resolve / 3600.0
+         ELSE CAST(hours_to_solve AS DOUBLE) END"""
+
+def connect(memory_limit: Optional[str] = DUCKDB_MEMORY_LIMIT, threads: Optional[str] = DUCKDB_THREADS) -> duckdb.DuckDBPyConnection:
+    """Conexão em memória com spill em disco habilitado (agregações maiores que a RAM)."""
+    con = duckdb.connect()
+    os.makedirs(DUCKDB_TEMP_DIRECTORY, exist_ok=True)
+    con.execute(f"SET temp_directory = '{DUCKDB_TEMP_DIRECTORY}'")
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    return con
+
+def _window_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> str:
+    """Filtro da janela em opened_at + year/month (poda das partições hive)."""
+    conditions = ["opened_at IS NOT NULL"]
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        conditions.append(f"(year > {start.year} OR (year = {start.year} AND month >= {start.month}))")
+        conditions.append(f"opened_at >= TIMESTAMP '{start:%Y-%m-%d %H:%M:%S}'")
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        conditions.append(f"(year < {end.year} OR (year = {end.year} AND month <= {end.month}))")
+        conditions.append(f"opened_at < TIMESTAMP '{end:%Y-%m-%d %H:%M:%S}'")
+    return " AND ".join(conditions)
+
+def _load_tickets(con: duckdb.DuckDBPyConnection, raw_path: str,
+                  start_date: Optional[datetime], end_date: Optional[datetime]) -> None:
+    """Tabela temporária 'tickets' (nível do ticket, já deduplicada e com ttr_hours)."""
+    if not os.path.isdir(raw_path):
+        raise FileNotFoundError(raw_path)
+    source = os.path.join(raw_path, '**', '*.parquet').replace("'", "''")
+    columns = ', '.join(c for c in TRANSFORM_COLUMNS)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE tickets AS
+        SELECT
+            id,
+            date_trunc('day', opened_at) AS date,
+            CAST(category_path AS VARCHAR) AS category_path,
+            entities_id,
+            {TTR_HOURS_EXPR} AS ttr_hours,
+            filename,
+            file_row_number
+        FROM read_parquet('{source}', hive_partitioning = true, filename = true, file_row_number = true)
+        WHERE {_window_filter(start_date, end_date)}
+    """)
+
+    # Remove duplicatas por id (RN03), mantendo a primeira ocorrência na ordem dos arquivos.
+    # O dataset bruto já é único por id (upsert), então a janela só roda se houver repetidos.
+    duplicates = con.execute("SELECT count(*) - count(DISTINCT id) FROM tickets").fetchone()[0]
+    if duplicates:
+        con.execute("""
+            CREATE OR REPLACE TEMP TABLE tickets AS
+            SELECT * FROM tickets
+            QUALIFY row_number() OVER (PARTITION BY id ORDER BY filename, file_row_number) = 1
+        """)
+
+def _register_category_map(con: duckdb.DuckDBPyConnection, category_mapping: Dict[str, str]) -> list:
+    """Resolve cada category_path distinto uma vez (mesma trie do pandas) e registra a tabela de junção."""
+    trie = build_category_trie(category_mapping)
+    paths = [row[0] for row in con.execute("SELECT DISTINCT category_path FROM tickets WHERE category_path IS NOT NULL").fetchall()]
+    df_map = pd.DataFrame({
+        'category_path': pd.Series(paths, dtype=object),
+        'normalized_category': pd.Series([resolve_category_path(str(p), trie) for p in paths], dtype=object),
+    })
+    con.register('category_map', df_map)
+    return sorted(set(df_map['normalized_category']) | {'OUTROS'})
+
+def _build_ttr_sketches(con: duckdb.DuckDBPyConnection, by_category: bool) -> Dict[str, TDigest]:
+    """
+    Sketches de TTR a partir de contagens por valor calculadas no DuckDB (O(valores distintos)):
+    o global sempre (sketch canônico, o mesmo do pandas: dirige a imputação) e, se pedido, um
+    por categoria (KPIs P50/P90).
+    """
+    counts = con.execute("""
+        SELECT ttr_hours, count(*) AS n FROM tickets WHERE ttr_hours IS NOT NULL GROUP BY ttr_hours
+    """).fetchnumpy()
+    sketches = {TTR_GLOBAL_KEY: digest_from_counts(counts['ttr_hours'], counts['n'])}
+    if not by_category:
+        return sketches
+
+    counts = con.execute("""
+        SELECT COALESCE(m.normalized_category, 'OUTROS') AS normalized_category, t.ttr_hours, count(*) AS n
+        FROM tickets t LEFT JOIN category_map m USING (category_path)
+        WHERE t.ttr_hours IS NOT NULL
+        GROUP BY ALL
+        ORDER BY 1
+    """).fetchnumpy()
+    categories = np.asarray(counts['normalized_category'], dtype=object)
+    starts = np.flatnonzero(np.r_[True, categories[1:] != categories[:-1]]) if len(categories) else []
+    bounds = list(starts) + [len(categories)]
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        sketches[categories[begin]] = digest_from_counts(counts['ttr_hours'][begin:end], counts['n'][begin:end])
+    return sketches
+
+def process_data_duckdb(raw_path: str, category_mapping: Dict[str, str],
+                        start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                        ttr_sketches: Optional[Dict[str, TDigest]] = None,
+                        ttr_median: Optional[float] = None,
+                        con: Optional[duckdb.DuckDBPyConnection] = None) -> pd.DataFrame:
+    """
+    Equivalente ao process_data (pandas) executado no DuckDB sobre o dataset bruto:
+    mesma Tabela Fato Diária, mesmos sketches de TTR e mesma mediana de imputação.
+    """
+    own_connection = con is None
+    con = connect() if own_connection else con
+    try:
+        _load_tickets(con, raw_path, start_date, end_date)
+        categories = _register_category_map(con, category_mapping)
+
+        sketches = _build_ttr_sketches(con, by_category=ttr_sketches is not None)
+        if ttr_sketches is not None:
+            ttr_sketches.update(sketches)
+        if ttr_median is None:
+            ttr_median = sketches[TTR_GLOBAL_KEY].median()
+
+        # TTR nulo = mediana global (RN03); sem mediana, a média ignora os nulos como no pandas.
+        # Tickets sem entidade entram nos sketches/mediana, mas não na tabela fato (o groupby do
+        # pandas descarta chaves nulas)
+        ttr_value = "ttr_hours" if pd.isna(ttr_median) else f"COALESCE(ttr_hours, {float(ttr_median)!r})"
+        daily_fact = con.execute(f"""
+            SELECT
+                t.date,
+                COALESCE(m.normalized_category, 'OUTROS') AS normalized_category,
+                t.entities_id,
+                count(*) AS volume,
+                avg({ttr_value}) AS avg_ttr_hours
+            FROM tickets t LEFT JOIN category_map m USING (category_path)
+            WHERE t.entities_id IS NOT NULL
+            GROUP BY ALL
+        """).arrow()
+    finally:
+        if own_connection:
+            con.close()
+
+    # .arrow() devolve Table ou RecordBatchReader conforme a versão do DuckDB
+    daily_fact = (daily_fact.read_all() if hasattr(daily_fact, 'read_all') else daily_fact).to_pandas()
+    daily_fact['normalized_category'] = pd.Categorical(daily_fact['normalized_category'], categories=categories)
+    daily_fact = finalize_daily_fact(daily_fact)
+    print(f"Tabela Fato Diária gerada (DuckDB). Total de linhas (dias/categorias): {len(daily_fact)}")
+    return daily_fact
+
+def check_parity(raw_path: str, category_mapping: Dict[str, str], start_date: Optional[datetime] = None,
+                 rtol: float = 1e-6) -> bool:
+    """
+    Teste de paridade entre os backends: roda pandas e DuckDB sobre o mesmo dataset bruto e
+    compara tabela fato (chaves, volumes, calendário e avg_ttr_hours com tolerância de
+    ponto flutuante: a soma em outra ordem pode mudar o último bit do float32) e KPIs de TTR.
+    Retorna True se forem equivalentes.
+    """
+    from src.data.raw_store import read_raw_tickets
+
+    sketches_pandas, sketches_duckdb = {}, {}
+    df_raw = read_raw_tickets(raw_path, columns=TRANSFORM_COLUMNS, start_date=start_date)
+    df_pandas = process_data(df_raw, category_mapping, ttr_sketches=sketches_pandas)
+    df_duckdb = process_data_duckdb(raw_path, category_mapping, start_date=start_date, ttr_sketches=sketches_duckdb)
+
+    problems = []
+    if list(df_pandas.columns) != list(df_duckdb.columns):
+        problems.append(f"colunas diferentes: {list(df_pandas.columns)} x {list(df_duckdb.columns)}")
+    elif len(df_pandas) != len(df_duckdb):
+        problems.append(f"linhas diferentes: {len(df_pandas)} x {len(df_duckdb)}")
+    else:
+        for col in df_pandas.columns:
+            left, right = df_pandas[col], df_duckdb[col]
+            if col == 'avg_ttr_hours':
+                same = np.allclose(left.to_numpy(float), right.to_numpy(float), rtol=rtol, atol=0, equal_nan=True)
+            elif col == 'normalized_category':
+                same = left.astype(str).equals(right.astype(str)) and list(left.cat.categories) == list(right.cat.categories)
+            else:
+                same = (left.to_numpy() == right.to_numpy()).all()
+            if not same:
+                problems.append(f"coluna '{col}' diverge")
+
+    median_pandas = sketches_pandas[TTR_GLOBAL_KEY].median()
+    median_duckdb = sketches_duckdb[TTR_GLOBAL_KEY].median()
+    if not np.isclose(median_pandas, median_duckdb, rtol=rtol, equal_nan=True):
+        problems.append(f"mediana de TTR diverge: {median_pandas} x {median_duckdb}")
+    if set(sketches_pandas) != set(sketches_duckdb):
+        problems.append("categorias dos sketches de TTR divergem")
+
+    if problems:
+        print("❌ Paridade pandas x DuckDB FALHOU:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return False
+    print(f"✅ Paridade pandas x DuckDB OK ({len(df_pandas)} linhas, mediana TTR {median_pandas:.4f}h).")
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    from src.data.transform import CATEGORY_MAPPING
+
+    parser = argparse.ArgumentParser(description="Backend DuckDB do ETL da Tabela Fato Diária.")
+    parser.add_argument('--raw-path', default=RAW_STORE_PATH)
+    parser.add_argument('--check-parity', action='store_true',
+                        help="Compara a saída com o backend pandas sobre o mesmo dataset bruto.")
+    args = parser.parse_args()
+
+    if args.check_parity:
+        exit(0 if check_parity(args.raw_path, CATEGORY_MAPPING) else 1)
+    df_fact = process_data_duckdb(args.raw_path, CATEGORY_MAPPING)
+    print(df_fact.head())
@@ -1,18 +1,27 @@
 from datetime import datetime, timedelta
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from src.utils.database import fetch_data
+from typing import Iterator, List, Optional, Tuple
+from src.utils.database import fetch_data, stream_data
+from src.data.raw_store import RAW_STORE_PATH, write_raw_tickets, upsert_raw_tickets, read_raw_tickets_by_id
+from src.data.fact_store import PENDING_DATES_PATH, mark_dates_changed, mark_full_refresh
 
-def get_glpi_tickets(months_history: int = 12) -> tuple[pd.DataFrame, str]:
-    """
-    Extrai a base histórica de tickets do GLPI com as colunas essenciais.
-    """
-    end_date = datetime.now()
-    # Pega o primeiro dia do mês de 'months_history' meses atrás
-    start_date = end_date - timedelta(days=30 * months_history) 
-    
-    # A consulta usa os nomes de coluna confirmados (t.id, t.date, c.completename, etc.)
-    query_base = f"""
-    SELECT
+# Watermark do modo incremental (o dataset bruto em RAW_STORE_PATH é o store persistente)
+WATERMARK_PATH = 'data/raw/extract_watermark.json'
+
+# Limite padrão de consultas simultâneas no modo paralelo (não sobrecarregar o primário do GLPI).
+# Deve ser <= DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW para não esperar por conexões.
+DEFAULT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", 4))
+
+# Tamanho padrão dos blocos no modo streaming (linhas por bloco)
+DEFAULT_CHUNK_SIZE = 50000
+
+# Colunas extraídas de glpi_tickets (compartilhadas pelos modos completo e incremental)
+TICKET_COLUMNS_SQL = """
         t.id,
         t.date AS opened_at,
         t.solvedate,
@@ -24,23 +33,257 @@ def get_glpi_tickets(months_history: int = 12) -> tuple[pd.DataFrame, str]:
         t.entities_id,
         t.time_to_resolve, -- Campo nativo do GLPI para TTR (em segundos ou outro formato dependendo da config)
         -- Cálculo de horas de resolução para segurança, caso time_to_resolve não seja ideal:
-        TIMESTAMPDIFF(HOUR, t.date, t.solvedate) AS hours_to_solve 
+        TIMESTAMPDIFF(HOUR, t.date, t.solvedate) AS hours_to_solve,
+        COALESCE(t.date_mod, t.date) AS date_mod -- Base do watermark incremental
+"""
+
+# TTR em horas por ticket, com a mesma regra do transform: time_to_resolve (segundos) quando for
+# numérico e > 0; caso contrário, TIMESTAMPDIFF em horas entre abertura e solução
+TTR_HOURS_SQL = """
+        CASE
+            WHEN CAST(t.time_to_resolve AS CHAR) REGEXP '^[0-9]+([.][0-9]*)?$' AND t.time_to_resolve > 0
+                THEN t.time_to_resolve / 3600.0
+            ELSE TIMESTAMPDIFF(HOUR, t.date, t.solvedate)
+        END"""
+
+def get_history_window(months_history: int = 12) -> Tuple[datetime, datetime]:
+    """Retorna a janela [início, fim) de extração para 'months_history' meses."""
+    end_date = datetime.now()
+    # Pega o primeiro dia do mês de 'months_history' meses atrás
+    start_date = end_date - timedelta(days=30 * months_history)
+    return start_date, end_date
+
+def build_tickets_query(start_date: datetime, end_date: datetime) -> str:
+    """Monta a consulta de tickets do GLPI para a janela [start_date, end_date)."""
+    # A consulta usa os nomes de coluna confirmados (t.id, t.date, c.completename, etc.)
+    return f"""
+    SELECT{TICKET_COLUMNS_SQL}
     FROM glpi_tickets t
     LEFT JOIN glpi_itilcategories c ON c.id = t.itilcategories_id
     WHERE t.date >= '{start_date.strftime('%Y-%m-%d')}'
       AND t.date < '{end_date.strftime('%Y-%m-%d')}'
     ORDER BY t.date;
     """
-    
-    df = fetch_data(query_base)
+
+def split_date_window(start_date: datetime, end_date: datetime, slice_by: str = 'month') -> List[Tuple[datetime, datetime]]:
+    """
+    Divide a janela [start_date, end_date) em fatias contíguas por mês ('month') ou
+    semana ('week'), alinhadas ao calendário. As fatias são retornadas em ordem de data.
+    """
+    freq = {'month': 'MS', 'week': 'W-MON'}.get(slice_by)
+    if freq is None:
+        raise ValueError(f"slice_by inválido: {slice_by!r}. Use 'month' ou 'week'.")
+
+    start_day = pd.Timestamp(start_date).normalize()
+    end_day = pd.Timestamp(end_date).normalize()
+    boundaries = [start_day] + [b for b in pd.date_range(start_day, end_day, freq=freq) if start_day < b < end_day] + [end_day]
+    return [(s.to_pydatetime(), e.to_pydatetime()) for s, e in zip(boundaries[:-1], boundaries[1:])]
+
+def get_glpi_tickets(months_history: int = 12, slice_by: Optional[str] = None,
+                     max_workers: int = DEFAULT_MAX_WORKERS, raise_on_error: bool = False) -> tuple[pd.DataFrame, str]:
+    """
+    Extrai a base histórica de tickets do GLPI com as colunas essenciais.
+
+    Com slice_by='month' ou 'week', a janela é dividida em fatias consultadas em paralelo
+    (até 'max_workers' simultâneas, via pool de conexões) e unidas em ordem de data.
+    Com raise_on_error=True, a consulta única também propaga erros do banco (as fatias sempre propagam).
+    """
+    start_date, end_date = get_history_window(months_history)
+    query_base = build_tickets_query(start_date, end_date)
+
+    if slice_by is None:
+        df = fetch_data(query_base, raise_on_error=raise_on_error)
+        return df, query_base
+
+    slices = split_date_window(start_date, end_date, slice_by)
+    queries = [build_tickets_query(s, e) for s, e in slices]
+    print(f"Extração paralela: {len(slices)} fatias ({slice_by}) com até {max_workers} consultas simultâneas.")
+
+    # Uma fatia com erro invalida o resultado inteiro (raise_on_error), em vez de sumir silenciosamente
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(lambda q: fetch_data(q, raise_on_error=True), queries))
+
+    # executor.map preserva a ordem das fatias, e cada fatia já vem ordenada por t.date
+    frames = [f for f in frames if not f.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    print(f"Extração paralela concluída. Total de linhas: {len(df)}")
     return df, query_base
 
+def build_daily_aggregates_query(start_date: datetime, end_date: datetime) -> str:
+    """
+    Consulta do modo push-down: agrega no banco por DATE(t.date) x category_path x entities_id,
+    devolvendo volume e as parcelas do TTR (soma e contagem dos não nulos) para reagregação.
+    """
+    return f"""
+    SELECT
+        x.date,
+        x.category_path,
+        x.entities_id,
+        COUNT(*) AS volume,
+        SUM(x.ttr_hours) AS ttr_sum,
+        COUNT(x.ttr_hours) AS ttr_count
+    FROM (
+        SELECT
+            DATE(t.date) AS date,
+            c.completename AS category_path,
+            t.entities_id,{TTR_HOURS_SQL} AS ttr_hours
+        FROM glpi_tickets t
+        LEFT JOIN glpi_itilcategories c ON c.id = t.itilcategories_id
+        WHERE t.date >= '{start_date.strftime('%Y-%m-%d')}'
+          AND t.date < '{end_date.strftime('%Y-%m-%d')}'
+    ) x
+    GROUP BY x.date, x.category_path, x.entities_id
+    ORDER BY x.date;
+    """
+
+def get_glpi_daily_aggregates(months_history: int = 12) -> tuple[pd.DataFrame, str]:
+    """
+    Modo push-down: a agregação diária (COUNT e parcelas do TTR) roda no MySQL e apenas
+    os grupos trafegam pela rede. A mediana global do TTR (usada na imputação) também é
+    calculada no banco e devolvida na coluna 'ttr_median'.
+    O resultado é aceito diretamente pelo process_data.
+    """
+    start_date, end_date = get_history_window(months_history)
+    query_base = build_daily_aggregates_query(start_date, end_date)
+
+    df = fetch_data(query_base, raise_on_error=True)
+    df['ttr_median'] = get_ttr_median(start_date, end_date)
+    return df, query_base
+
+def get_ttr_median(start_date: datetime, end_date: datetime) -> float:
+    """Mediana exata do TTR (horas) na janela, calculada no banco via ORDER BY + OFFSET."""
+    ttr_subquery = f"""
+        SELECT{TTR_HOURS_SQL} AS ttr_hours
+        FROM glpi_tickets t
+        WHERE t.date >= '{start_date.strftime('%Y-%m-%d')}'
+          AND t.date < '{end_date.strftime('%Y-%m-%d')}'
+    """
+    df_count = fetch_data(f"SELECT COUNT(ttr_hours) AS n FROM ({ttr_subquery}) x", raise_on_error=True)
+    n = int(df_count['n'].iloc[0]) if not df_count.empty else 0
+    if n == 0:
+        return np.nan
+
+    # Para n par a mediana é a média dos dois valores centrais
+    offset, limit = (n - 1) // 2, 2 if n % 2 == 0 else 1
+    df_mid = fetch_data(
+        f"SELECT ttr_hours FROM ({ttr_subquery}) x WHERE ttr_hours IS NOT NULL "
+        f"ORDER BY ttr_hours LIMIT {limit} OFFSET {offset}",
+        raise_on_error=True,
+    )
+    return float(df_mid['ttr_hours'].astype(float).mean())
+
+def stream_glpi_tickets(months_history: int = 12, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[Iterator[pd.DataFrame], str]:
+    """
+    Versão em streaming do get_glpi_tickets: devolve um iterador de blocos de tickets
+    (cursor no servidor), mantendo o pico de memória limitado a 'chunk_size' linhas.
+    """
+    start_date, end_date = get_history_window(months_history)
+    query_base = build_tickets_query(start_date, end_date)
+    return stream_data(query_base, chunk_size=chunk_size), query_base
+
+def build_incremental_query(watermark_date: str, watermark_id: int) -> str:
+    """
+    Monta a consulta incremental: apenas tickets criados ou alterados depois do watermark
+    (date_mod, id). O desempate por id evita perder tickets com o mesmo date_mod.
+    """
+    return f"""
+    SELECT{TICKET_COLUMNS_SQL}
+    FROM glpi_tickets t
+    LEFT JOIN glpi_itilcategories c ON c.id = t.itilcategories_id
+    WHERE COALESCE(t.date_mod, t.date) > '{watermark_date}'
+       OR (COALESCE(t.date_mod, t.date) = '{watermark_date}' AND t.id > {int(watermark_id)})
+    ORDER BY date_mod, t.id;
+    """
+
+def load_watermark(path: str = WATERMARK_PATH) -> Optional[dict]:
+    """Lê o watermark salvo ({'date_mod': 'YYYY-MM-DD HH:MM:SS', 'id': int}) ou None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_watermark(watermark: dict, path: str = WATERMARK_PATH) -> None:
+    """Grava o watermark de forma atômica (arquivo temporário + rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f)
+    os.replace(tmp_path, path)
+
+def compute_watermark(df: pd.DataFrame) -> dict:
+    """Retorna o maior par (date_mod, id) de um lote de tickets."""
+    date_mod = pd.to_datetime(df['date_mod'])
+    last = df.assign(date_mod=date_mod).sort_values(['date_mod', 'id']).iloc[-1]
+    return {'date_mod': last['date_mod'].strftime('%Y-%m-%d %H:%M:%S'), 'id': int(last['id'])}
+
+def extract_incremental(months_history: int = 12, store_path: str = RAW_STORE_PATH,
+                        watermark_path: str = WATERMARK_PATH, pending_path: str = PENDING_DATES_PATH) -> int:
+    """
+    Extração incremental: sem watermark, faz a carga inicial da janela completa;
+    depois, busca somente tickets com (date_mod, id) acima do watermark e faz upsert
+    nas partições afetadas do dataset bruto. As pendências para o transform --incremental
+    (recarga completa ou dias alterados) são gravadas em 'pending_path'.
+    Retorna o número de tickets novos/alterados.
+    """
+    watermark = load_watermark(watermark_path)
+
+    # Erros do banco propagam (raise_on_error): um DataFrame vazio aqui significa "nada novo",
+    # nunca uma falha de consulta, e o watermark não avança
+    if watermark is None or not os.path.isdir(store_path):
+        print("Watermark ausente: executando carga inicial completa.")
+        df_new, _ = get_glpi_tickets(months_history=months_history, raise_on_error=True)
+        if not df_new.empty:
+            write_raw_tickets(df_new, store_path)
+            mark_full_refresh(pending_path)
+    else:
+        print(f"Extraindo alterações desde {watermark['date_mod']} (id > {watermark['id']})...")
+        df_new = fetch_data(build_incremental_query(watermark['date_mod'], watermark['id']), raise_on_error=True)
+        if not df_new.empty:
+            # Datas de abertura já gravadas dos mesmos ids: se o opened_at mudou, o dia antigo
+            # também perde o ticket na tabela fato
+            df_previous = read_raw_tickets_by_id(df_new['id'], store_path, columns=['opened_at'])
+            partitions = upsert_raw_tickets(df_new, store_path)
+            print(f"Upsert concluído em {partitions} partições (ano/mês).")
+            # Dias da tabela fato a recalcular (transform --incremental)
+            opened_at = pd.to_datetime(pd.concat([df_new['opened_at'], df_previous['opened_at']]), errors='coerce')
+            pending = mark_dates_changed(opened_at.dt.normalize().dropna().unique(), pending_path)
+            print(f"{pending} dias pendentes de refresh na tabela fato.")
+
+    if df_new.empty:
+        print("Nenhum ticket novo ou alterado desde a última extração.")
+        return 0
+
+    # O watermark só avança depois que o store foi gravado com sucesso
+    save_watermark(compute_watermark(df_new), watermark_path)
+    print(f"{len(df_new)} tickets novos/alterados gravados em: {store_path}")
+    return len(df_new)
+
 if __name__ == "__main__":
-    # Teste de extração com 12 meses de histórico
-    df_tickets, sql_query = get_glpi_tickets(months_history=12)
-    
-    # Salva o dataframe bruto para referência
-    output_path = 'data/raw/glpi_tickets_raw.csv'
-    if not df_tickets.empty:
-        df_tickets.to_csv(output_path, index=False)
-        print(f"\nExtração concluída. Dados brutos salvos em: {output_path}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extração de tickets do GLPI.")
+    parser.add_argument('--mode', choices=['full', 'incremental'], default='full',
+                        help="full: janela completa em streaming; incremental: apenas alterações desde o watermark.")
+    parser.add_argument('--months-history', type=int, default=12)
+    parser.add_argument('--slice-by', choices=['month', 'week'], default=None,
+                        help="Extração paralela por fatias de tempo (ignora o streaming).")
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Máximo de consultas simultâneas no modo paralelo.")
+    args = parser.parse_args()
+
+    output_path = RAW_STORE_PATH
+
+    if args.mode == 'incremental':
+        extract_incremental(months_history=args.months_history, store_path=output_path)
+    elif args.slice_by is not None:
+        df_tickets, sql_query = get_glpi_tickets(args.months_history, slice_by=args.slice_by, max_workers=args.max_workers)
+        if not df_tickets.empty:
+            write_raw_tickets(df_tickets, output_path)
+            mark_full_refresh()
+            print(f"\nExtração paralela concluída. Dados brutos salvos em: {output_path}")
+    else:
+        # Extração em streaming com 12 meses de histórico (memória constante)
+        chunks, sql_query = stream_glpi_tickets(months_history=args.months_history)
+
+        # Salva os dados brutos bloco a bloco (Parquet particionado por ano/mês)
+        total_rows = write_raw_tickets(chunks, output_path)
+        if total_rows > 0:
+            mark_full_refresh()
+            print(f"\nExtração concluída. {total_rows} tickets brutos salvos em: {output_path}")
@@ -0,0 +1,287 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.data.schema import apply_fact_schema
+
+# Tabela Fato Diária (RF02) como dataset particionado no estilo hive por ano/mês
+# (parts/year=YYYY/month=M[/normalized_category=X]/part.v<versão>.parquet) e um manifesto JSON
+# que lista a versão vigente de cada partição, com o intervalo de datas de cada uma. Leitores
+# só enxergam o que o manifesto aponta, então a troca do manifesto (rename atômico) publica a
+# nova versão; os filtros de data/categoria descartam partições inteiras antes de abrir arquivos.
+FACT_TABLE_PATH = 'data/processed/daily_fact_table.parquet'
+MANIFEST_NAME = '_manifest.json'
+PARTS_DIR = 'parts'
+
+FACT_PARTITION_COLS = ['year', 'month']
+CATEGORY_PARTITION_COL = 'normalized_category'
+
+# Datas da tabela fato afetadas por tickets novos/alterados desde o último refresh
+# (gravadas pela extração incremental e consumidas pelo transform --incremental)
+PENDING_DATES_PATH = 'data/raw/pending_fact_dates.json'
+
+FACT_SORT_KEYS = ['date', 'normalized_category', 'entities_id']
+
+def _manifest_path(path: str) -> str:
+    return os.path.join(path, MANIFEST_NAME)
+
+def _write_json_atomic(data: dict, path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+def load_manifest(path: str = FACT_TABLE_PATH) -> Optional[dict]:
+    """Manifesto vigente ({'version', 'updated_at', 'ttr_median', 'partitions': {data: {file, rows}}}) ou None."""
+    manifest_path = _manifest_path(path)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _partition_key(values: Dict) -> str:
+    """Caminho hive da partição (valores de categoria escapados para caber num nome de pasta)."""
+    return '/'.join(f"{col}={quote(str(value), safe='')}" for col, value in values.items())
+
+def _write_partitions(df_fact: pd.DataFrame, path: str, version: int, partitioning: List[str]) -> dict:
+    """Grava um arquivo por partição (nome com a versão, nunca sobrescreve arquivos publicados)."""
+    partitions = {}
+    if df_fact.empty:
+        return partitions
+    for values, df_part in df_fact.groupby(partitioning, sort=True, observed=True):
+        part_values = {col: value.item() if hasattr(value, 'item') else value for col, value in zip(partitioning, values)}
+        key = _partition_key(part_values)
+        file_name = os.path.join(PARTS_DIR, key, f"part.v{version}.parquet")
+        os.makedirs(os.path.join(path, os.path.dirname(file_name)), exist_ok=True)
+
+        df_part = df_part.sort_values(FACT_SORT_KEYS).reset_index(drop=True)
+        pq.write_table(pa.Table.from_pandas(df_part, preserve_index=False), os.path.join(path, file_name))
+        partitions[key] = {
+            'file': file_name,
+            'rows': len(df_part),
+            **part_values,
+            'min_date': df_part['date'].min().strftime('%Y-%m-%d'),
+            'max_date': df_part['date'].max().strftime('%Y-%m-%d'),
+        }
+    return partitions
+
+def _publish(path: str, partitions: dict, version: int, ttr_median: Optional[float],
+             previous: Optional[dict], partitioning: List[str]) -> dict:
+    """Troca o manifesto de forma atômica e remove arquivos fora da versão nova e da anterior."""
+    manifest = {
+        'version': version,
+        'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'ttr_median': None if ttr_median is None or pd.isna(ttr_median) else float(ttr_median),
+        'partitioning': partitioning,
+        'partitions': dict(sorted(partitions.items(), key=lambda item: (item[1]['min_date'], item[0]))),
+    }
+    _write_json_atomic(manifest, _manifest_path(path))
+
+    # A versão anterior é mantida para leitores que abriram o manifesto antigo
+    keep = {p['file'] for p in manifest['partitions'].values()}
+    if previous is not None:
+        keep |= {p['file'] for p in previous['partitions'].values()}
+    parts_dir = os.path.join(path, PARTS_DIR)
+    for root, dirs, files in os.walk(parts_dir, topdown=False):
+        for name in files:
+            if os.path.relpath(os.path.join(root, name), path) not in keep:
+                os.remove(os.path.join(root, name))
+        if root != parts_dir and not os.listdir(root):
+            os.rmdir(root) # Partição que deixou de existir
+    return manifest
+
+def write_fact_table(df_fact: pd.DataFrame, path: str = FACT_TABLE_PATH, ttr_median: Optional[float] = None,
+                     partition_by_category: bool = False) -> dict:
+    """
+    Grava a tabela fato completa (partições ano/mês e, opcionalmente, categoria) e publica
+    um manifesto novo. 'ttr_median' é a mediana usada na imputação (RN03), reaproveitada nos
+    refreshes incrementais. Um arquivo único de versões anteriores no mesmo caminho é substituído.
+    """
+    if os.path.isfile(path):
+        os.remove(path) # Formato antigo (arquivo Parquet único)
+
+    previous = load_manifest(path)
+    version = previous['version'] + 1 if previous else 1
+    partitioning = FACT_PARTITION_COLS + ([CATEGORY_PARTITION_COL] if partition_by_category else [])
+    partitions = _write_partitions(df_fact, path, version, partitioning)
+    return _publish(path, partitions, version, ttr_median, previous, partitioning)
+
+def update_fact_partitions(df_fact_changed: pd.DataFrame, dates: Iterable, path: str = FACT_TABLE_PATH) -> dict:
+    """
+    Substitui as linhas dos dias 'dates' pelo conteúdo recalculado (dias sem linhas em
+    df_fact_changed deixam de existir), reescrevendo só as partições dos meses afetados,
+    e publica um manifesto novo. As demais partições continuam apontando para os mesmos arquivos.
+    """
+    previous = load_manifest(path)
+    if previous is None:
+        raise FileNotFoundError(f"Manifesto não encontrado em {path}: execute a carga completa primeiro.")
+    if 'partitioning' not in previous:
+        raise ValueError(f"Tabela fato em {path} está no layout antigo (por dia): execute a carga completa.")
+
+    version = previous['version'] + 1
+    partitioning = previous['partitioning']
+    days = pd.DatetimeIndex(sorted({pd.Timestamp(d).normalize() for d in dates}))
+    months = set(zip(days.year, days.month))
+
+    affected = {key: p for key, p in previous['partitions'].items() if (p['year'], p['month']) in months}
+    partitions = {key: p for key, p in previous['partitions'].items() if key not in affected}
+
+    # Partições afetadas: linhas dos outros dias são mantidas, as dos dias pendentes são trocadas
+    df_kept = _read_files([os.path.join(path, p['file']) for p in affected.values()])
+    if not df_kept.empty:
+        df_kept = df_kept[~df_kept['date'].dt.normalize().isin(days)]
+    frames = [df for df in [df_kept, df_fact_changed] if not df.empty]
+    df_month = apply_fact_schema(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
+    partitions.update(_write_partitions(df_month, path, version, partitioning))
+    return _publish(path, partitions, version, previous.get('ttr_median'), previous, partitioning)
+
+def _entry_date_range(key: str, entry: dict):
+    """Intervalo de datas de uma partição (manifestos antigos, por dia, usam a própria chave)."""
+    return pd.Timestamp(entry.get('min_date', key)), pd.Timestamp(entry.get('max_date', key))
+
+def fact_table_files(path: str = FACT_TABLE_PATH, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None, categories: Optional[List[str]] = None) -> List[str]:
+    """
+    Arquivos da versão publicada (em ordem de data), já sem as partições fora da janela
+    [start_date, end_date) e, se a tabela for particionada por categoria, fora de 'categories'.
+    """
+    manifest = load_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(path)
+
+    files = []
+    for key, entry in manifest['partitions'].items():
+        min_date, max_date = _entry_date_range(key, entry)
+        if start_date is not None and max_date < pd.Timestamp(start_date):
+            continue
+        if end_date is not None and min_date >= pd.Timestamp(end_date):
+            continue
+        if categories is not None and CATEGORY_PARTITION_COL in entry and entry[CATEGORY_PARTITION_COL] not in categories:
+            continue
+        files.append(os.path.join(path, entry['file']))
+    return files
+
+def fact_table_max_date(path: str = FACT_TABLE_PATH) -> Optional[pd.Timestamp]:
+    """Última data publicada, lida só do manifesto."""
+    manifest = load_manifest(path)
+    if manifest is None or not manifest['partitions']:
+        return None
+    return max(_entry_date_range(key, entry)[1] for key, entry in manifest['partitions'].items())
+
+def _fact_filter(start_date: Optional[datetime], end_date: Optional[datetime],
+                 categories: Optional[List[str]], entities: Optional[List[int]]) -> Optional[ds.Expression]:
+    """Filtro de linhas empurrado para o scan Parquet (estatísticas dos row groups podam o resto)."""
+    exprs = []
+    if start_date is not None:
+        exprs.append(ds.field('date') >= pa.scalar(pd.Timestamp(start_date).to_pydatetime(), pa.timestamp('us')))
+    if end_date is not None:
+        exprs.append(ds.field('date') < pa.scalar(pd.Timestamp(end_date).to_pydatetime(), pa.timestamp('us')))
+    if categories is not None:
+        exprs.append(ds.field('normalized_category').isin([str(c) for c in categories]))
+    if entities is not None:
+        exprs.append(ds.field('entities_id').isin([int(e) for e in entities]))
+    expr = None
+    for e in exprs:
+        expr = e if expr is None else expr & e
+    return expr
+
+def _read_files(files: List[str], columns: Optional[List[str]] = None,
+                expr: Optional[ds.Expression] = None) -> pd.DataFrame:
+    if not files:
+        return pd.DataFrame(columns=columns)
+    return ds.dataset(files, format='parquet').to_table(columns=columns, filter=expr).to_pandas()
+
+def read_fact_table(path: str = FACT_TABLE_PATH, columns: Optional[List[str]] = None,
+                    start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                    categories: Optional[List[str]] = None, entities: Optional[List[int]] = None,
+                    last_months: Optional[int] = None) -> pd.DataFrame:
+    """
+    Lê a tabela fato publicada (via manifesto). Aceita também o formato antigo (arquivo único).
+    Filtros: janela [start_date, end_date), categorias e entidades; 'last_months' é atalho para
+    start_date = última data publicada menos N meses. Partições fora do filtro não são abertas
+    e o restante é filtrado no scan. A categoria volta como categórica com as categorias
+    ordenadas, como no process_data.
+    """
+    if last_months is not None and os.path.isdir(path):
+        max_date = fact_table_max_date(path)
+        if max_date is not None:
+            start_date = max_date - pd.DateOffset(months=last_months) + pd.Timedelta(days=1)
+
+    expr = _fact_filter(start_date, end_date, categories, entities)
+    if os.path.isfile(path):
+        df = ds.dataset(path, format='parquet').to_table(columns=columns, filter=expr).to_pandas()
+        return apply_fact_schema(df) # Arquivo antigo: impõe o schema compacto
+
+    files = fact_table_files(path, start_date, end_date, categories)
+    df = _read_files(files, columns, expr)
+    if df.empty and not files:
+        return df
+    df = apply_fact_schema(df)
+
+    if 'normalized_category' in df.columns:
+        category = df['normalized_category'].astype('category')
+        if categories is not None:
+            category = category.cat.remove_unused_categories() # O dicionário dos arquivos traz todas
+        df['normalized_category'] = category.cat.set_categories(sorted(category.cat.categories))
+    sort_keys = [c for c in FACT_SORT_KEYS if c in df.columns]
+    if sort_keys:
+        df = df.sort_values(sort_keys).reset_index(drop=True)
+    return df
+
+def add_fact_filter_arguments(parser) -> None:
+    """Opções de filtro da tabela fato para os CLIs de modelagem (retreino parcial)."""
+    parser.add_argument('--start-date', help="Primeira data (YYYY-MM-DD) do histórico lido.")
+    parser.add_argument('--end-date', help="Data final exclusiva (YYYY-MM-DD) do histórico lido.")
+    parser.add_argument('--last-months', type=int, help="Lê só os últimos N meses publicados.")
+    parser.add_argument('--category', action='append', dest='categories',
+                        help="Restringe a uma categoria normalizada (pode repetir).")
+    parser.add_argument('--entity', action='append', type=int, dest='entities',
+                        help="Restringe a um entities_id (pode repetir).")
+
+def fact_filter_kwargs(args) -> dict:
+    return {
+        'start_date': args.start_date,
+        'end_date': args.end_date,
+        'categories': args.categories,
+        'entities': args.entities,
+        'last_months': args.last_months,
+    }
+
+# --- Datas pendentes (contrato entre a extração incremental e o refresh da tabela fato) ---
+
+def load_pending_dates(path: str = PENDING_DATES_PATH) -> dict:
+    """{'full_refresh': bool, 'dates': [YYYY-MM-DD, ...]} (vazio se não houver pendências)."""
+    if not os.path.isfile(path):
+        return {'full_refresh': False, 'dates': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def mark_dates_changed(dates: Iterable, path: str = PENDING_DATES_PATH) -> int:
+    """Acrescenta datas às pendências (união com as já registradas). Retorna o total pendente."""
+    pending = load_pending_dates(path)
+    days = set(pending['dates']) | {pd.Timestamp(d).strftime('%Y-%m-%d') for d in dates}
+    pending['dates'] = sorted(days)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    _write_json_atomic(pending, path)
+    return len(days)
+
+def mark_full_refresh(path: str = PENDING_DATES_PATH) -> None:
+    """Sinaliza que o dataset bruto foi recarregado inteiro: o próximo refresh é completo."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    _write_json_atomic({'full_refresh': True, 'dates': []}, path)
+
+def clear_pending_dates(processed: dict, path: str = PENDING_DATES_PATH) -> None:
+    """Remove das pendências o que já foi processado (preserva datas marcadas nesse meio-tempo)."""
+    pending = load_pending_dates(path)
+    remaining = sorted(set(pending['dates']) - set(processed['dates']))
+    full_refresh = pending['full_refresh'] and not processed['full_refresh']
+    if not remaining and not full_refresh:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+    _write_json_atomic({'full_refresh': full_refresh, 'dates': remaining}, path)
@@ -0,0 +1,198 @@
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# Calendário de feriados (RN01) para qualquer intervalo de anos e dimensão calendário (RF02).
+# Substitui a lista fixa de 2025: gera os feriados nacionais (inclusive os móveis,
+# derivados da Páscoa) e aceita feriados regionais por entidade. A dimensão calendário
+# é compartilhada pelo ETL, pela densificação das séries e pelas features futuras.
+
+# Feriados nacionais de data fixa: (mês, dia, nome, primeiro ano de vigência)
+NATIONAL_FIXED_HOLIDAYS = [
+    (1, 1, 'Confraternização Universal', None),
+    (4, 21, 'Tiradentes', None),
+    (5, 1, 'Dia do Trabalho', None),
+    (9, 7, 'Independência do Brasil', None),
+    (10, 12, 'Nossa Senhora Aparecida', None),
+    (11, 2, 'Finados', None),
+    (11, 15, 'Proclamação da República', None),
+    (11, 20, 'Dia Nacional de Zumbi e da Consciência Negra', 2024), # Lei 14.759/2023
+    (12, 25, 'Natal', None),
+]
+
+# Feriados móveis: deslocamento em dias a partir do Domingo de Páscoa
+NATIONAL_MOVEABLE_HOLIDAYS = [
+    (-48, 'Carnaval (segunda-feira)'),
+    (-47, 'Carnaval (terça-feira)'),
+    (-2, 'Sexta-feira Santa'),
+]
+
+# Pontos facultativos incluídos apenas com include_optional=True
+OPTIONAL_MOVEABLE_HOLIDAYS = [
+    (-46, 'Quarta-feira de Cinzas'),
+    (60, 'Corpus Christi'),
+]
+
+# Feriados regionais por entidade (opcional): CSV com colunas entities_id, month, day, name e,
+# opcionalmente, year (vazio = todo ano)
+REGIONAL_HOLIDAYS_PATH = 'config/regional_holidays.csv'
+
+def easter_sunday(year: int) -> date:
+    """Domingo de Páscoa (calendário gregoriano, algoritmo anônimo de Meeus/Jones/Butcher)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+@lru_cache(maxsize=32)
+def _national_holidays(start_year: int, end_year: int, include_optional: bool) -> pd.DataFrame:
+    rows = []
+    for year in range(start_year, end_year + 1):
+        for month, day, name, since in NATIONAL_FIXED_HOLIDAYS:
+            if since is None or year >= since:
+                rows.append((pd.Timestamp(year, month, day), name))
+        easter = easter_sunday(year)
+        moveable = NATIONAL_MOVEABLE_HOLIDAYS + (OPTIONAL_MOVEABLE_HOLIDAYS if include_optional else [])
+        for offset, name in moveable:
+            rows.append((pd.Timestamp(easter + timedelta(days=offset)), name))
+
+    df = pd.DataFrame(rows, columns=['date', 'holiday_name'])
+    return df.drop_duplicates(subset=['date']).sort_values('date').reset_index(drop=True)
+
+def national_holidays(start_year: int, end_year: int, include_optional: bool = False) -> pd.DataFrame:
+    """Feriados nacionais (fixos e móveis) entre start_year e end_year: colunas date e holiday_name."""
+    return _national_holidays(start_year, end_year, include_optional).copy()
+
+def load_regional_holidays(path: str = REGIONAL_HOLIDAYS_PATH) -> pd.DataFrame:
+    """Carrega os feriados regionais por entidade (vazio se o arquivo não existir)."""
+    columns = ['entities_id', 'month', 'day', 'year', 'name']
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    df = pd.read_csv(path)
+    if 'year' not in df.columns:
+        df['year'] = np.nan
+    return df[columns]
+
+def build_holiday_table(start_date, end_date, include_optional: bool = False) -> pd.DataFrame:
+    """
+    Tabela pré-computada indexada por data (um registro por dia de [start_date, end_date]),
+    com is_holiday (int8) e holiday_name. Feita para junções vetorizadas por data.
+    """
+    days = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq='D')
+    if len(days) == 0:
+        return pd.DataFrame({'is_holiday': pd.Series(dtype='int8'), 'holiday_name': pd.Series(dtype=object)},
+                            index=pd.DatetimeIndex([], name='date'))
+
+    holidays = national_holidays(days[0].year, days[-1].year, include_optional).set_index('date')
+    table = pd.DataFrame(index=pd.DatetimeIndex(days, name='date'))
+    table['holiday_name'] = holidays['holiday_name'].reindex(table.index)
+    table['is_holiday'] = table['holiday_name'].notna().astype('int8')
+    return table[['is_holiday', 'holiday_name']]
+
+def build_regional_holiday_table(start_date, end_date, regional: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Sobreposição regional: uma linha por (date, entities_id) que é feriado apenas naquela entidade.
+    'regional' segue o formato de load_regional_holidays (padrão: lê REGIONAL_HOLIDAYS_PATH).
+    """
+    regional = load_regional_holidays() if regional is None else regional
+    columns = ['date', 'entities_id', 'holiday_name']
+    if regional.empty:
+        return pd.DataFrame(columns=columns)
+
+    start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    rows = []
+    for rec in regional.itertuples(index=False):
+        years = [int(rec.year)] if pd.notna(rec.year) else range(start.year, end.year + 1)
+        for year in years:
+            day = pd.Timestamp(year, int(rec.month), int(rec.day))
+            if start <= day <= end:
+                rows.append((day, int(rec.entities_id), rec.name))
+    return pd.DataFrame(rows, columns=columns)
+
+def holiday_flags(dates: pd.Series, holiday_table: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """
+    is_holiday vetorizado para uma série de datas (sem .apply por linha).
+    Usa a tabela pré-computada se fornecida; caso contrário, monta uma para o intervalo das datas.
+    """
+    days = pd.to_datetime(dates).dt.normalize()
+    if days.empty:
+        return np.zeros(0, dtype=np.int8)
+    if holiday_table is None:
+        holiday_table = build_holiday_table(days.min(), days.max())
+    holiday_days = holiday_table.index[holiday_table['is_holiday'] == 1]
+    return days.isin(holiday_days).to_numpy().astype(np.int8)
+
+def apply_regional_holidays(df: pd.DataFrame, regional_table: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Marca is_holiday=1 nas linhas (date, entities_id) que são feriado regional da entidade.
+    Sem sobreposições configuradas, o DataFrame volta inalterado.
+    """
+    if regional_table is None:
+        if df.empty:
+            return df
+        regional_table = build_regional_holiday_table(df['date'].min(), df['date'].max())
+    if regional_table.empty:
+        return df
+
+    keys = pd.MultiIndex.from_frame(regional_table[['date', 'entities_id']])
+    is_regional = pd.MultiIndex.from_frame(df[['date', 'entities_id']]).isin(keys)
+    df['is_holiday'] = np.where(is_regional, 1, df['is_holiday']).astype(df['is_holiday'].dtype)
+    return df
+
+# Colunas de calendário gravadas na Tabela Fato Diária (RF02)
+CALENDAR_COLUMNS = ['day_of_week', 'is_weekend', 'month', 'year', 'is_holiday']
+
+@lru_cache(maxsize=32)
+def _calendar_dimension(start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    dim = build_holiday_table(start, end).reset_index()
+    # Tipos compactos (mesmo schema da tabela fato, ver src.data.schema)
+    dim['day'] = dim['date'].dt.day.astype('int8')
+    dim['day_of_week'] = dim['date'].dt.dayofweek.astype('int8') # 0=Segunda, 6=Domingo
+    dim['day_of_year'] = dim['date'].dt.dayofyear.astype('int16')
+    dim['is_weekend'] = dim['day_of_week'].isin([5, 6]).astype('int8')
+    dim['month'] = dim['date'].dt.month.astype('int8')
+    dim['year'] = dim['date'].dt.year.astype('int16')
+    return dim[['date', 'day', 'day_of_week', 'day_of_year', 'is_weekend', 'month', 'year', 'is_holiday', 'holiday_name']]
+
+def build_calendar_dimension(start_date, end_date) -> pd.DataFrame:
+    """
+    Dimensão calendário compartilhada: uma linha por dia de [start_date, end_date] com
+    day, day_of_week, day_of_year, is_weekend, month, year, is_holiday e holiday_name.
+    Calculada uma vez por intervalo (cache), ou seja, O(dias) e não O(tickets).
+    """
+    start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    return _calendar_dimension(start, end).copy()
+
+def join_calendar(df: pd.DataFrame, columns: List[str] = CALENDAR_COLUMNS,
+                  calendar: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Junta as colunas da dimensão calendário pela chave 'date' (datas normalizadas).
+    A junção é posicional: o deslocamento em dias desde o início da dimensão indexa
+    diretamente os arrays do calendário, sem merge por hash e preservando a ordem das linhas.
+    """
+    if df.empty:
+        for col in columns:
+            df[col] = pd.Series(dtype='int64')
+        return df
+
+    dates = pd.to_datetime(df['date'])
+    if calendar is None:
+        calendar = build_calendar_dimension(dates.min(), dates.max())
+    start = calendar['date'].iloc[0]
+    offsets = ((dates - start) // pd.Timedelta(days=1)).to_numpy()
+    if offsets.min() < 0 or offsets.max() >= len(calendar):
+        raise ValueError("Datas fora do intervalo da dimensão calendário.")
+
+    for col in columns:
+        df[col] = calendar[col].to_numpy()[offsets]
+    return df
@@ -1,13 +1,39 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.data.fact_store import read_fact_table, fact_table_files
+from src.data.schema import FACT_TABLE_DTYPES, memory_report
 
 FILE_PATH = 'data/processed/daily_fact_table.parquet'
+REPORT_PATH = 'data/processed/fact_table_validation.json'
+
+# Limites da validação (sobrescrevíveis com --thresholds arquivo.json). Checagens 'error'
+# reprovam o relatório (e o pipeline, com --fail-on-error); 'warning' só sinalizam.
+VALIDATION_THRESHOLDS = {
+    'min_rows': 1,                       # error: tabela vazia
+    'max_key_nulls': 0,                  # error: nulos em date/normalized_category/entities_id/volume
+    'min_volume': 1,                     # error: linha do fato sem ticket
+    'min_avg_ttr_hours': 0.0,            # error: TTR negativo
+    'max_outros_share': 0.10,            # error: fração do volume em 'OUTROS' (RN01)
+    'weekend_day_share': 2 / 7,          # error: fração de dias com is_weekend=1 (RF02)
+    'weekend_day_share_tolerance': 0.05,
+    'max_weekend_flag_mismatches': 0,    # error: is_weekend divergente do dia da semana
+    'max_consecutive_missing_days': 4,   # warning: buraco de dias sem nenhum ticket (feriadões)
+    'ttr_outlier_iqr_factor': 3.0,       # warning: outlier = acima de Q3 + fator * IQR
+    'max_ttr_outlier_share': 0.05,
+    'max_staleness_days': 7,             # warning: última data muito antiga
+}
 
 def inspect_fact_table(file_path: str):
     """Carrega a tabela fato e exibe estatísticas para validação."""
     try:
         # Tenta carregar o arquivo Parquet
-        df_fact = pd.read_parquet(file_path)
+        df_fact = read_fact_table(file_path)
     except FileNotFoundError:
         print(f"ERRO: Arquivo {file_path} não encontrado. Certifique-se de que foi gerado.")
         return
@@ -33,7 +59,7 @@ def inspect_fact_table(file_path: str):
     print(f"Total de Categorias Únicas Mapeadas: {num_unique_categories}")
     print(f"Volume de tickets agrupados em 'OUTROS': {outros_count} (Correto se for baixo)")
     print("Top 5 Categorias por Volume (Sanidade):")
-    print(df_fact.groupby('normalized_category')['volume'].sum().nlargest(5))
+    print(df_fact.groupby('normalized_category', observed=True)['volume'].sum().nlargest(5))
 
     # 4. Validação de Features de Tempo (RF02)
     print("\n4. Validação de Features de Tempo (RF02):")
@@ -46,9 +72,223 @@ def inspect_fact_table(file_path: str):
     print("\n5. Estatísticas do TTR Médio (KPI02):")
     print(df_fact['avg_ttr_hours'].describe())
     
+    # 6. Schema compacto e memória (comparação com o layout antigo: object/int64/float64)
+    print("\n6. Schema e Uso de Memória:")
+    divergent = {col: str(df_fact[col].dtype) for col, dtype in FACT_TABLE_DTYPES.items()
+                 if col in df_fact.columns and str(df_fact[col].dtype) != dtype}
+    if divergent:
+        print(f"⚠️ Colunas fora do schema compacto: {divergent}")
+    report = memory_report(df_fact)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    total = report.iloc[-1]
+    print(f"Memória: {total['bytes'] / 1024 ** 2:.2f} MB (layout antigo: {total['legacy_bytes'] / 1024 ** 2:.2f} MB)")
+
     # Confirmação da granularidade diária
     print(f"\nTotal de linhas no Fato Diário: {len(df_fact)}")
     print("-" * 50)
 
+# --- Validação rápida (metadados do Parquet + leituras com poda de colunas) ---
+
+def _fact_files(file_path: str) -> List[str]:
+    return [file_path] if os.path.isfile(file_path) else fact_table_files(file_path)
+
+def read_footer_stats(files: List[str]) -> Dict:
+    """
+    Agrega as estatísticas dos rodapés Parquet (sem ler dados): linhas, row groups e,
+    por coluna, nulos e mínimo/máximo (quando o escritor registrou estatísticas).
+    """
+    stats = {'files': len(files), 'row_groups': 0, 'rows': 0, 'columns': {}}
+    schema = None
+    for file in files:
+        metadata = pq.ParquetFile(file).metadata
+        schema = schema or metadata.schema.to_arrow_schema()
+        stats['rows'] += metadata.num_rows
+        stats['row_groups'] += metadata.num_row_groups
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                chunk = row_group.column(j)
+                col = stats['columns'].setdefault(chunk.path_in_schema, {'null_count': 0, 'min': None, 'max': None, 'complete': True})
+                chunk_stats = chunk.statistics
+                if chunk_stats is None:
+                    col['complete'] = False
+                    continue
+                if chunk_stats.has_null_count:
+                    col['null_count'] += chunk_stats.null_count
+                else:
+                    col['complete'] = False
+                if chunk_stats.has_min_max:
+                    col['min'] = chunk_stats.min if col['min'] is None else min(col['min'], chunk_stats.min)
+                    col['max'] = chunk_stats.max if col['max'] is None else max(col['max'], chunk_stats.max)
+                elif chunk.num_values:
+                    col['complete'] = False
+    stats['schema'] = schema
+    return stats
+
+def _check(name: str, source: str, value, threshold, passed: bool, severity: str = 'error') -> Dict:
+    return {'name': name, 'source': source, 'value': value, 'threshold': threshold,
+            'passed': bool(passed), 'severity': severity}
+
+def _json_value(value):
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating,)):
+        return None if np.isnan(value) else round(float(value), 6)
+    if isinstance(value, float):
+        return None if np.isnan(value) else round(value, 6)
+    return value
+
+def _arrow_type_matches(arrow_type: pa.DataType, dtype: str) -> bool:
+    if dtype == 'category':
+        return pa.types.is_dictionary(arrow_type)
+    return str(arrow_type) == str(pa.from_numpy_dtype(np.dtype(dtype)))
+
+def metadata_checks(stats: Dict, thresholds: Dict) -> List[Dict]:
+    """Checagens respondidas só pelos rodapés: linhas, nulos, intervalos de valores e schema."""
+    checks = [_check('row_count', 'metadata', stats['rows'], thresholds['min_rows'], stats['rows'] >= thresholds['min_rows'])]
+    columns = stats['columns']
+
+    for col in ['date', 'normalized_category', 'entities_id', 'volume']:
+        info = columns.get(col)
+        nulls = info['null_count'] if info else None
+        checks.append(_check(f'null_count_{col}', 'metadata', nulls, thresholds['max_key_nulls'],
+                             info is not None and nulls <= thresholds['max_key_nulls']))
+
+    volume_min = columns.get('volume', {}).get('min')
+    checks.append(_check('volume_min', 'metadata', volume_min, thresholds['min_volume'],
+                         volume_min is not None and volume_min >= thresholds['min_volume']))
+    ttr_min = columns.get('avg_ttr_hours', {}).get('min')
+    checks.append(_check('avg_ttr_hours_min', 'metadata', ttr_min, thresholds['min_avg_ttr_hours'],
+                         ttr_min is None or ttr_min >= thresholds['min_avg_ttr_hours']))
+
+    date_max = columns.get('date', {}).get('max')
+    staleness = (pd.Timestamp.now().normalize() - pd.Timestamp(date_max).normalize()).days if date_max is not None else None
+    checks.append(_check('staleness_days', 'metadata', staleness, thresholds['max_staleness_days'],
+                         staleness is not None and staleness <= thresholds['max_staleness_days'], 'warning'))
+
+    schema = stats['schema']
+    divergent = {col: str(schema.field(col).type) for col, dtype in FACT_TABLE_DTYPES.items()
+                 if schema is not None and col in schema.names and not _arrow_type_matches(schema.field(col).type, dtype)}
+    checks.append(_check('compact_schema', 'metadata', divergent or None, 'src.data.schema.FACT_TABLE_DTYPES',
+                         not divergent, 'warning'))
+    return checks
+
+def data_checks(file_path: str, thresholds: Dict) -> List[Dict]:
+    """Checagens mais pesadas, vetorizadas sobre uma leitura só das colunas necessárias."""
+    df = read_fact_table(file_path, columns=['date', 'normalized_category', 'volume', 'is_weekend', 'avg_ttr_hours'])
+    checks = []
+
+    # RN01: fração do volume que caiu em 'OUTROS'
+    volume = df['volume'].to_numpy(dtype=np.int64)
+    total_volume = int(volume.sum())
+    outros_share = volume[(df['normalized_category'] == 'OUTROS').to_numpy()].sum() / total_volume if total_volume else np.nan
+    checks.append(_check('outros_volume_share', 'data', outros_share, thresholds['max_outros_share'],
+                         total_volume > 0 and outros_share <= thresholds['max_outros_share']))
+
+    # RF02: flag de fim de semana coerente com a data e proporção de dias de fim de semana
+    days = df[['date', 'is_weekend']].drop_duplicates('date')
+    mismatches = int((days['is_weekend'].to_numpy() != (days['date'].dt.dayofweek >= 5).to_numpy()).sum())
+    checks.append(_check('weekend_flag_mismatches', 'data', mismatches, thresholds['max_weekend_flag_mismatches'],
+                         mismatches <= thresholds['max_weekend_flag_mismatches']))
+    weekend_share = days['is_weekend'].mean() if len(days) else np.nan
+    tolerance = thresholds['weekend_day_share_tolerance']
+    checks.append(_check('weekend_day_share', 'data', weekend_share,
+                         [round(thresholds['weekend_day_share'] - tolerance, 4), round(thresholds['weekend_day_share'] + tolerance, 4)],
+                         len(days) < 28 or abs(weekend_share - thresholds['weekend_day_share']) <= tolerance))
+
+    # Buracos de dias sem nenhum ticket entre a primeira e a última data
+    present = np.sort(days['date'].to_numpy().astype('datetime64[D]'))
+    gaps = np.diff(present).astype(np.int64) - 1 if len(present) > 1 else np.zeros(0, dtype=np.int64)
+    max_gap = int(gaps.max()) if len(gaps) else 0
+    checks.append(_check('max_consecutive_missing_days', 'data', max_gap, thresholds['max_consecutive_missing_days'],
+                         max_gap <= thresholds['max_consecutive_missing_days'], 'warning'))
+    checks.append(_check('missing_days', 'data', int(gaps.sum()), None, True, 'warning'))
+
+    # KPI02: outliers de TTR médio (cerca de Tukey sobre o próprio fato)
+    ttr = df['avg_ttr_hours'].dropna().to_numpy(dtype=np.float64)
+    if len(ttr):
+        q1, q3 = np.percentile(ttr, [25, 75])
+        fence = q3 + thresholds['ttr_outlier_iqr_factor'] * (q3 - q1)
+        outlier_share = float((ttr > fence).mean())
+    else:
+        fence, outlier_share = np.nan, 0.0
+    checks.append(_check('ttr_outlier_share', 'data', outlier_share, thresholds['max_ttr_outlier_share'],
+                         outlier_share <= thresholds['max_ttr_outlier_share'], 'warning'))
+    checks.append(_check('ttr_outlier_fence_hours', 'data', fence, None, True, 'warning'))
+    return checks
+
+def validate_fact_table(file_path: str = FILE_PATH, thresholds: Optional[Dict] = None,
+                        metadata_only: bool = False) -> Dict:
+    """
+    Valida a tabela fato e devolve um relatório estruturado (serializável em JSON):
+    metadados do rodapé, lista de checagens com valor/limite/resultado e status
+    'pass' ou 'fail' (falha se alguma checagem de severidade 'error' não passar).
+    """
+    thresholds = {**VALIDATION_THRESHOLDS, **(thresholds or {})}
+    files = _fact_files(file_path)
+    stats = read_footer_stats(files)
+
+    checks = metadata_checks(stats, thresholds)
+    if not metadata_only and stats['rows'] > 0:
+        checks += data_checks(file_path, thresholds)
+
+    for check in checks:
+        check['value'] = _json_value(check['value'])
+    failed = [c['name'] for c in checks if not c['passed'] and c['severity'] == 'error']
+    warnings = [c['name'] for c in checks if not c['passed'] and c['severity'] == 'warning']
+    date_stats = stats['columns'].get('date', {})
+
+    return {
+        'path': file_path,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'status': 'fail' if failed else 'pass',
+        'failed_checks': failed,
+        'warnings': warnings,
+        'metadata': {
+            'files': stats['files'],
+            'row_groups': stats['row_groups'],
+            'rows': stats['rows'],
+            'date_min': _json_value(date_stats.get('min')),
+            'date_max': _json_value(date_stats.get('max')),
+            'null_counts': {col: info['null_count'] for col, info in stats['columns'].items()},
+        },
+        'thresholds': thresholds,
+        'checks': checks,
+    }
+
 if __name__ == "__main__":
-    inspect_fact_table(FILE_PATH)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validação da Tabela Fato Diária.")
+    parser.add_argument('--path', default=FILE_PATH)
+    parser.add_argument('--full', action='store_true', help="Inspeção completa anterior (carrega a tabela inteira).")
+    parser.add_argument('--metadata-only', action='store_true', help="Só as checagens dos rodapés Parquet.")
+    parser.add_argument('--thresholds', help="JSON com limites que substituem VALIDATION_THRESHOLDS.")
+    parser.add_argument('--report', default=REPORT_PATH, help="Arquivo do relatório JSON.")
+    parser.add_argument('--fail-on-error', action='store_true', help="Código de saída 1 se o relatório reprovar.")
+    args = parser.parse_args()
+
+    if args.full:
+        inspect_fact_table(args.path)
+        exit()
+
+    try:
+        custom = None
+        if args.thresholds:
+            with open(args.thresholds, 'r', encoding='utf-8') as f:
+                custom = json.load(f)
+        report = validate_fact_table(args.path, custom, metadata_only=args.metadata_only)
+    except FileNotFoundError:
+        print(f"ERRO: Arquivo {args.path} não encontrado. Certifique-se de que foi gerado.")
+        exit(1)
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    for check in report['checks']:
+        mark = '✅' if check['passed'] else ('❌' if check['severity'] == 'error' else '⚠️')
+        print(f"{mark} [{check['source']}] {check['name']}: {check['value']} (limite: {check['threshold']})")
+    print(f"\nStatus: {report['status'].upper()} — relatório salvo em {args.report}")
+    if args.fail_on_error and report['status'] == 'fail':
+        exit(1)
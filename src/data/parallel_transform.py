@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+import pandas as pd
+from src.data.quantile_sketch import TDigest, merge_group_sketches
+from src.data.raw_store import read_raw_tickets
+from src.data.transform import (
+    TRANSFORM_COLUMNS, TTR_GLOBAL_KEY, partial_aggregates, finalize_partial_aggregates,
+    merge_ttr_counts, ttr_digest_from_counts,
+)
+
+# Modo paralelo do ETL: os tickets são particionados por entities_id e cada shard (conjunto
+# de entidades) roda limpeza, taxonomia e agregação num processo separado. Como as chaves da
+# tabela fato incluem entities_id, os shards produzem grupos disjuntos; só a mediana global
+# do TTR (RN03) depende de todos, e ela vem da soma dos histogramas exatos de TTR dos shards
+# (mesmo sketch canônico da passada única: saída idêntica para qualquer número de workers).
+
+# Padrão de processos do modo paralelo (configurável pelo .env)
+DEFAULT_ETL_WORKERS = int(os.getenv("ETL_WORKERS", os.cpu_count() or 1))
+
+def shard_entities(entity_counts: pd.Series, n_shards: int) -> List[List[int]]:
+    """
+    Distribui as entidades em até n_shards shards equilibrando o número de tickets
+    (maior primeiro, sempre no shard mais leve). Determinístico para a mesma entrada.
+    """
+    counts = entity_counts.sort_index().sort_values(ascending=False, kind='mergesort')
+    n_shards = max(1, min(n_shards, len(counts)))
+    shards = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+    for entity, count in counts.items():
+        target = loads.index(min(loads))
+        shards[target].append(int(entity))
+        loads[target] += int(count)
+    return [sorted(shard) for shard in shards if shard]
+
+def _shard_rows(entities: pd.Series, shard: List[Optional[int]]) -> pd.Series:
+    """Máscara das linhas do shard (None no shard = tickets sem entidade)."""
+    mask = entities.isin([e for e in shard if e is not None])
+    return mask | entities.isna() if None in shard else mask
+
+def _aggregate_shard(df_shard: pd.DataFrame, category_mapping: Dict[str, str]) -> Tuple[pd.DataFrame, Dict[str, TDigest], pd.Series]:
+    if df_shard.empty:
+        return None, {}, None
+    return partial_aggregates(df_shard, category_mapping)
+
+def _aggregate_raw_shard(raw_path: str, entities: List[Optional[int]], start_date: Optional[datetime],
+                         end_date: Optional[datetime], category_mapping: Dict[str, str]):
+    """Worker: lê do dataset bruto apenas as entidades do shard (filtro no scan) e agrega."""
+    df_shard = read_raw_tickets(raw_path, columns=TRANSFORM_COLUMNS, start_date=start_date,
+                                end_date=end_date, entities=entities)
+    return _aggregate_shard(df_shard, category_mapping)
+
+def process_data_parallel(source: Union[pd.DataFrame, str], category_mapping: Dict[str, str],
+                          n_workers: int = DEFAULT_ETL_WORKERS,
+                          start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                          ttr_sketches: Optional[Dict[str, TDigest]] = None) -> pd.DataFrame:
+    """
+    Versão paralela do process_data, com shards por entities_id num pool de processos.
+    'source' é um DataFrame de tickets ou o caminho do dataset bruto (cada worker lê o próprio
+    shard, sem serializar tickets entre processos; start_date/end_date limitam a janela).
+    Os histogramas de TTR dos shards são somados e a mediana do sketch canônico resultante é
+    usada na imputação de todos os shards (a mesma do process_data); a saída é ordenada por
+    (date, categoria, entidade).
+    """
+    if isinstance(source, pd.DataFrame):
+        # Deduplicação global por id (RN03) antes de particionar: um id repetido pode estar
+        # em entidades diferentes e cairia em shards diferentes
+        opened_at = pd.to_datetime(source['opened_at'], errors='coerce')
+        df = source[opened_at.notna()].drop_duplicates(subset=['id'], keep='first')
+        entities = df['entities_id']
+    else:
+        entities = read_raw_tickets(source, columns=['entities_id'], start_date=start_date,
+                                    end_date=end_date)['entities_id']
+
+    shards = shard_entities(entities.value_counts(), n_workers)
+    if shards and entities.isna().any():
+        # Tickets sem entidade não geram linhas na tabela fato, mas entram na mediana do TTR:
+        # vão para o primeiro shard
+        shards[0].append(None)
+    if not shards:
+        print("Nenhum ticket para processar no modo paralelo.")
+        return pd.DataFrame()
+
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        if isinstance(source, pd.DataFrame):
+            futures = [executor.submit(_aggregate_shard, df[_shard_rows(df['entities_id'], shard)], category_mapping)
+                       for shard in shards]
+        else:
+            futures = [executor.submit(_aggregate_raw_shard, source, shard, start_date, end_date, category_mapping)
+                       for shard in shards]
+        results = [future.result() for future in futures] # Ordem dos shards, não de término
+
+    # Sketches por categoria mesclados em ordem fixa (KPIs); histogramas somados -> sketch
+    # global canônico e mediana única para todos os shards
+    sketches = {} if ttr_sketches is None else ttr_sketches
+    partials = []
+    ttr_counts = None
+    for partial, shard_sketches, shard_counts in results:
+        if partial is None:
+            continue
+        partials.append(partial)
+        merge_group_sketches(sketches, shard_sketches)
+        ttr_counts = merge_ttr_counts(ttr_counts, shard_counts)
+    sketches[TTR_GLOBAL_KEY] = ttr_digest_from_counts(ttr_counts)
+    ttr_median = sketches[TTR_GLOBAL_KEY].median()
+
+    # Grupos disjuntos entre shards (entities_id faz parte da chave): basta concatenar
+    df_fact = finalize_partial_aggregates(pd.concat(partials), ttr_median)
+    print(f"Tabela Fato Diária gerada (paralelo, {len(shards)} shards por entidade). "
+          f"Total de linhas (dias/categorias): {len(df_fact)}")
+    return df_fact
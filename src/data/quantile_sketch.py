@@ -0,0 +1,186 @@
+import json
+from typing import Dict, Hashable, Iterable, Optional
+import numpy as np
+import pandas as pd
+
+# Sketch de quantis mesclável (t-digest com função de escala k1) para o TTR (KPI02).
+# Construído bloco a bloco e combinável entre blocos/workers: permite imputar a mediana
+# (RN03) e calcular P50/P90 sem manter todos os tickets em memória.
+
+DEFAULT_COMPRESSION = 500 # ~compression/2 centróides; perto da mediana cada um cobre ~pi/compression (~0,6%) do rank
+
+class TDigest:
+    """
+    t-digest em numpy puro: centróides (média, peso) ordenados, mais densos nas caudas.
+    update() e merge() recomprimem de forma vetorizada; quantile() interpola entre centróides.
+    Cada centróide guarda também o menor e o maior valor que absorveu: centróides de um valor
+    só (empates, comuns no TTR em horas inteiras) devolvem o valor exato.
+    """
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = float(compression)
+        self.means = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.lows = np.zeros(0, dtype=np.float64)
+        self.highs = np.zeros(0, dtype=np.float64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _scale(self, q: np.ndarray) -> np.ndarray:
+        # k1(q) = delta / (2*pi) * asin(2q - 1): centróides pequenos perto de q=0 e q=1
+        return self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray, lows: np.ndarray, highs: np.ndarray) -> None:
+        order = np.argsort(means, kind='mergesort')
+        means, weights, lows, highs = means[order], weights[order], lows[order], highs[order]
+        total = weights.sum()
+
+        # Cada ponto vai para o "degrau" de k do seu início; pontos consecutivos no mesmo
+        # degrau viram um centróide (cada centróide cobre no máximo ~1 unidade de k)
+        q_start = (np.cumsum(weights) - weights) / total
+        bins = np.floor(self._scale(q_start)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+        new_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / new_weights
+        self.weights = new_weights
+        self.lows = np.minimum.reduceat(lows, starts)
+        self.highs = np.maximum.reduceat(highs, starts)
+
+    def update(self, values, weights=None) -> 'TDigest':
+        """Adiciona valores (nulos são ignorados). Valores repetidos são pré-agregados."""
+        values = np.asarray(values, dtype=np.float64)
+        if weights is None:
+            valid = ~np.isnan(values)
+            values, weights = np.unique(values[valid], return_counts=True)
+            weights = weights.astype(np.float64)
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            valid = ~np.isnan(values) & (weights > 0)
+            values, weights = values[valid], weights[valid]
+        if len(values) == 0:
+            return self
+
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.r_[self.means, values], np.r_[self.weights, weights],
+                       np.r_[self.lows, values], np.r_[self.highs, values])
+        return self
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        """Incorpora outro sketch (de outro bloco ou worker)."""
+        if len(other.weights) == 0:
+            return self
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.r_[self.means, other.means], np.r_[self.weights, other.weights],
+                       np.r_[self.lows, other.lows], np.r_[self.highs, other.highs])
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Quantil aproximado q em [0, 1] (NaN se o sketch estiver vazio)."""
+        n = len(self.weights)
+        if n == 0:
+            return np.nan
+        if n == 1:
+            return float(self.means[0])
+
+        total = self.weights.sum()
+        target = q * total
+        cumulative = np.cumsum(self.weights)
+
+        # Alvo dentro de um centróide de valor único: o valor é exato
+        i = min(int(np.searchsorted(cumulative, target, side='left')), n - 1)
+        if self.lows[i] == self.highs[i]:
+            return float(self.lows[i])
+
+        # Centro de cada centróide na escala de rank
+        centers = cumulative - self.weights / 2
+
+        if target <= centers[0]:
+            return float(self._interpolate(0.0, self.min, centers[0], self.means[0], target))
+        if target >= centers[-1]:
+            return float(self._interpolate(centers[-1], self.means[-1], total, self.max, target))
+        i = int(np.searchsorted(centers, target, side='right')) - 1
+        return float(self._interpolate(centers[i], self.means[i], centers[i + 1], self.means[i + 1], target))
+
+    @staticmethod
+    def _interpolate(x0: float, y0: float, x1: float, y1: float, x: float) -> float:
+        if x1 <= x0:
+            return y0
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def to_dict(self) -> dict:
+        return {
+            'compression': self.compression,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist(),
+            'lows': self.lows.tolist(),
+            'highs': self.highs.tolist(),
+            'min': None if np.isinf(self.min) else self.min,
+            'max': None if np.isinf(self.max) else self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TDigest':
+        digest = cls(data.get('compression', DEFAULT_COMPRESSION))
+        digest.means = np.asarray(data['means'], dtype=np.float64)
+        digest.weights = np.asarray(data['weights'], dtype=np.float64)
+        digest.lows = np.asarray(data['lows'], dtype=np.float64)
+        digest.highs = np.asarray(data['highs'], dtype=np.float64)
+        digest.min = np.inf if data.get('min') is None else float(data['min'])
+        digest.max = -np.inf if data.get('max') is None else float(data['max'])
+        return digest
+
+def digest_from_counts(values, counts, compression: float = DEFAULT_COMPRESSION) -> TDigest:
+    """
+    Sketch canônico a partir de contagens por valor distinto: depende só do conjunto de valores
+    e contagens, não da ordem nem de como os tickets foram divididos em blocos/workers (igual
+    ao update() de uma passada única sobre todos os valores).
+    """
+    return TDigest(compression).update(values, np.asarray(counts, dtype=np.float64))
+
+# --- Sketches por grupo (ex.: global + por categoria) ---
+
+def update_group_sketches(sketches: Dict[Hashable, TDigest], values: pd.Series, keys: pd.Series,
+                          compression: float = DEFAULT_COMPRESSION) -> Dict[Hashable, TDigest]:
+    """Atualiza um sketch por chave (um groupby por bloco, não por ticket)."""
+    for key, group in pd.Series(values.to_numpy(), index=keys.to_numpy()).groupby(level=0, observed=True):
+        sketches.setdefault(key, TDigest(compression)).update(group.to_numpy())
+    return sketches
+
+def merge_group_sketches(sketches: Dict[Hashable, TDigest], others: Dict[Hashable, TDigest]) -> Dict[Hashable, TDigest]:
+    """Combina dois dicionários de sketches por chave (resultado em 'sketches')."""
+    for key, digest in others.items():
+        if key in sketches:
+            sketches[key].merge(digest)
+        else:
+            sketches[key] = TDigest.from_dict(digest.to_dict())
+    return sketches
+
+def save_sketches(sketches: Dict[Hashable, TDigest], path: str) -> None:
+    """Persiste os sketches em JSON (chaves como texto) para mesclar com execuções futuras."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({str(key): digest.to_dict() for key, digest in sketches.items()}, f)
+
+def load_sketches(path: str) -> Dict[str, TDigest]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return {key: TDigest.from_dict(data) for key, data in json.load(f).items()}
+
+def sketches_to_frame(sketches: Dict[Hashable, TDigest], key_name: str,
+                      quantiles: Iterable[float] = (0.5, 0.9), value_name: str = 'value') -> pd.DataFrame:
+    """Tabela com contagem e quantis de cada sketch: colunas {value_name}_count e {value_name}_p50, _p90 ... (ex.: ttr_p50, ttr_p90)."""
+    rows = []
+    for key, digest in sketches.items():
+        row = {key_name: key, f'{value_name}_count': int(digest.count)}
+        for q in quantiles:
+            row[f'{value_name}_p{int(round(q * 100))}'] = digest.quantile(q)
+        rows.append(row)
+    return pd.DataFrame(rows)
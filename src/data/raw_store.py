@@ -0,0 +1,264 @@
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Dataset bruto de tickets: Parquet particionado por ano/mês de abertura (hive: year=YYYY/month=M)
+RAW_STORE_PATH = 'data/raw/glpi_tickets'
+
+# Schema explícito do dataset bruto (substitui o CSV sem tipos)
+RAW_TICKETS_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('opened_at', pa.timestamp('us')),
+    ('solvedate', pa.timestamp('us')),
+    ('closedate', pa.timestamp('us')),
+    ('status', pa.int8()),
+    ('priority', pa.int8()),
+    ('itilcategories_id', pa.int32()),
+    ('category_path', pa.dictionary(pa.int32(), pa.string())),
+    ('entities_id', pa.int32()),
+    ('time_to_resolve', pa.float64()), # Segundos (valores não numéricos viram nulos, como no transform)
+    ('hours_to_solve', pa.int32()),
+    ('date_mod', pa.timestamp('us')),
+    ('year', pa.int16()),
+    ('month', pa.int8()),
+])
+
+PARTITION_SCHEMA = pa.schema([('year', pa.int16()), ('month', pa.int8())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+_TIMESTAMP_COLS = ['opened_at', 'solvedate', 'closedate', 'date_mod']
+_INT_COLS = ['id', 'status', 'priority', 'itilcategories_id', 'entities_id', 'hours_to_solve']
+
+def to_raw_table(df: pd.DataFrame) -> pa.Table:
+    """Converte um bloco de tickets (saída do SQL) para uma tabela Arrow no schema do dataset bruto."""
+    df = df.copy()
+
+    # date_mod é opcional (extrações antigas não o traziam): usa a data de abertura
+    if 'date_mod' not in df.columns:
+        df['date_mod'] = df['opened_at']
+
+    for col in _TIMESTAMP_COLS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in _INT_COLS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # time_to_resolve chega como número (segundos) ou como datetime, dependendo da config do GLPI.
+    # Só o formato numérico é aproveitado; o transform cai no hours_to_solve nos demais casos.
+    if pd.api.types.is_numeric_dtype(df['time_to_resolve']):
+        df['time_to_resolve'] = df['time_to_resolve'].astype('float64')
+    else:
+        df['time_to_resolve'] = pd.to_numeric(df['time_to_resolve'].astype('string'), errors='coerce').astype('float64')
+
+    df['category_path'] = df['category_path'].astype('string')
+    df['year'] = df['opened_at'].dt.year
+    df['month'] = df['opened_at'].dt.month
+    df = df.dropna(subset=['opened_at']) # Sem data de abertura não há partição (o transform também descarta)
+
+    columns = RAW_TICKETS_SCHEMA.names
+    table = pa.Table.from_pandas(df[columns], preserve_index=False)
+    return table.cast(RAW_TICKETS_SCHEMA, safe=False)
+
+def _iter_batches(chunks: Iterable[pd.DataFrame]) -> Iterator[pa.RecordBatch]:
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        yield from to_raw_table(chunk).to_batches()
+
+def _swap_directory(tmp_path: str, path: str) -> None:
+    """Troca o diretório 'path' pelo 'tmp_path' (renomeações, sem janela com dataset parcial)."""
+    old_path = f"{path}.old-{int(time.time())}"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+def write_raw_tickets(data: Union[pd.DataFrame, Iterable[pd.DataFrame]], path: str = RAW_STORE_PATH) -> int:
+    """
+    Grava o dataset bruto completo (substitui o existente), particionado por ano/mês.
+    Aceita um DataFrame ou um iterador de blocos (modo streaming): cada bloco é convertido
+    e gravado ao chegar, então o pico de memória não depende do tamanho do histórico.
+    Retorna o total de linhas gravadas.
+    """
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    total_rows = 0
+    def counted(batches):
+        nonlocal total_rows
+        for batch in batches:
+            total_rows += batch.num_rows
+            yield batch
+
+    try:
+        ds.write_dataset(
+            counted(_iter_batches(chunks)),
+            tmp_path,
+            schema=RAW_TICKETS_SCHEMA,
+            format='parquet',
+            partitioning=PARTITIONING,
+            existing_data_behavior='overwrite_or_ignore',
+        )
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True) # Descarta a saída parcial
+        raise
+
+    if total_rows > 0:
+        _swap_directory(tmp_path, path)
+    else:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return total_rows
+
+def _partition_dir(path: str, year: int, month: int) -> str:
+    return os.path.join(path, f"year={year}", f"month={month}")
+
+def read_raw_tickets_by_id(ids: Iterable[int], path: str = RAW_STORE_PATH,
+                           columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Versões gravadas dos ids pedidos, em qualquer partição (filtro por id aplicado no scan)."""
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns or RAW_TICKETS_SCHEMA.names)
+    id_filter = ds.field('id').isin([int(i) for i in ids])
+    return open_raw_dataset(path).to_table(columns=columns, filter=id_filter).to_pandas()
+
+def upsert_raw_tickets(df_new: pd.DataFrame, path: str = RAW_STORE_PATH) -> int:
+    """
+    Faz o upsert (chave: id) de tickets novos/alterados reescrevendo apenas as partições
+    de ano/mês afetadas. A versão com maior date_mod vence (empate: a nova). Se a alteração
+    mudou o opened_at de mês, a cópia antiga sai da partição original (busca por id em todas
+    as partições), então cada id fica em uma única partição.
+    Retorna o número de partições reescritas.
+    """
+    df_new_typed = to_raw_table(df_new).to_pandas()
+    new_ids = df_new_typed['id'].unique()
+
+    # Cópias já gravadas dos mesmos ids (em qualquer mês) disputam com as novas pelo date_mod
+    df_existing = read_raw_tickets_by_id(new_ids, path)
+    df_latest = (
+        pd.concat([df_existing, df_new_typed], ignore_index=True)
+        .sort_values(['id', 'date_mod'], kind='mergesort')
+        .drop_duplicates(subset=['id'], keep='last')
+    )
+    partitions = pd.concat([df_existing[['year', 'month']], df_latest[['year', 'month']]]).drop_duplicates()
+
+    rewritten = 0
+    for year, month in partitions.itertuples(index=False):
+        part_dir = _partition_dir(path, int(year), int(month))
+        df_part_new = df_latest[(df_latest['year'] == year) & (df_latest['month'] == month)]
+
+        if os.path.isdir(part_dir):
+            partition = (ds.field('year') == int(year)) & (ds.field('month') == int(month))
+            df_part_old = open_raw_dataset(path).to_table(filter=partition).to_pandas()
+            df_part_old = df_part_old[~df_part_old['id'].isin(new_ids)]
+            df_part = pd.concat([df_part_old, df_part_new], ignore_index=True)
+        else:
+            os.makedirs(part_dir, exist_ok=True)
+            df_part = df_part_new
+
+        if df_part.empty:
+            # Todos os tickets do mês mudaram de partição: remove o diretório vazio
+            shutil.rmtree(part_dir)
+            year_dir = os.path.dirname(part_dir)
+            if not os.listdir(year_dir):
+                os.rmdir(year_dir)
+            rewritten += 1
+            continue
+
+        df_part = df_part.sort_values(['opened_at', 'id'])
+        table_part = to_raw_table(df_part).drop_columns(['year', 'month'])
+
+        # Grava a partição nova num arquivo temporário e troca de forma atômica
+        tmp_file = os.path.join(part_dir, 'part-0.parquet.tmp')
+        pq.write_table(table_part, tmp_file)
+        for name in os.listdir(part_dir):
+            if name.endswith('.parquet'):
+                os.remove(os.path.join(part_dir, name))
+        os.replace(tmp_file, os.path.join(part_dir, 'part-0.parquet'))
+        rewritten += 1
+
+    return rewritten
+
+def _partition_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> Optional[ds.Expression]:
+    """Filtro em year/month (poda de partições) + filtro exato em opened_at."""
+    expr = None
+    year, month = ds.field('year'), ds.field('month')
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        expr_start = (year > start.year) | ((year == start.year) & (month >= start.month))
+        expr_start = expr_start & (ds.field('opened_at') >= pa.scalar(start.to_pydatetime(), pa.timestamp('us')))
+        expr = expr_start
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        expr_end = (year < end.year) | ((year == end.year) & (month <= end.month))
+        expr_end = expr_end & (ds.field('opened_at') < pa.scalar(end.to_pydatetime(), pa.timestamp('us')))
+        expr = expr_end if expr is None else expr & expr_end
+    return expr
+
+def open_raw_dataset(path: str = RAW_STORE_PATH) -> ds.Dataset:
+    """Abre o dataset bruto com o schema e o particionamento explícitos."""
+    return ds.dataset(path, schema=RAW_TICKETS_SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+def read_raw_tickets(path: str = RAW_STORE_PATH, columns: Optional[List[str]] = None,
+                     start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                     entities: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Lê o dataset bruto lendo apenas as colunas pedidas e as partições da janela [start_date, end_date).
+    'entities' restringe a leitura a um conjunto de entities_id (filtro aplicado no scan); um
+    None na lista inclui também os tickets sem entidade.
+    """
+    if not os.path.isdir(path):
+        raise FileNotFoundError(path)
+    dataset = open_raw_dataset(path)
+    expr = _partition_filter(start_date, end_date)
+    if entities is not None:
+        ids = [int(e) for e in entities if e is not None]
+        expr_entities = ds.field('entities_id').isin(ids)
+        if len(ids) < len(entities):
+            expr_entities = expr_entities | ds.field('entities_id').is_null()
+        expr = expr_entities if expr is None else expr & expr_entities
+    table = dataset.to_table(columns=columns, filter=expr)
+    return table.to_pandas()
+
+def iter_raw_tickets(path: str = RAW_STORE_PATH, columns: Optional[List[str]] = None,
+                     start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                     batch_size: int = 100000) -> Iterator[pd.DataFrame]:
+    """Versão em blocos do read_raw_tickets (memória limitada a 'batch_size' linhas)."""
+    if not os.path.isdir(path):
+        raise FileNotFoundError(path)
+    dataset = open_raw_dataset(path)
+    scanner = dataset.scanner(columns=columns, filter=_partition_filter(start_date, end_date), batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def _dates_filter(dates: Iterable) -> Optional[ds.Expression]:
+    """Filtro por um conjunto de dias: poda por year/month + faixa exata de opened_at em cada dia."""
+    expr = None
+    year, month, opened_at = ds.field('year'), ds.field('month'), ds.field('opened_at')
+    for day in sorted({pd.Timestamp(d).normalize() for d in dates}):
+        next_day = day + pd.Timedelta(days=1)
+        expr_day = (
+            (year == day.year) & (month == day.month)
+            & (opened_at >= pa.scalar(day.to_pydatetime(), pa.timestamp('us')))
+            & (opened_at < pa.scalar(next_day.to_pydatetime(), pa.timestamp('us')))
+        )
+        expr = expr_day if expr is None else expr | expr_day
+    return expr
+
+def read_raw_tickets_for_dates(dates: Iterable, path: str = RAW_STORE_PATH,
+                               columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lê apenas os tickets abertos nos dias informados (refresh incremental da tabela fato)."""
+    if not os.path.isdir(path):
+        raise FileNotFoundError(path)
+    expr = _dates_filter(dates)
+    dataset = open_raw_dataset(path)
+    if expr is None:
+        return dataset.schema.empty_table().select(columns or dataset.schema.names).to_pandas()
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
@@ -0,0 +1,125 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.data.fact_store import FACT_TABLE_PATH, read_fact_table
+from src.data.schema import apply_rollup_schema
+
+# Cubo de agregados pré-calculados sobre a Tabela Fato Diária (RF02): categoria × entidade ×
+# {dia, semana, mês}, no nível folha (normalized_category) e no nível família (prefixo da
+# taxonomia RN01: ACESSO_*, EMAIL_*, HARDWARE_* ...). Dashboards e API leem o nível pronto em
+# vez de reagrupar a tabela fato. O TTR é guardado como soma (horas × chamados), que é
+# aditiva entre níveis; a média de cada célula é ttr_hours_sum / volume.
+ROLLUP_CUBE_PATH = 'data/processed/rollup_cube'
+
+CATEGORY_LEVELS = ['leaf', 'family']
+TIME_GRAINS = ['day', 'week', 'month'] # Semana começa na segunda-feira (ISO)
+
+ROLLUP_KEYS = ['period_start', 'category', 'entities_id']
+
+def category_family(categories: pd.Index) -> pd.Index:
+    """Família de cada categoria normalizada (prefixo antes do primeiro '_'; 'OUTROS' fica 'OUTROS')."""
+    return pd.Index(categories.astype(str)).str.split('_').str[0]
+
+def _period_start(dates: pd.Series, grain: str) -> np.ndarray:
+    days = dates.to_numpy().astype('datetime64[D]')
+    if grain == 'day':
+        return days
+    if grain == 'week':
+        # 1970-01-01 foi quinta-feira: desloca 3 dias para alinhar a semana na segunda
+        return ((days.astype(np.int64) + 3) // 7 * 7 - 3).astype('datetime64[D]')
+    if grain == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Granularidade desconhecida: {grain}")
+
+def _aggregate(period: np.ndarray, category: pd.Categorical, entities: np.ndarray,
+               volume: np.ndarray, ttr_sum: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame({
+        'period_start': period.astype('datetime64[ns]'),
+        'category': category,
+        'entities_id': entities,
+        'volume': volume,
+        'ttr_hours_sum': ttr_sum,
+    })
+    df = df.groupby(ROLLUP_KEYS, sort=True, observed=True).sum().reset_index()
+    df['avg_ttr_hours'] = df['ttr_hours_sum'] / df['volume']
+    return apply_rollup_schema(df)
+
+def build_rollup_cube(df_fact: pd.DataFrame) -> Dict[Tuple[str, str], pd.DataFrame]:
+    """
+    Monta as 6 células do cubo ({leaf, family} × {day, week, month}) a partir da tabela fato.
+    Cada granularidade é agregada a partir da folha diária e a família a partir da folha da
+    mesma granularidade (códigos inteiros, sem comparar strings linha a linha).
+    """
+    category = df_fact['normalized_category'].astype('category').cat
+    families = category_family(category.categories)
+    family_categories = pd.Index(sorted(families.unique()))
+    family_codes = family_categories.get_indexer(families)
+
+    entities = df_fact['entities_id'].to_numpy()
+    volume = df_fact['volume'].to_numpy(dtype=np.int64)
+    ttr_sum = df_fact['avg_ttr_hours'].to_numpy(dtype=np.float64) * volume
+
+    cube = {}
+    for grain in TIME_GRAINS:
+        period = _period_start(df_fact['date'], grain)
+        leaf = _aggregate(period, category.codes, entities, volume, ttr_sum)
+        leaf['category'] = pd.Categorical.from_codes(leaf['category'].to_numpy(), category.categories)
+        cube[('leaf', grain)] = leaf
+
+        leaf_codes = leaf['category'].cat.codes.to_numpy()
+        family = _aggregate(leaf['period_start'].to_numpy(), family_codes[leaf_codes], leaf['entities_id'].to_numpy(),
+                            leaf['volume'].to_numpy(dtype=np.int64), leaf['ttr_hours_sum'].to_numpy())
+        family['category'] = pd.Categorical.from_codes(family['category'].to_numpy(), family_categories)
+        cube[('family', grain)] = family
+    return cube
+
+def _cell_path(path: str, level: str, grain: str) -> str:
+    return os.path.join(path, f"{level}_{grain}.parquet")
+
+def write_rollup_cube(cube: Dict[Tuple[str, str], pd.DataFrame], path: str = ROLLUP_CUBE_PATH) -> None:
+    """Grava cada célula num Parquet próprio (arquivo temporário + rename atômico)."""
+    os.makedirs(path, exist_ok=True)
+    for (level, grain), df in cube.items():
+        cell_path = _cell_path(path, level, grain)
+        df.to_parquet(f"{cell_path}.tmp", index=False)
+        os.replace(f"{cell_path}.tmp", cell_path)
+
+def materialize_rollup_cube(df_fact: Optional[pd.DataFrame] = None, fact_path: str = FACT_TABLE_PATH,
+                            path: str = ROLLUP_CUBE_PATH) -> Dict[Tuple[str, str], int]:
+    """Etapa do ETL: (re)gera o cubo a partir da tabela fato publicada. Retorna as linhas por célula."""
+    if df_fact is None:
+        df_fact = read_fact_table(fact_path, columns=['date', 'normalized_category', 'entities_id', 'volume', 'avg_ttr_hours'])
+    cube = build_rollup_cube(df_fact)
+    write_rollup_cube(cube, path)
+    return {cell: len(df) for cell, df in cube.items()}
+
+def read_rollup(level: str = 'leaf', grain: str = 'day', path: str = ROLLUP_CUBE_PATH,
+                start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                categories: Optional[List[str]] = None, entities: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Lê uma célula do cubo (level: leaf|family, grain: day|week|month), com filtros empurrados
+    para o leitor Parquet: períodos em [start_date, end_date), categorias e entidades.
+    """
+    if level not in CATEGORY_LEVELS or grain not in TIME_GRAINS:
+        raise ValueError(f"Célula inexistente no cubo: {level}/{grain}")
+    filters = []
+    if start_date is not None:
+        filters.append(('period_start', '>=', pd.Timestamp(start_date)))
+    if end_date is not None:
+        filters.append(('period_start', '<', pd.Timestamp(end_date)))
+    if categories is not None:
+        filters.append(('category', 'in', [str(c) for c in categories]))
+    if entities is not None:
+        filters.append(('entities_id', 'in', [int(e) for e in entities]))
+    df = pd.read_parquet(_cell_path(path, level, grain), filters=filters or None)
+    if categories is not None:
+        df['category'] = df['category'].cat.remove_unused_categories()
+    return df
+
+if __name__ == "__main__":
+    rows = materialize_rollup_cube()
+    print(f"Cubo de agregados salvo em: {ROLLUP_CUBE_PATH}")
+    for (level, grain), n in rows.items():
+        print(f"  {level:<6} × {grain:<5}: {n} linhas")
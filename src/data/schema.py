@@ -0,0 +1,92 @@
+from typing import Dict
+import pandas as pd
+
+# Schema compacto (tipos) da Tabela Fato Diária (RF02), do cubo de agregados e do Dataset Consolidado (RF08).
+# Categorias como categóricas (dictionary no Parquet), inteiros no menor tipo que comporta
+# o domínio, TTR em float32 e volumes como Int32 anulável (previsões não têm volume real).
+
+FACT_TABLE_DTYPES: Dict[str, str] = {
+    'normalized_category': 'category',
+    'entities_id': 'int32',
+    'volume': 'int32',
+    'avg_ttr_hours': 'float32',
+    'day_of_week': 'int8',
+    'is_weekend': 'int8',
+    'month': 'int8',
+    'year': 'int16',
+    'is_holiday': 'int8',
+}
+
+FINAL_DATASET_DTYPES: Dict[str, str] = {
+    'normalized_category': 'category',
+    'entities_id': 'int32',
+    'horizon': 'int8',
+    'volume_real': 'Int32',
+    'avg_ttr_hours': 'float32',
+    'P50_volume': 'Int32',
+    'P90_volume': 'Int32',
+}
+
+ROLLUP_CUBE_DTYPES: Dict[str, str] = {
+    'category': 'category',
+    'entities_id': 'int32',
+    'volume': 'int32',
+    'ttr_hours_sum': 'float64', # Soma aditiva entre níveis: mantém a precisão dupla
+    'avg_ttr_hours': 'float32',
+}
+
+def apply_schema(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Converte as colunas presentes para os tipos do schema (as demais ficam como estão)."""
+    for col, dtype in dtypes.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+        elif dtype[0].isupper():
+            # Inteiro anulável: pd.NA/None/NaN viram <NA> em vez de forçar object/float
+            df[col] = pd.to_numeric(df[col], errors='coerce').round().astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def apply_fact_schema(df: pd.DataFrame) -> pd.DataFrame:
+    return apply_schema(df, FACT_TABLE_DTYPES)
+
+def apply_final_schema(df: pd.DataFrame) -> pd.DataFrame:
+    return apply_schema(df, FINAL_DATASET_DTYPES)
+
+def apply_rollup_schema(df: pd.DataFrame) -> pd.DataFrame:
+    return apply_schema(df, ROLLUP_CUBE_DTYPES)
+
+def _legacy_dtype(series: pd.Series) -> str:
+    """Tipo que a coluna teria no layout antigo (strings object, int64, float64)."""
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+        return 'object'
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return 'float64' if series.isna().any() else 'int64'
+    if pd.api.types.is_float_dtype(series.dtype):
+        return 'float64'
+    return str(series.dtype)
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Memória por coluna (bytes reais, incluindo strings) no tipo atual e no layout antigo,
+    com a economia relativa. A última linha ('TOTAL') soma o DataFrame.
+    """
+    rows = []
+    for col in df.columns:
+        legacy_dtype = _legacy_dtype(df[col])
+        legacy = df[col].astype(legacy_dtype) if legacy_dtype != str(df[col].dtype) else df[col]
+        rows.append({
+            'column': col,
+            'dtype': str(df[col].dtype),
+            'bytes': int(df[col].memory_usage(index=False, deep=True)),
+            'legacy_dtype': legacy_dtype,
+            'legacy_bytes': int(legacy.memory_usage(index=False, deep=True)),
+        })
+    report = pd.DataFrame(rows)
+    total = {'column': 'TOTAL', 'dtype': '', 'bytes': report['bytes'].sum(),
+             'legacy_dtype': '', 'legacy_bytes': report['legacy_bytes'].sum()}
+    report = pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+    report['saving_pct'] = (1 - report['bytes'] / report['legacy_bytes'].where(report['legacy_bytes'] > 0)) * 100
+    return report
@@ -0,0 +1,273 @@
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from src.data.transform import CATEGORY_MAPPING
+from src.data.holiday_calendar import holiday_flags
+
+# Gerador de tickets sintéticos do GLPI para testes de escala (10k a 50M tickets).
+# Produz blocos no mesmo formato da extração (colunas do SELECT de src.data.extract),
+# que podem ir para o dataset bruto (Parquet) ou para o stand-in local do GLPI.
+
+# Caminhos sem mapeamento no CATEGORY_MAPPING (devem cair em 'OUTROS' ou no ancestral mapeado)
+UNMAPPED_CATEGORY_PATHS = [
+    'Hardware > Scanner com defeito / Broken scanner',
+    'Software > Antivírus / Antivirus',
+    'Impressoras / Printers > Toner / Toner',
+    'Telefonia / Phones',
+    'Telefonia / Phones > Ramal sem linha / Extension down',
+    'Facilities > Ar condicionado / Air conditioning',
+]
+
+# Sazonalidade semanal (0=Segunda ... 6=Domingo) e redução de volume em feriados
+WEEKDAY_FACTORS = np.array([1.25, 1.15, 1.10, 1.05, 0.95, 0.25, 0.15])
+HOLIDAY_FACTOR = 0.2
+
+# Distribuição horária de abertura (horário comercial concentrado)
+HOUR_WEIGHTS = np.array([
+    0.2, 0.1, 0.1, 0.1, 0.1, 0.2, 0.5, 1.5, 4.0, 6.0, 6.5, 5.5,
+    3.5, 4.5, 5.5, 5.5, 5.0, 4.0, 2.0, 1.0, 0.6, 0.4, 0.3, 0.2,
+])
+
+# Mediana do tempo de resolução (horas) por família de categoria
+FAMILY_TTR_MEDIAN_HOURS = {
+    'ACESSO': 2.0, 'EMAIL': 4.0, 'HARDWARE': 24.0, 'IMPRESSORA': 8.0,
+    'LARK': 48.0, 'REDE': 6.0, 'SOFTWARE': 12.0, 'SUPORTE': 4.0, 'OUTROS': 12.0,
+}
+
+def synthetic_category_paths() -> List[str]:
+    """Caminhos de categoria no formato do GLPI (capitalizados) + caminhos sem mapeamento."""
+    return [path.title() for path in CATEGORY_MAPPING.keys()] + UNMAPPED_CATEGORY_PATHS
+
+def _category_family(path: str) -> str:
+    normalized = CATEGORY_MAPPING.get(path.lower().strip(), 'OUTROS')
+    return normalized.split('_')[0]
+
+def _day_weights(days: pd.DatetimeIndex, rng: np.random.Generator, trend: float) -> np.ndarray:
+    """Peso relativo de cada dia: sazonalidade semanal, feriados, tendência e ruído."""
+    weights = WEEKDAY_FACTORS[days.dayofweek]
+    weights = weights * np.where(holiday_flags(pd.Series(days)) == 1, HOLIDAY_FACTOR, 1.0)
+    weights = weights * (1 + trend * np.linspace(0, 1, len(days)))
+    weights = weights * rng.gamma(shape=20, scale=1 / 20, size=len(days)) # Ruído diário (~±22%)
+    return weights / weights.sum()
+
+def _plan_bursts(n_days: int, n_burst_tickets: int, n_categories: int, n_entities: int,
+                 category_p: np.ndarray, entity_p: np.ndarray, rng: np.random.Generator) -> Dict[int, list]:
+    """
+    Sorteia incidentes (picos de 1 a 3 dias concentrados em uma categoria/entidade).
+    Retorna {dia: [(categoria, entidade, quantidade), ...]}.
+    """
+    bursts: Dict[int, list] = {}
+    if n_burst_tickets <= 0:
+        return bursts
+    n_bursts = max(1, n_days // 15)
+    sizes = rng.multinomial(n_burst_tickets, np.full(n_bursts, 1 / n_bursts))
+    for size in sizes:
+        start = int(rng.integers(0, n_days))
+        length = int(rng.integers(1, 4))
+        category = int(rng.choice(n_categories, p=category_p))
+        entity = int(rng.choice(n_entities, p=entity_p))
+        per_day = rng.multinomial(size, np.full(length, 1 / length))
+        for offset, count in enumerate(per_day):
+            day = min(start + offset, n_days - 1)
+            bursts.setdefault(day, []).append((category, entity, int(count)))
+    return bursts
+
+def generate_tickets(n_tickets: int, days: int = 365, n_entities: int = 50, seed: int = 42,
+                     chunk_size: int = 500000, end_date: Optional[datetime] = None,
+                     unmapped_share: float = 0.03, burst_share: float = 0.03,
+                     trend: float = 0.10) -> Iterator[pd.DataFrame]:
+    """
+    Gera 'n_tickets' tickets sintéticos distribuídos em 'days' dias até 'end_date' (padrão: hoje),
+    em blocos de ~'chunk_size' linhas ordenados por data de abertura (memória constante).
+
+    - Categorias: caminhos do CATEGORY_MAPPING (popularidade tipo Zipf) + 'unmapped_share' sem mapeamento.
+    - Entidades: 'n_entities' ids com tamanhos log-normais.
+    - Sazonalidade semanal, feriados, tendência e incidentes ('burst_share' do volume).
+    - solvedate log-normal por família/prioridade; time_to_resolve (segundos) em ~60% dos tickets.
+    """
+    from src.utils.glpi_standin import build_category_tree
+
+    rng = np.random.default_rng(seed)
+    end_day = pd.Timestamp(end_date or datetime.now()).normalize()
+    day_index = pd.date_range(end=end_day - pd.Timedelta(days=1), periods=days, freq='D')
+    now = end_day
+
+    # Categorias e ids (os mesmos ids que o stand-in cria para esta lista)
+    paths = synthetic_category_paths()
+    df_tree = build_category_tree(paths)
+    category_ids = df_tree.set_index('completename').loc[paths, 'id'].to_numpy()
+    n_mapped = len(CATEGORY_MAPPING)
+    mapped_p = 1 / np.arange(1, n_mapped + 1) ** 0.8
+    mapped_p = rng.permutation(mapped_p / mapped_p.sum()) * (1 - unmapped_share)
+    unmapped_p = np.full(len(UNMAPPED_CATEGORY_PATHS), unmapped_share / len(UNMAPPED_CATEGORY_PATHS))
+    category_p = np.concatenate([mapped_p, unmapped_p])
+    category_ttr = np.array([FAMILY_TTR_MEDIAN_HOURS.get(_category_family(p), 12.0) for p in paths])
+    path_array = np.array(paths, dtype=object)
+
+    entity_p = rng.lognormal(mean=0, sigma=1.2, size=n_entities)
+    entity_p = entity_p / entity_p.sum()
+
+    # Volume por dia e incidentes
+    n_burst = int(n_tickets * burst_share)
+    day_counts = rng.multinomial(n_tickets - n_burst, _day_weights(day_index, rng, trend))
+    bursts = _plan_bursts(days, n_burst, len(paths), n_entities, category_p, entity_p, rng)
+    hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+    next_id = 1
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+    for day_pos, day in enumerate(day_index):
+        count = int(day_counts[day_pos])
+        categories = rng.choice(len(paths), count, p=category_p)
+        entities = rng.choice(n_entities, count, p=entity_p)
+        for category, entity, burst_count in bursts.get(day_pos, []):
+            categories = np.concatenate([categories, np.full(burst_count, category)])
+            entities = np.concatenate([entities, np.full(burst_count, entity)])
+        total = len(categories)
+        if total == 0:
+            continue
+
+        seconds = rng.choice(24, total, p=hour_p) * 3600 + rng.integers(0, 3600, total)
+        order = np.argsort(seconds, kind='stable')
+        seconds, categories, entities = seconds[order], categories[order], entities[order]
+        opened = pd.Series(day + pd.to_timedelta(seconds, unit='s'))
+
+        # Prioridade 1 (muito baixa) a 5 (muito alta); prioridades altas resolvem mais rápido
+        priority = rng.choice([1, 2, 3, 4, 5], total, p=[0.05, 0.25, 0.45, 0.2, 0.05])
+        ttr_hours = rng.lognormal(np.log(category_ttr[categories]), 1.0) * (1.6 - 0.2 * priority)
+        solved = opened + pd.to_timedelta(np.round(ttr_hours * 3600), unit='s').to_numpy()
+
+        # Tickets recentes têm mais chance de continuar em aberto
+        age_days = (now - day).days
+        still_open = (rng.random(total) < 0.02 + 0.8 * np.exp(-age_days / 3)) | (solved >= now)
+        solved = solved.where(~still_open)
+        closed = solved + pd.to_timedelta(rng.integers(1, 72, total), unit='h').to_numpy()
+        closed = closed.where(closed < now)
+
+        resolution_seconds = (solved - opened).dt.total_seconds().to_numpy()
+        has_native_ttr = rng.random(total) < 0.6
+        time_to_resolve = np.where(has_native_ttr, resolution_seconds, np.nan)
+
+        status = np.where(still_open, 2, np.where(closed.notna(), 6, 5)) # 2=Em atendimento, 5=Solucionado, 6=Fechado
+
+        df_day = pd.DataFrame({
+            'id': np.arange(next_id, next_id + total, dtype=np.int64),
+            'opened_at': opened,
+            'solvedate': solved,
+            'closedate': closed,
+            'status': status,
+            'priority': priority,
+            'itilcategories_id': category_ids[categories],
+            'category_path': path_array[categories],
+            'entities_id': entities,
+            'time_to_resolve': time_to_resolve,
+            'hours_to_solve': np.floor(resolution_seconds / 3600), # Mesmo resultado do TIMESTAMPDIFF(HOUR)
+            'date_mod': closed.fillna(solved).fillna(opened),
+        })
+        next_id += total
+        pending.append(df_day)
+        pending_rows += total
+
+        if pending_rows >= chunk_size:
+            yield pd.concat(pending, ignore_index=True)
+            pending, pending_rows = [], 0
+
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+def to_glpi_tickets_table(df_chunk: pd.DataFrame) -> pd.DataFrame:
+    """Converte um bloco no formato da extração para as colunas da tabela glpi_tickets."""
+    return df_chunk.rename(columns={'opened_at': 'date'}).assign(name='Chamado sintético')
+
+def write_synthetic_raw_store(n_tickets: int, path: Optional[str] = None, **kwargs) -> int:
+    """Gera os tickets direto no dataset bruto (Parquet particionado). Retorna o total gravado."""
+    from src.data.raw_store import RAW_STORE_PATH, write_raw_tickets
+    return write_raw_tickets(generate_tickets(n_tickets, **kwargs), path or RAW_STORE_PATH)
+
+def write_synthetic_standin(n_tickets: int, path: Optional[str] = None, **kwargs) -> int:
+    """Gera os tickets no stand-in local do GLPI (SQLite), recriando o banco. Retorna o total gravado."""
+    from src.utils.glpi_standin import STANDIN_DB_PATH, create_standin_database, insert_categories, insert_tickets
+    path = path or STANDIN_DB_PATH
+    create_standin_database(path, overwrite=True)
+    insert_categories(synthetic_category_paths(), path)
+    total = 0
+    for chunk in generate_tickets(n_tickets, **kwargs):
+        total += insert_tickets(to_glpi_tickets_table(chunk), path, replace=False)
+    return total
+
+def run_scale_benchmark(scales: List[int], n_entities: int = 50, days: int = 365, train_groups: int = 0) -> pd.DataFrame:
+    """
+    Mede como process_data e create_continuous_series escalam com o número de tickets.
+    Com train_groups > 0, também cronometra o optimize_and_forecast em alguns grupos e
+    extrapola o custo do loop de treino para todos os grupos.
+    """
+    from src.data.transform import process_data
+    from src.models.optimize_ml import create_continuous_series, optimize_and_forecast
+
+    group_cols = ['normalized_category', 'entities_id']
+    results = []
+    for n_tickets in scales:
+        start = time.perf_counter()
+        df_tickets = pd.concat(generate_tickets(n_tickets, days=days, n_entities=n_entities), ignore_index=True)
+        t_generate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df_fact = process_data(df_tickets, CATEGORY_MAPPING)
+        t_process = time.perf_counter() - start
+        del df_tickets
+
+        start = time.perf_counter()
+        df_series = create_continuous_series(df_fact, group_cols)
+        t_series = time.perf_counter() - start
+
+        row = {
+            'tickets': n_tickets, 'fact_rows': len(df_fact), 'series_rows': len(df_series),
+            'groups': df_fact[group_cols].drop_duplicates().shape[0],
+            'generate_s': round(t_generate, 2), 'process_data_s': round(t_process, 2),
+            'continuous_series_s': round(t_series, 2),
+        }
+
+        if train_groups > 0:
+            sample = [g for _, g in df_series.groupby(group_cols, observed=True)][:train_groups]
+            start = time.perf_counter()
+            for group_df in sample:
+                optimize_and_forecast(group_df, horizon=30)
+            per_group = (time.perf_counter() - start) / max(len(sample), 1)
+            row['train_s_per_group'] = round(per_group, 2)
+            row['train_s_all_groups_est'] = round(per_group * row['groups'], 1)
+
+        results.append(row)
+        print(row)
+
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gerador de tickets sintéticos do GLPI para testes de escala.")
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--entities', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--target', choices=['raw', 'standin'], default='raw',
+                        help="raw: dataset bruto em Parquet; standin: banco SQLite do stand-in.")
+    parser.add_argument('--path', default=None)
+    parser.add_argument('--bench', default=None,
+                        help="Lista de escalas para benchmark do ETL, ex.: 10000,100000,1000000 (não grava dados).")
+    parser.add_argument('--bench-train-groups', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bench:
+        scales = [int(x) for x in args.bench.split(',')]
+        df_bench = run_scale_benchmark(scales, n_entities=args.entities, days=args.days, train_groups=args.bench_train_groups)
+        print("\n--- BENCHMARK DE ESCALA (SINTÉTICO) ---")
+        print(df_bench.to_string(index=False))
+    else:
+        kwargs = dict(days=args.days, n_entities=args.entities, seed=args.seed)
+        if args.target == 'standin':
+            total = write_synthetic_standin(args.tickets, args.path, **kwargs)
+        else:
+            total = write_synthetic_raw_store(args.tickets, args.path, **kwargs)
+        print(f"{total} tickets sintéticos gravados ({args.target}).")
@@ -1,15 +1,22 @@
+import os
+from datetime import datetime
 import pandas as pd
-from datetime import date
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
 import numpy as np
+from dotenv import load_dotenv
+from src.data.holiday_calendar import join_calendar, apply_regional_holidays
+from src.data.quantile_sketch import (
+    TDigest, digest_from_counts, update_group_sketches, merge_group_sketches, sketches_to_frame,
+)
+from src.data.fact_store import (
+    FACT_TABLE_PATH, PENDING_DATES_PATH, load_manifest, write_fact_table, update_fact_partitions,
+    load_pending_dates, clear_pending_dates,
+)
+from src.data.raw_store import read_raw_tickets_for_dates
+from src.data.schema import apply_fact_schema
 
-# Regras de Negócio: Feriados (RN01) - AJUSTE ESTA LISTA PARA O SEU PERÍODO DE DADOS
-# A lista abaixo é um EXEMPLO para 2025 no Brasil.
-FERIADOS_BR: List[date] = [
-    date(2025, 1, 1), date(2025, 2, 25), date(2025, 2, 26), date(2025, 4, 18),
-    date(2025, 4, 21), date(2025, 5, 1), date(2025, 9, 7), date(2025, 10, 12),
-    date(2025, 11, 2), date(2025, 11, 15), date(2025, 11, 20), date(2025, 12, 25)
-]
+# Regras de Negócio: Feriados (RN01) - gerados por src.data.holiday_calendar para qualquer ano
+# (nacionais fixos e móveis + sobreposições regionais por entidade)
 
 # Dicionário de Mapeamento de Categorias (RN01)
 # TODAS AS CHAVES ESTÃO EM MINÚSCULAS E SEM ESPAÇOS EXTRAS (STRIPPED)
@@ -83,26 +90,102 @@ CATEGORY_MAPPING = {
     "suporte geral / general support > tirar duvidas / ask questions": "SUPORTE_DUVIDAS",
 }
 
+# Separador de níveis do 'completename' do GLPI ('Pai > Filho')
+CATEGORY_PATH_SEPARATOR = '>'
+
+def _split_category_path(path: str) -> List[str]:
+    """Normaliza um caminho (minúsculas, sem espaços extras) e separa seus níveis."""
+    return [segment.strip() for segment in path.lower().strip().split(CATEGORY_PATH_SEPARATOR)]
+
+def build_category_trie(mapping: Dict[str, str]) -> Dict:
+    """
+    Compila o mapeamento (RN01) numa trie de prefixos por nível do caminho.
+    Cada nó é {'value': categoria_normalizada | None, 'children': {segmento: nó}}.
+    """
+    trie = {'value': None, 'children': {}}
+    for path, normalized in mapping.items():
+        node = trie
+        for segment in _split_category_path(path):
+            node = node['children'].setdefault(segment, {'value': None, 'children': {}})
+        node['value'] = normalized
+    return trie
+
+def resolve_category_path(path: str, trie: Dict, default: str = 'OUTROS') -> str:
+    """
+    Resolve um caminho na trie: devolve a categoria do nó mapeado mais profundo.
+    Folhas novas caem no ancestral mapeado mais próximo
+    (ex.: 'hardware > scanner' -> 'HARDWARE_GERAL'); sem ancestral mapeado, 'OUTROS'.
+    """
+    node, resolved = trie, default
+    for segment in _split_category_path(path):
+        node = node['children'].get(segment)
+        if node is None:
+            break
+        if node['value'] is not None:
+            resolved = node['value']
+    return resolved
+
 def map_categories(df: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
-    """Aplica uma taxonomia unificada de categorias (RN01) de forma tolerante."""
-    
-    # CORREÇÃO CRÍTICA: 
-    # 1. Converte a coluna para string e minúsculas (.lower())
-    # 2. Remove espaços extras no início e fim (.strip())
-    df['category_path_lower_stripped'] = df['category_path'].astype(str).str.lower().str.strip().fillna('')
-    
-    # Mapeia caminhos (agora limpos) para nomes padronizados (maiúsculas)
-    # Se não houver match, cai em 'OUTROS'
-    df['normalized_category'] = df['category_path_lower_stripped'].apply(
-        lambda x: mapping.get(x, 'OUTROS')
-    )
-    
-    # Remove a coluna temporária
-    df = df.drop(columns=['category_path_lower_stripped'])
+    """
+    Aplica uma taxonomia unificada de categorias (RN01) de forma tolerante.
+    Cada category_path distinto é resolvido uma única vez (trie de prefixos) e o resultado
+    volta para as linhas via códigos categóricos: o custo depende do número de caminhos
+    distintos, não do número de tickets. A saída 'normalized_category' é categórica.
+    """
+    trie = build_category_trie(mapping)
+
+    # Códigos por caminho distinto (nulos recebem o código -1)
+    codes, uniques = pd.factorize(df['category_path'])
+    resolved = [resolve_category_path(str(path), trie) for path in uniques]
+
+    categories = sorted(set(resolved) | {'OUTROS'})
+    category_code = {category: code for code, category in enumerate(categories)}
+    # O último elemento atende o código -1 (caminho nulo -> 'OUTROS')
+    lookup = np.array([category_code[c] for c in resolved] + [category_code['OUTROS']], dtype=np.int32)
+
+    df['normalized_category'] = pd.Categorical.from_codes(lookup[codes], categories=categories)
     return df
 
-def feature_engineering(df: pd.DataFrame) -> pd.DataFrame:
-    """Cria features de calendário (RF02) e trata dados de tempo/TTR (KPI02)."""
+def compute_ttr_hours(df: pd.DataFrame) -> np.ndarray:
+    """TTR em horas por ticket (KPI02), ainda sem imputação dos nulos."""
+    # CORREÇÃO: Converter 'time_to_resolve' para numérico antes de comparar
+    df['time_to_resolve'] = pd.to_numeric(df['time_to_resolve'], errors='coerce') 
+
+    # Tenta usar time_to_resolve (segundos). Se inválido ou zero, usa hours_to_solve.
+    return np.where(
+        # Verifica se não é nulo (notna) E se é maior que zero
+        df['time_to_resolve'].notna() & (df['time_to_resolve'] > 0),
+        df['time_to_resolve'] / 3600, # Converte segundos para horas
+        df['hours_to_solve']         # Usa a coluna calculada (TIMESTAMPDIFF) como fallback
+    ).astype('float64')
+
+# --- Mediana de imputação do TTR (RN03) ---
+# Histograma exato valor -> contagem do TTR observado: mesclável por soma entre blocos/workers
+# (tamanho = valores distintos de TTR). A mediana de imputação sai sempre do sketch canônico
+# desse histograma, então passada única, blocos, shards e DuckDB imputam o mesmo valor.
+
+def ttr_value_counts(ttr_hours: pd.Series) -> pd.Series:
+    """Contagem de tickets por valor de TTR observado (nulos ignorados)."""
+    return ttr_hours.value_counts(dropna=True)
+
+def merge_ttr_counts(counts: Optional[pd.Series], others: pd.Series) -> pd.Series:
+    """Soma dois histogramas de TTR."""
+    if counts is None:
+        return others
+    return pd.concat([counts, others]).groupby(level=0).sum()
+
+def ttr_digest_from_counts(counts: Optional[pd.Series]) -> TDigest:
+    """Sketch global canônico do TTR (o mesmo de uma passada única sobre todos os tickets)."""
+    if counts is None or counts.empty:
+        return TDigest()
+    return digest_from_counts(counts.index.to_numpy(dtype=np.float64), counts.to_numpy())
+
+def feature_engineering(df: pd.DataFrame, ttr_median: Optional[float] = None) -> pd.DataFrame:
+    """
+    Trata datas, duplicatas (RN03) e dados de tempo/TTR (KPI02) no nível do ticket.
+    'ttr_median' permite imputar com uma mediana calculada fora (ex.: a registrada no
+    manifesto); sem ela, a mediana vem do sketch canônico do histograma de TTR do DataFrame.
+    """
     
     # 1. Tratamento de Datas
     df['opened_at'] = pd.to_datetime(df['opened_at'], errors='coerce')
@@ -113,76 +196,384 @@ def feature_engineering(df: pd.DataFrame) -> pd.DataFrame:
     
     # 2. Tratamento de Tempo de Resolução (TTR - KPI02)
     
-    # CORREÇÃO: Converter 'time_to_resolve' para numérico antes de comparar
-    df['time_to_resolve'] = pd.to_numeric(df['time_to_resolve'], errors='coerce') 
+    df['ttr_hours'] = compute_ttr_hours(df)
 
-    # Tenta usar time_to_resolve (segundos). Se inválido ou zero, usa hours_to_solve.
-    df['ttr_hours'] = np.where(
-        # Verifica se não é nulo (notna) E se é maior que zero
-        df['time_to_resolve'].notna() & (df['time_to_resolve'] > 0),
-        df['time_to_resolve'] / 3600, # Converte segundos para horas
-        df['hours_to_solve']         # Usa a coluna calculada (TIMESTAMPDIFF) como fallback
-    )
-
-    # Trata NaNs no TTR com a mediana (RN03)
-    ttr_median = df['ttr_hours'].median()
+    # Trata NaNs no TTR com a mediana (RN03), do sketch canônico (igual em todos os modos do ETL)
+    if ttr_median is None:
+        ttr_median = ttr_digest_from_counts(ttr_value_counts(df['ttr_hours'])).median()
+    df['ttr_imputed'] = df['ttr_hours'].isna() # Imputados ficam fora dos KPIs de TTR
     df['ttr_hours'] = df['ttr_hours'].fillna(ttr_median)
     
-    # 3. Features de Calendário (RF02)
-    df['day_of_week'] = df['date'].dt.dayofweek # 0=Segunda, 6=Domingo
-    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    df['month'] = df['date'].dt.month
-    df['year'] = df['date'].dt.year
-    df['is_holiday'] = df['date'].apply(lambda x: x.date() in FERIADOS_BR).astype(int)
+    # 3. Features de Calendário (RF02): não são calculadas por ticket; a dimensão
+    # calendário é juntada por data depois da agregação (create_daily_fact_table)
     
     return df
 
+# Chave de granularidade da Tabela Fato Diária
+FACT_KEYS = ['date', 'normalized_category', 'entities_id']
+
+def finalize_daily_fact(daily_fact: pd.DataFrame) -> pd.DataFrame:
+    """Junta o calendário (RF02) às linhas já agregadas por FACT_KEYS e ordena a tabela fato."""
+    # Features de Calendário (RF02): junção por data com a dimensão calendário compartilhada
+    daily_fact = join_calendar(daily_fact)
+    daily_fact = apply_regional_holidays(daily_fact) # Feriados regionais por entidade
+    daily_fact = apply_fact_schema(daily_fact) # Tipos compactos (categórica, int8/int32, float32)
+
+    return daily_fact.sort_values(by=FACT_KEYS).reset_index(drop=True)
+
 def create_daily_fact_table(df: pd.DataFrame) -> pd.DataFrame:
     """
     Agrega o DataFrame de tickets para criar a Tabela Fato Diária (RF02).
     """
     
-    # Agregação para volume (Alvo do modelo) e média de TTR (KPI02) por Categoria/Entidade
-    daily_fact = df.groupby(['date', 'normalized_category', 'entities_id']).agg(
+    # Agregação para volume (Alvo do modelo) e média de TTR (KPI02) por Categoria/Entidade.
+    # Tickets sem entidade (chave nula) ficam fora da tabela fato (dropna=True, como no DuckDB)
+    daily_fact = df.groupby(FACT_KEYS, observed=True, dropna=True).agg(
         volume=('id', 'count'),
         avg_ttr_hours=('ttr_hours', 'mean'), 
     ).reset_index()
     
-    # Mesclar Features de Calendário
-    calendar_features = df[['date', 'day_of_week', 'is_weekend', 'month', 'year', 'is_holiday']].drop_duplicates()
-    daily_fact = pd.merge(daily_fact, calendar_features, on='date', how='left')
+    return finalize_daily_fact(daily_fact)
 
-    daily_fact = daily_fact.sort_values(by=['date', 'normalized_category', 'entities_id']).reset_index(drop=True)
-    
-    return daily_fact
+def create_daily_fact_table_from_aggregates(df_agg: pd.DataFrame, category_mapping: Dict[str, str]) -> pd.DataFrame:
+    """
+    Gera a Tabela Fato Diária (RF02) a partir do frame pré-agregado no banco
+    (modo push-down: date x category_path x entities_id com volume, ttr_sum, ttr_count e ttr_median).
+    Aplica as mesmas regras do caminho por ticket: taxonomia (RN01) e TTR nulo = mediana global (RN03).
+    """
+    df = df_agg.copy()
+    df['date'] = pd.to_datetime(df['date']).dt.normalize()
+    df = map_categories(df, category_mapping)
 
-def process_data(df_tickets: pd.DataFrame, category_mapping: Dict[str, str]) -> pd.DataFrame:
-    """Função principal para processar e gerar a tabela fato."""
-    
-    df_features = feature_engineering(df_tickets)
+    # Vários category_path podem cair na mesma categoria normalizada: reagrega somando as parcelas
+    ttr_median = df['ttr_median'].iloc[0] if not df.empty else np.nan
+    ttr_sum = df['ttr_sum'].fillna(0)
+    if pd.notna(ttr_median):
+        # Cada ticket sem TTR contribui com a mediana global, como no fillna do feature_engineering
+        df['ttr_total'] = ttr_sum + (df['volume'] - df['ttr_count']) * ttr_median
+        df['ttr_n'] = df['volume']
+    else:
+        df['ttr_total'] = ttr_sum
+        df['ttr_n'] = df['ttr_count']
+
+    daily_fact = df.groupby(FACT_KEYS, observed=True).agg(
+        volume=('volume', 'sum'),
+        ttr_total=('ttr_total', 'sum'),
+        ttr_n=('ttr_n', 'sum'),
+    ).reset_index()
+    daily_fact['avg_ttr_hours'] = daily_fact['ttr_total'] / daily_fact['ttr_n'].where(daily_fact['ttr_n'] > 0)
+    daily_fact = daily_fact.drop(columns=['ttr_total', 'ttr_n'])
+
+    return finalize_daily_fact(daily_fact)
+
+# --- Sketches de TTR (KPI02) ---
+# Um t-digest global (dirige a imputação da RN03) e um por categoria normalizada (P50/P90).
+TTR_GLOBAL_KEY = 'GLOBAL'
+TTR_SKETCHES_PATH = 'data/processed/ttr_sketches.json'
+TTR_KPIS_PATH = 'data/processed/ttr_kpis.csv'
+
+def build_ttr_sketches(ttr_hours: pd.Series, categories: pd.Series) -> Dict[str, TDigest]:
+    """Sketches de TTR observado (sem imputação): global e por categoria."""
+    sketches = {TTR_GLOBAL_KEY: TDigest().update(ttr_hours.to_numpy())}
+    return update_group_sketches(sketches, ttr_hours, categories.astype(str))
+
+def ttr_kpis(sketches: Dict[str, TDigest]) -> pd.DataFrame:
+    """KPIs de TTR por categoria (e a linha GLOBAL): contagem, P50 e P90 em horas."""
+    df_kpis = sketches_to_frame(sketches, 'normalized_category', quantiles=(0.5, 0.9), value_name='ttr')
+    return df_kpis.rename(columns={'ttr_p50': 'ttr_p50_hours', 'ttr_p90': 'ttr_p90_hours'})
+
+# --- Modo em blocos (agregados parciais mescláveis) ---
+# Cada bloco de tickets vira somas parciais por (date, normalized_category, entities_id):
+# volume, ttr_sum e ttr_count. Somas se combinam por adição, então o estado acumulado tem
+# no máximo uma linha por grupo, independentemente de quantos tickets já passaram.
+# A mediana global do TTR (imputação da RN03) vem do histograma exato de TTR, também
+# mesclável, pelo mesmo sketch canônico da passada única.
+
+PARTIAL_COLUMNS = ['volume', 'ttr_sum', 'ttr_count']
+
+def partial_aggregates(df_chunk: pd.DataFrame, category_mapping: Dict[str, str]) -> Tuple[pd.DataFrame, Dict[str, TDigest], pd.Series]:
+    """
+    Agrega um bloco de tickets: devolve as somas parciais por FACT_KEYS (categoria como texto,
+    para mesclar blocos com taxonomias observadas diferentes), os sketches de TTR do bloco
+    (KPIs) e o histograma de TTR do bloco (mediana de imputação).
+    """
+    df = df_chunk.copy()
+    df['opened_at'] = pd.to_datetime(df['opened_at'], errors='coerce')
+    df['date'] = df['opened_at'].dt.normalize()
+    df = df.dropna(subset=['date'])
+    df = df.drop_duplicates(subset=['id'], keep='first') # RN03 dentro do bloco
+
+    df['ttr_hours'] = compute_ttr_hours(df)
+    df = map_categories(df, category_mapping)
+    df['normalized_category'] = df['normalized_category'].astype(str)
+
+    partial = df.groupby(FACT_KEYS, dropna=True).agg( # Sem entidade: fora da tabela fato
+        volume=('id', 'count'),
+        ttr_sum=('ttr_hours', 'sum'),
+        ttr_count=('ttr_hours', 'count'),
+    )
+    return partial, build_ttr_sketches(df['ttr_hours'], df['normalized_category']), ttr_value_counts(df['ttr_hours'])
+
+def merge_partial_aggregates(state: Optional[pd.DataFrame], partial: pd.DataFrame) -> pd.DataFrame:
+    """Combina dois estados de agregados parciais (indexados por FACT_KEYS) somando as parcelas."""
+    if state is None:
+        return partial
+    return pd.concat([state, partial]).groupby(level=FACT_KEYS).sum()
+
+def finalize_partial_aggregates(state: pd.DataFrame, ttr_median: float) -> pd.DataFrame:
+    """
+    Converte o estado final em Tabela Fato Diária: imputa a mediana nos tickets sem TTR
+    (equivalente ao fillna do feature_engineering) e calcula avg_ttr_hours.
+    """
+    daily_fact = state.reset_index()
+    ttr_total = daily_fact['ttr_sum']
+    if pd.notna(ttr_median):
+        ttr_total = ttr_total + (daily_fact['volume'] - daily_fact['ttr_count']) * ttr_median
+        ttr_n = daily_fact['volume']
+    else:
+        ttr_n = daily_fact['ttr_count']
+    daily_fact['avg_ttr_hours'] = ttr_total / ttr_n.where(ttr_n > 0)
+    daily_fact['volume'] = daily_fact['volume'].astype('int64')
+    daily_fact = daily_fact.drop(columns=['ttr_sum', 'ttr_count'])
+
+    # Mesma codificação categórica do map_categories (categorias observadas + 'OUTROS')
+    categories = sorted(set(daily_fact['normalized_category']) | {'OUTROS'})
+    daily_fact['normalized_category'] = pd.Categorical(daily_fact['normalized_category'], categories=categories)
+
+    return finalize_daily_fact(daily_fact)
+
+def process_data_chunked(chunks: Iterable[pd.DataFrame], category_mapping: Dict[str, str],
+                         dedup_across_chunks: bool = False,
+                         ttr_sketches: Optional[Dict[str, TDigest]] = None) -> pd.DataFrame:
+    """
+    Versão em blocos do process_data: consome um iterador de blocos de tickets
+    (ex.: iter_raw_tickets) e produz a mesma Tabela Fato Diária com memória limitada
+    ao número de grupos (dia x categoria x entidade).
+    O dataset bruto já é único por id (upsert por id); para fontes com ids repetidos entre
+    blocos, dedup_across_chunks=True mantém o conjunto de ids vistos (custo O(tickets)).
+    Se 'ttr_sketches' for um dicionário, recebe os sketches de TTR (global e por categoria).
+    """
+    state = None
+    ttr_counts = None
+    sketches = {} if ttr_sketches is None else ttr_sketches
+    seen_ids = set() if dedup_across_chunks else None
+    total_tickets = 0
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if seen_ids is not None:
+            is_new = ~chunk['id'].isin(seen_ids)
+            chunk = chunk[is_new]
+            seen_ids.update(chunk['id'].tolist())
+        partial, chunk_sketches, chunk_counts = partial_aggregates(chunk, category_mapping)
+        state = merge_partial_aggregates(state, partial)
+        merge_group_sketches(sketches, chunk_sketches)
+        ttr_counts = merge_ttr_counts(ttr_counts, chunk_counts)
+        total_tickets += int(partial['volume'].sum())
+
+    if state is None:
+        print("Nenhum ticket recebido no modo em blocos.")
+        return pd.DataFrame(columns=FACT_KEYS + ['volume', 'avg_ttr_hours'])
+
+    # Sketch global canônico (e não a mescla dos sketches dos blocos): mesma mediana da passada única
+    sketches[TTR_GLOBAL_KEY] = ttr_digest_from_counts(ttr_counts)
+    df_fact = finalize_partial_aggregates(state, sketches[TTR_GLOBAL_KEY].median())
+    print(f"Tabela Fato Diária gerada (em blocos, {total_tickets} tickets). Total de linhas (dias/categorias): {len(df_fact)}")
+    return df_fact
+
+def process_data(df_tickets: pd.DataFrame, category_mapping: Dict[str, str],
+                 ttr_sketches: Optional[Dict[str, TDigest]] = None,
+                 ttr_median: Optional[float] = None, n_workers: int = 1) -> pd.DataFrame:
+    """
+    Função principal para processar e gerar a tabela fato.
+    Aceita tickets brutos ou o frame pré-agregado do modo push-down (coluna 'volume').
+    Se 'ttr_sketches' for um dicionário, recebe os sketches de TTR (global e por categoria);
+    no push-down não há TTR por ticket e ele fica vazio. 'ttr_median' fixa a mediana de
+    imputação (refresh incremental: a mesma da carga completa publicada).
+    Com n_workers > 1, os tickets são processados em paralelo por shards de entidade
+    (src.data.parallel_transform).
+    """
+    if n_workers > 1 and 'volume' not in df_tickets.columns and ttr_median is None:
+        from src.data.parallel_transform import process_data_parallel
+        return process_data_parallel(df_tickets, category_mapping, n_workers=n_workers, ttr_sketches=ttr_sketches)
+
+    if 'volume' in df_tickets.columns:
+        df_fact = create_daily_fact_table_from_aggregates(df_tickets, category_mapping)
+        print(f"Tabela Fato Diária gerada (push-down). Total de linhas (dias/categorias): {len(df_fact)}")
+        return df_fact
+
+    df_features = feature_engineering(df_tickets, ttr_median=ttr_median)
     df_mapped = map_categories(df_features, category_mapping)
     df_fact = create_daily_fact_table(df_mapped)
 
+    if ttr_sketches is not None:
+        observed = df_mapped[~df_mapped['ttr_imputed']]
+        ttr_sketches.update(build_ttr_sketches(observed['ttr_hours'], observed['normalized_category']))
+
     print(f"Tabela Fato Diária gerada. Total de linhas (dias/categorias): {len(df_fact)}")
     return df_fact
 
+# Backend de execução do ETL sobre o dataset bruto: 'pandas' (padrão) ou 'duckdb'
+# (SQL multi-thread e fora da memória; ver src.data.duckdb_engine). Configurável pelo .env.
+load_dotenv()
+ETL_ENGINE = os.getenv("ETL_ENGINE", "pandas")
+
+# Colunas do dataset bruto efetivamente usadas pelo ETL (leitura com poda de colunas)
+TRANSFORM_COLUMNS = ['id', 'opened_at', 'category_path', 'entities_id', 'time_to_resolve', 'hours_to_solve']
+
+def refresh_fact_table_incremental(category_mapping: Dict[str, str], raw_path: str,
+                                   fact_path: str = FACT_TABLE_PATH,
+                                   pending_path: str = PENDING_DATES_PATH,
+                                   start_date: Optional[datetime] = None) -> Optional[int]:
+    """
+    Recalcula apenas os dias da tabela fato afetados por tickets novos/alterados (pendências
+    gravadas pela extração incremental) e publica as partições novas com a troca do manifesto.
+    Retorna o número de dias recalculados, ou None se for preciso uma carga completa.
+
+    - A mediana de imputação não é recalculada: vale a registrada no manifesto da última
+      carga completa (os tickets novos não a alteram até a próxima carga completa).
+    - Dias pendentes anteriores a 'start_date' (início da janela de histórico) são descartados
+      e os tickets do dia inicial são cortados no mesmo instante, como na carga completa.
+      Dias que saíram da janela desde a carga completa continuam na tabela fato até a próxima.
+    - Os sketches e KPIs de TTR (TTR_SKETCHES_PATH/TTR_KPIS_PATH) não são atualizados:
+      só a carga completa os regrava (um t-digest não desconta tickets alterados).
+    """
+    manifest = load_manifest(fact_path)
+    pending = load_pending_dates(pending_path)
+    if manifest is None or pending['full_refresh'] or 'partitioning' not in manifest:
+        return None # 'partitioning' ausente: layout antigo (por dia), regravado pela carga completa
+    if not pending['dates']:
+        print("Nenhum dia pendente: tabela fato já está atualizada.")
+        return 0
+
+    dates = pending['dates']
+    if start_date is not None:
+        first_day = pd.Timestamp(start_date).normalize()
+        dates = [d for d in dates if pd.Timestamp(d) >= first_day]
+    df_changed = read_raw_tickets_for_dates(dates, raw_path, columns=TRANSFORM_COLUMNS)
+    if start_date is not None:
+        df_changed = df_changed[pd.to_datetime(df_changed['opened_at']) >= pd.Timestamp(start_date)]
+    ttr_median = manifest.get('ttr_median')
+    if df_changed.empty:
+        df_fact_changed = pd.DataFrame(columns=FACT_KEYS)
+    else:
+        df_fact_changed = process_data(df_changed, category_mapping,
+                                       ttr_median=np.nan if ttr_median is None else ttr_median)
+    if dates:
+        manifest = update_fact_partitions(df_fact_changed, dates, fact_path)
+    clear_pending_dates(pending, pending_path) # Inclui os dias fora da janela, que são descartados
+    print(f"Refresh incremental: {len(dates)} dias recalculados (manifesto v{manifest['version']}, "
+          f"{len(pending['dates']) - len(dates)} fora da janela ignorados).")
+    return len(dates)
+
 if __name__ == "__main__":
-    from src.data.extract import get_glpi_tickets # Requer a importação do extract
-    # Carrega dados brutos (deve ter sido gerado pelo extract.py)
-    input_path = 'data/raw/glpi_tickets_raw.csv'
-    try:
-        df_raw = pd.read_csv(input_path, encoding='utf-8') 
-    except FileNotFoundError:
-        print(f"ERRO: Arquivo {input_path} não encontrado. Execute 'python -m src.data.extract' primeiro.")
-        exit()
-    except UnicodeDecodeError:
-         print("Aviso: Tentando recarregar com codificação 'latin-1'...")
-         df_raw = pd.read_csv(input_path, encoding='latin-1')
-
-    print(f"Iniciando transformação com {len(df_raw)} tickets brutos...")
-    df_fact = process_data(df_raw, CATEGORY_MAPPING)
-    
-    # Armazenamento da Tabela Fato Processada (RF06, RF07)
-    output_path = 'data/processed/daily_fact_table.parquet'
-    df_fact.to_parquet(output_path, index=False)
-    print(f"\nETL Concluído. Tabela Fato Diária salva em: {output_path}")
\ No newline at end of file
+    import argparse
+    from src.data.extract import get_history_window, get_glpi_daily_aggregates
+    from src.data.raw_store import RAW_STORE_PATH, read_raw_tickets, iter_raw_tickets
+    from src.data.quantile_sketch import save_sketches
+    from src.data.rollup_cube import ROLLUP_CUBE_PATH, materialize_rollup_cube
+
+    parser = argparse.ArgumentParser(description="ETL da Tabela Fato Diária.")
+    parser.add_argument('--source', choices=['raw', 'pushdown'], default='raw',
+                        help="raw: dataset bruto local; pushdown: agregação diária executada no MySQL do GLPI.")
+    parser.add_argument('--chunked', action='store_true',
+                        help="Processa o dataset bruto em blocos (memória limitada ao número de grupos).")
+    parser.add_argument('--batch-size', type=int, default=200000, help="Tickets por bloco no modo --chunked.")
+    parser.add_argument('--engine', choices=['pandas', 'duckdb'], default=ETL_ENGINE,
+                        help="Backend do ETL sobre o dataset bruto (padrão: variável ETL_ENGINE).")
+    parser.add_argument('--workers', type=int, default=int(os.getenv("ETL_WORKERS", 1)),
+                        help="Processos do modo paralelo por shards de entidade (dataset bruto, backend pandas).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Recalcula só os dias afetados desde a última extração incremental.")
+    parser.add_argument('--partition-by-category', action='store_true',
+                        default=os.getenv("FACT_PARTITION_BY_CATEGORY", "0") == "1",
+                        help="Particiona a tabela fato também por categoria (além de ano/mês).")
+    args = parser.parse_args()
+
+    # Armazenamento da Tabela Fato Processada (RF06, RF07): dataset particionado por ano/mês
+    output_path = FACT_TABLE_PATH
+
+    if args.incremental and args.source == 'raw':
+        start_date, end_date = get_history_window(months_history=12)
+        if refresh_fact_table_incremental(CATEGORY_MAPPING, RAW_STORE_PATH, output_path, start_date=start_date) is not None:
+            materialize_rollup_cube(fact_path=output_path)
+            print(f"Cubo de agregados atualizado em: {ROLLUP_CUBE_PATH}")
+            print(f"KPIs de TTR inalterados (atualizados só na carga completa): {TTR_KPIS_PATH}")
+            exit()
+        print("Sem tabela fato publicada ou com recarga completa pendente: executando a carga completa.")
+
+    pending = load_pending_dates()
+    ttr_sketches = {}
+    ttr_median = None
+    if args.source == 'raw' and args.chunked:
+        start_date, end_date = get_history_window(months_history=12)
+        try:
+            chunks = iter_raw_tickets(RAW_STORE_PATH, columns=TRANSFORM_COLUMNS, start_date=start_date,
+                                      batch_size=args.batch_size)
+            df_fact = process_data_chunked(chunks, CATEGORY_MAPPING, ttr_sketches=ttr_sketches)
+        except FileNotFoundError:
+            print(f"ERRO: Dataset {RAW_STORE_PATH} não encontrado. Execute 'python -m src.data.extract' primeiro.")
+            exit()
+    elif args.source == 'raw' and args.engine == 'pandas' and args.workers > 1:
+        from src.data.parallel_transform import process_data_parallel
+
+        # Cada worker lê do dataset bruto apenas as entidades do seu shard
+        start_date, end_date = get_history_window(months_history=12)
+        try:
+            df_fact = process_data_parallel(RAW_STORE_PATH, CATEGORY_MAPPING, n_workers=args.workers,
+                                            start_date=start_date, ttr_sketches=ttr_sketches)
+        except FileNotFoundError:
+            print(f"ERRO: Dataset {RAW_STORE_PATH} não encontrado. Execute 'python -m src.data.extract' primeiro.")
+            exit()
+    elif args.source == 'raw' and args.engine == 'duckdb':
+        from src.data.duckdb_engine import process_data_duckdb
+
+        start_date, end_date = get_history_window(months_history=12)
+        try:
+            df_fact = process_data_duckdb(RAW_STORE_PATH, CATEGORY_MAPPING, start_date=start_date, ttr_sketches=ttr_sketches)
+        except FileNotFoundError:
+            print(f"ERRO: Dataset {RAW_STORE_PATH} não encontrado. Execute 'python -m src.data.extract' primeiro.")
+            exit()
+    elif args.source == 'pushdown':
+        df_raw, _ = get_glpi_daily_aggregates(months_history=12)
+        if df_raw.empty:
+            print("ERRO: Nenhum dado retornado pela agregação no banco.")
+            exit()
+        print(f"Iniciando transformação com {len(df_raw)} grupos pré-agregados...")
+        df_fact = process_data(df_raw, CATEGORY_MAPPING)
+        ttr_median = df_raw['ttr_median'].iloc[0]
+    else:
+        # Carrega dados brutos (deve ter sido gerado pelo extract.py), lendo só as partições da janela
+        input_path = RAW_STORE_PATH
+        start_date, end_date = get_history_window(months_history=12)
+        try:
+            df_raw = read_raw_tickets(input_path, columns=TRANSFORM_COLUMNS, start_date=start_date)
+        except FileNotFoundError:
+            print(f"ERRO: Dataset {input_path} não encontrado. Execute 'python -m src.data.extract' primeiro.")
+            exit()
+        print(f"Iniciando transformação com {len(df_raw)} tickets brutos...")
+        df_fact = process_data(df_raw, CATEGORY_MAPPING, ttr_sketches=ttr_sketches)
+
+    # A mediana de imputação fica registrada no manifesto para os refreshes incrementais
+    if ttr_median is None and TTR_GLOBAL_KEY in ttr_sketches:
+        ttr_median = ttr_sketches[TTR_GLOBAL_KEY].median()
+    manifest = write_fact_table(df_fact, output_path, ttr_median=ttr_median,
+                                partition_by_category=args.partition_by_category)
+    clear_pending_dates({'full_refresh': True, 'dates': pending['dates']})
+    print(f"\nETL Concluído. Tabela Fato Diária salva em: {output_path} "
+          f"({len(manifest['partitions'])} partições {'/'.join(manifest['partitioning'])}, manifesto v{manifest['version']})")
+
+    # Cubo categoria/família × entidade × dia/semana/mês para a API e os dashboards
+    materialize_rollup_cube(df_fact)
+    print(f"Cubo de agregados salvo em: {ROLLUP_CUBE_PATH}")
+
+    # KPIs de TTR (P50/P90 global e por categoria) a partir dos sketches, também persistidos
+    # (load_sketches). Só a carga completa os regrava; o --incremental não os altera
+    if ttr_sketches:
+        save_sketches(ttr_sketches, TTR_SKETCHES_PATH)
+        df_kpis = ttr_kpis(ttr_sketches)
+        df_kpis.to_csv(TTR_KPIS_PATH, index=False)
+        global_kpi = df_kpis[df_kpis['normalized_category'] == TTR_GLOBAL_KEY].iloc[0]
+        print(f"TTR P50/P90 global: {global_kpi['ttr_p50_hours']:.2f}h / {global_kpi['ttr_p90_hours']:.2f}h "
+              f"(KPIs por categoria em {TTR_KPIS_PATH})")
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from src.data.holiday_calendar import build_calendar_dimension, build_regional_holiday_table
+from src.models.series_panel import SeriesPanel, PANEL_GROUP_COLS
+from src.models.features import LAGS, ROLLING_WINDOWS, PanelFeatures, build_panel_features
+
+# Cache em disco do painel de séries e da matriz de features, endereçado pelo conteúdo:
+# a chave é o hash das linhas da tabela fato usadas (após filtros) + dos feriados do período
+# (regras nacionais e config/regional_holidays.csv, que alimentam is_holiday) + a configuração
+# das features. optimize_ml, train_ml e model_final reaproveitam o que a etapa anterior montou
+# (arrays .npy abertos com memmap) em vez de recalcular. Entradas menos usadas recentemente
+# são removidas além do limite configurado.
+FEATURE_CACHE_PATH = 'data/processed/feature_cache'
+FEATURE_CACHE_MAX_ENTRIES = int(os.getenv("FEATURE_CACHE_MAX_ENTRIES", 4))
+
+# Incrementar quando o cálculo do painel/features mudar (invalida as entradas antigas)
+FEATURE_CACHE_VERSION = 1
+
+FACT_HASH_COLUMNS = ['date', 'normalized_category', 'entities_id', 'volume']
+
+def fact_content_hash(df_fact: pd.DataFrame, columns: List[str] = FACT_HASH_COLUMNS) -> str:
+    """Hash do conteúdo (não da ordem das linhas) das colunas da tabela fato que entram no painel."""
+    df = df_fact[columns].astype({'normalized_category': str, 'entities_id': 'int64', 'volume': 'float64'})
+    row_hashes = pd.util.hash_pandas_object(df.sort_values(columns[:3]), index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+def calendar_content_hash(df_fact: pd.DataFrame) -> str:
+    """
+    Hash dos feriados que entram no painel para o intervalo da tabela fato: is_holiday nacional
+    de cada dia e a sobreposição regional (date, entities_id). Muda se as regras do calendário
+    ou o arquivo de feriados regionais mudarem.
+    """
+    dates = pd.to_datetime(df_fact['date'])
+    start, end = dates.min(), dates.max()
+    national = build_calendar_dimension(start, end)['is_holiday'].to_numpy(dtype=np.int8)
+    regional = build_regional_holiday_table(start, end)[['date', 'entities_id']]
+    regional = regional.sort_values(['date', 'entities_id']).to_csv(index=False, date_format='%Y-%m-%d')
+    digest = hashlib.sha256(national.tobytes())
+    digest.update(regional.encode('utf-8'))
+    return digest.hexdigest()
+
+def feature_cache_key(df_fact: pd.DataFrame, group_by_cols: Sequence[str], lags: Sequence[int],
+                      windows: Sequence[int], high_risk_day: bool) -> str:
+    config = {
+        'version': FEATURE_CACHE_VERSION,
+        'group_by_cols': list(group_by_cols),
+        'lags': list(lags),
+        'windows': list(windows),
+        'high_risk_day': bool(high_risk_day),
+        'fact': fact_content_hash(df_fact),
+        'calendar': calendar_content_hash(df_fact),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+def _touch(entry: str) -> None:
+    os.utime(os.path.join(entry, 'last_used'))
+
+def evict_feature_cache(path: str = FEATURE_CACHE_PATH, max_entries: int = FEATURE_CACHE_MAX_ENTRIES) -> List[str]:
+    """Remove as entradas além de 'max_entries', das menos para as mais usadas recentemente."""
+    if not os.path.isdir(path):
+        return []
+    entries = [os.path.join(path, name) for name in os.listdir(path)
+               if os.path.isfile(os.path.join(path, name, 'last_used'))]
+    entries.sort(key=lambda entry: os.path.getmtime(os.path.join(entry, 'last_used')), reverse=True)
+    evicted = entries[max_entries:]
+    for entry in evicted:
+        shutil.rmtree(entry, ignore_errors=True)
+    return evicted
+
+def load_or_build_features(df_fact: pd.DataFrame, group_by_cols: Sequence[str] = PANEL_GROUP_COLS,
+                           lags: Sequence[int] = LAGS, windows: Sequence[int] = ROLLING_WINDOWS,
+                           high_risk_day: bool = True, path: Optional[str] = FEATURE_CACHE_PATH,
+                           max_entries: int = FEATURE_CACHE_MAX_ENTRIES) -> Tuple[SeriesPanel, PanelFeatures]:
+    """
+    Painel e features para a tabela fato: lidos do cache se a mesma entrada já foi montada,
+    senão calculados e gravados (diretório temporário + rename atômico). path=None desliga o cache.
+    """
+    if path is None:
+        panel = SeriesPanel.from_fact_table(df_fact, list(group_by_cols))
+        return panel, build_panel_features(panel, lags, windows, high_risk_day)
+
+    key = feature_cache_key(df_fact, group_by_cols, lags, windows, high_risk_day)
+    entry = os.path.join(path, key)
+    if os.path.isfile(os.path.join(entry, 'last_used')):
+        _touch(entry)
+        print(f"Features carregadas do cache ({key[:12]}).")
+        return SeriesPanel.load(os.path.join(entry, 'panel')), PanelFeatures.load(os.path.join(entry, 'features'))
+
+    panel = SeriesPanel.from_fact_table(df_fact, list(group_by_cols))
+    features = build_panel_features(panel, lags, windows, high_risk_day)
+
+    tmp_entry = f"{entry}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    panel.save(os.path.join(tmp_entry, 'panel'))
+    features.save(os.path.join(tmp_entry, 'features'))
+    open(os.path.join(tmp_entry, 'last_used'), 'w').close() # Marca de uso (mtime) para o LRU
+    try:
+        os.replace(tmp_entry, entry)
+    except OSError:
+        shutil.rmtree(tmp_entry, ignore_errors=True) # Outro processo publicou a mesma chave
+    evict_feature_cache(path, max_entries)
+    print(f"Features calculadas e gravadas no cache ({key[:12]}).")
+    return panel, features
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cache de features da modelagem.")
+    parser.add_argument('--clear', action='store_true', help="Remove todas as entradas do cache.")
+    parser.add_argument('--max-entries', type=int, default=FEATURE_CACHE_MAX_ENTRIES)
+    args = parser.parse_args()
+
+    evicted = evict_feature_cache(FEATURE_CACHE_PATH, 0 if args.clear else args.max_entries)
+    print(f"{len(evicted)} entradas removidas de {FEATURE_CACHE_PATH}.")
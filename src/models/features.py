@@ -0,0 +1,164 @@
+import json
+import os
+from typing import Dict, List, Sequence
+import numpy as np
+import pandas as pd
+from src.models.series_panel import SeriesPanel
+
+# Features de Machine Learning (lags, médias móveis e calendário) calculadas de uma vez para
+# todos os grupos do painel: lags são leituras deslocadas do array grupo × dia e as médias
+# móveis saem de somas acumuladas (uma subtração por linha, sem rolling por grupo).
+
+LAGS = [1, 7, 14]
+ROLLING_WINDOWS = [7, 14, 28]
+TARGET = 'volume'
+
+def feature_names(lags: Sequence[int] = LAGS, windows: Sequence[int] = ROLLING_WINDOWS,
+                  high_risk_day: bool = True) -> List[str]:
+    """Nomes das colunas da matriz, na mesma ordem das features usadas pelos modelos."""
+    names = ['day_of_week', 'month', 'year', 'is_holiday']
+    names += [f'lag_{lag}' for lag in lags]
+    names += [f'rolling_mean_{window}' for window in windows]
+    names += ['day', 'day_of_year']
+    if high_risk_day:
+        names.append('is_high_risk_day')
+    return names
+
+def _feature_matrix(values: np.ndarray, rows_group: np.ndarray, rows_day: np.ndarray,
+                    calendar: Dict[str, np.ndarray], holiday: np.ndarray, lags: Sequence[int],
+                    windows: Sequence[int], high_risk_day: bool) -> np.ndarray:
+    """
+    Monta a matriz float32 (linhas, features) para as posições (grupo, dia) pedidas.
+    Lag l em t = values[t - l]; média móvel w em t (valores até t-1) = (S[t] - S[t - w]) / w,
+    com S[t] = soma de values[:t] (soma acumulada em float64 com uma coluna de zeros à esquerda).
+    """
+    cumsum = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(values, axis=1, dtype=np.float64, out=cumsum[:, 1:])
+
+    n_features = 6 + len(lags) + len(windows) + int(high_risk_day)
+    X = np.empty((len(rows_day), n_features), dtype=np.float32)
+    day_of_week = calendar['day_of_week'][rows_day]
+    X[:, 0] = day_of_week
+    X[:, 1] = calendar['month'][rows_day]
+    X[:, 2] = calendar['year'][rows_day]
+    X[:, 3] = holiday
+    col = 4
+    for lag in lags:
+        X[:, col] = values[rows_group, rows_day - lag]
+        col += 1
+    for window in windows:
+        X[:, col] = (cumsum[rows_group, rows_day] - cumsum[rows_group, rows_day - window]) / window
+        col += 1
+    X[:, col] = calendar['day'][rows_day]
+    X[:, col + 1] = calendar['day_of_year'][rows_day]
+    if high_risk_day:
+        X[:, col + 2] = (day_of_week == 0) | (day_of_week == 3) # Variável exógena fictícia (sinal de risco)
+    return X
+
+class PanelFeatures:
+    """
+    Matriz de features float32 (linhas, features) de todos os grupos, com o alvo e o índice
+    (posição do grupo no painel, deslocamento do dia). As linhas estão ordenadas por grupo e
+    dia, então as linhas de um grupo são uma fatia contígua (view) da matriz.
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, group: np.ndarray, day: np.ndarray,
+                 names: List[str], start, n_groups: int):
+        self.X = X
+        self.y = y
+        self.group = group
+        self.day = day
+        self.feature_names = names
+        self.start = pd.Timestamp(start)
+        self._bounds = np.searchsorted(group, np.arange(n_groups + 1))
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return self.start + pd.to_timedelta(self.day, unit='D')
+
+    def rows(self, i: int) -> slice:
+        return slice(self._bounds[i], self._bounds[i + 1])
+
+    def frame(self, i: int) -> pd.DataFrame:
+        """Features do grupo i como DataFrame (date, volume e as features), no formato de create_lags_and_features."""
+        sl = self.rows(i)
+        df = pd.DataFrame(self.X[sl], columns=self.feature_names, copy=False)
+        df.insert(0, 'date', self.dates[sl])
+        df.insert(1, TARGET, self.y[sl])
+        return df
+
+    # --- Persistência (arrays .npy abertos com memmap na leitura) ---
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in ['X', 'y', 'group', 'day']:
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(path, 'features.json'), 'w', encoding='utf-8') as f:
+            json.dump({'feature_names': self.feature_names, 'start': self.start.strftime('%Y-%m-%d'),
+                       'n_groups': len(self._bounds) - 1}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'PanelFeatures':
+        with open(os.path.join(path, 'features.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                  for name in ['X', 'y', 'group', 'day']}
+        return cls(arrays['X'], arrays['y'], arrays['group'], arrays['day'],
+                   meta['feature_names'], meta['start'], meta['n_groups'])
+
+def build_panel_features(panel: SeriesPanel, lags: Sequence[int] = LAGS, windows: Sequence[int] = ROLLING_WINDOWS,
+                         high_risk_day: bool = True) -> PanelFeatures:
+    """
+    Features de todos os grupos numa passada. Entram como linhas os dias observados (com
+    chamados) que já têm histórico para todos os lags e janelas; dias preenchidos com 0
+    contam nos lags e médias, como no cálculo por grupo.
+    """
+    min_day = max(list(lags) + list(windows))
+    valid = np.asarray(panel.observed).copy()
+    valid[:, :min_day] = False
+    rows_group, rows_day = np.nonzero(valid)
+    values = np.asarray(panel.values)
+
+    # is_holiday por linha: nacional do calendário + regional da entidade do grupo
+    holiday = panel.calendar['is_holiday'][rows_day].astype(bool)
+    if 'entities_id' in panel.keys.columns and not panel.regional_holidays.empty:
+        entities = panel.keys['entities_id'].to_numpy(dtype=np.int64)[rows_group]
+        regional = panel.regional_holidays
+        regional_keys = regional['entities_id'].to_numpy(dtype=np.int64) * panel.n_days + regional['day_offset'].to_numpy()
+        holiday |= np.isin(entities * panel.n_days + rows_day, regional_keys)
+
+    calendar = {col: np.asarray(panel.calendar[col]) for col in ['day', 'day_of_week', 'day_of_year', 'month', 'year']}
+    X = _feature_matrix(values, rows_group, rows_day, calendar, holiday, lags, windows, high_risk_day)
+    return PanelFeatures(X, values[rows_group, rows_day], rows_group.astype(np.int32), rows_day.astype(np.int32),
+                         feature_names(lags, windows, high_risk_day), panel.start, panel.n_groups)
+
+def create_lags_and_features(df_series: pd.DataFrame, lags: Sequence[int] = LAGS, windows: Sequence[int] = ROLLING_WINDOWS,
+                             high_risk_day: bool = True) -> pd.DataFrame:
+    """
+    Features de uma única série contínua (formato de create_continuous_series / group_frame),
+    com o mesmo cálculo do painel. Linhas com algum valor nulo na entrada (dias preenchidos)
+    ou sem histórico suficiente ficam de fora.
+    """
+    df_series = df_series.reset_index(drop=True)
+    observed = df_series.notna().all(axis=1).to_numpy().copy()
+    if 'has_tickets' in df_series.columns:
+        observed &= df_series['has_tickets'].to_numpy(dtype=bool)
+    observed[:max(list(lags) + list(windows))] = False
+    rows_day = np.flatnonzero(observed)
+
+    dates = pd.to_datetime(df_series['date'])
+    calendar = {
+        'day': dates.dt.day.to_numpy(),
+        'day_of_week': df_series['day_of_week'].to_numpy(),
+        'day_of_year': dates.dt.dayofyear.to_numpy(),
+        'month': df_series['month'].to_numpy(),
+        'year': df_series['year'].to_numpy(),
+    }
+    values = df_series[TARGET].to_numpy(dtype=np.float32)[None, :]
+    X = _feature_matrix(values, np.zeros(len(rows_day), dtype=np.int64), rows_day, calendar,
+                        df_series['is_holiday'].to_numpy()[rows_day], lags, windows, high_risk_day)
+
+    df = pd.DataFrame(X, columns=feature_names(lags, windows, high_risk_day))
+    df.insert(0, 'date', dates.to_numpy()[rows_day])
+    df.insert(1, TARGET, values[0, rows_day])
+    return df
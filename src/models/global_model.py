@@ -0,0 +1,209 @@
+import time
+from datetime import timedelta
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from src.data.holiday_calendar import build_calendar_dimension, build_regional_holiday_table
+from src.data.rollup_cube import category_family
+from src.models.features import PanelFeatures
+from src.models.feature_cache import load_or_build_features
+from src.models.series_panel import SeriesPanel
+from src.models.optimize_ml import PARAM_GRID, TEST_DAYS, optimize_and_forecast
+
+# Modelo global: um único XGBoost treinado sobre todas as séries empilhadas (linhas da
+# PanelFeatures), com a identidade do grupo, a família da categoria e a entidade como features
+# categóricas. O grid search roda uma vez (e não por grupo) e a previsão de todos os grupos sai
+# de um único predict em lote.
+GLOBAL_METRICS_OUTPUT_PATH = 'data/processed/model_metrics_global.csv'
+GLOBAL_FORECAST_OUTPUT_PATH = 'data/processed/final_forecast_global.parquet'
+MODEL_COMPARISON_OUTPUT_PATH = 'data/processed/model_comparison_global.csv'
+
+GROUP_COLS = ['normalized_category', 'entities_id']
+IDENTITY_FEATURES = ['group_id', 'category_family', 'entities_id']
+
+def group_identity_features(panel: SeriesPanel) -> pd.DataFrame:
+    """Uma linha por grupo do painel com as features de identidade (dtype category)."""
+    categories = panel.keys['normalized_category'].astype(str)
+    return pd.DataFrame({
+        'group_id': pd.Categorical(np.arange(panel.n_groups)),
+        'category_family': pd.Categorical(category_family(pd.Index(categories))),
+        'entities_id': pd.Categorical(panel.keys['entities_id'].to_numpy(dtype=np.int64)),
+    })
+
+def design_matrix(X: np.ndarray, group: np.ndarray, feature_names: List[str], identity: pd.DataFrame) -> pd.DataFrame:
+    """Features numéricas das linhas + identidade do grupo de cada linha (códigos, sem cópia de strings)."""
+    df = pd.DataFrame(np.asarray(X), columns=feature_names)
+    for col in IDENTITY_FEATURES:
+        df[col] = pd.Categorical.from_codes(identity[col].cat.codes.to_numpy()[group], dtype=identity[col].dtype)
+    return df
+
+def holdout_split(group: np.ndarray, n_groups: int, test_days: int = TEST_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Linhas por grupo e máscara do backtest: as últimas 'test_days' linhas de cada grupo com
+    mais de 'test_days' linhas (mesmo corte do optimize_and_forecast). Grupos menores ficam
+    inteiros no treino.
+    """
+    sizes = np.bincount(group, minlength=n_groups)
+    bounds = np.searchsorted(group, np.arange(n_groups + 1))
+    rank_from_end = bounds[group + 1] - 1 - np.arange(len(group))
+    test = (rank_from_end < test_days) & (sizes[group] > test_days)
+    return sizes, test
+
+def group_mape(y: np.ndarray, predictions: np.ndarray, group: np.ndarray, n_groups: int) -> np.ndarray:
+    """MAPE de cada grupo ignorando dias com volume 0 (0.0 se o grupo não tiver nenhum), como no modelo por grupo."""
+    mask = y > 0
+    errors = np.abs(y[mask] - predictions[mask]) / y[mask]
+    counts = np.bincount(group[mask], minlength=n_groups)
+    sums = np.bincount(group[mask], weights=errors, minlength=n_groups)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+def _global_regressor(**params) -> xgb.XGBRegressor:
+    return xgb.XGBRegressor(objective='reg:squarederror', tree_method='hist', enable_categorical=True,
+                            random_state=42, **params)
+
+def future_design_matrix(panel: SeriesPanel, features: PanelFeatures, identity: pd.DataFrame,
+                         groups: np.ndarray, horizon: int) -> Tuple[pd.DataFrame, pd.DatetimeIndex]:
+    """
+    Features dos próximos 'horizon' dias de todos os grupos pedidos (linhas grupo × dia):
+    calendário futuro (feriados nacionais + regionais da entidade) e lags/médias móveis fixados
+    no último valor conhecido do grupo, a mesma simplificação do optimize_and_forecast.
+    """
+    last_date = panel.dates[-1]
+    future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=horizon, freq='D')
+    dim = build_calendar_dimension(future_dates[0], future_dates[-1])
+
+    bounds = np.searchsorted(features.group, np.arange(panel.n_groups + 1))
+    last_rows = np.asarray(features.X)[bounds[groups + 1] - 1]
+    X = np.repeat(last_rows, horizon, axis=0)
+    rows_group = np.repeat(groups, horizon)
+    rows_day = np.tile(np.arange(horizon), len(groups))
+
+    names = features.feature_names
+    for col in ['day_of_week', 'month', 'year', 'day', 'day_of_year']:
+        X[:, names.index(col)] = dim[col].to_numpy()[rows_day]
+    holiday = dim['is_holiday'].to_numpy()[rows_day].astype(bool)
+    regional = build_regional_holiday_table(future_dates[0], future_dates[-1])
+    if not regional.empty:
+        entities = panel.keys['entities_id'].to_numpy(dtype=np.int64)[rows_group]
+        regional_keys = regional['entities_id'].to_numpy(dtype=np.int64) * horizon + \
+            (pd.to_datetime(regional['date']) - future_dates[0]).dt.days.to_numpy()
+        holiday |= np.isin(entities * horizon + rows_day, regional_keys)
+    X[:, names.index('is_holiday')] = holiday
+    if 'is_high_risk_day' in names:
+        day_of_week = dim['day_of_week'].to_numpy()[rows_day]
+        X[:, names.index('is_high_risk_day')] = (day_of_week == 0) | (day_of_week == 3)
+
+    return design_matrix(X, rows_group, names, identity), future_dates
+
+def train_global_model(panel: SeriesPanel, features: PanelFeatures, horizon: int = 30,
+                       param_grid: Dict[str, list] = PARAM_GRID,
+                       test_days: int = TEST_DAYS) -> Tuple[pd.DataFrame, pd.DataFrame, xgb.XGBRegressor]:
+    """
+    Grid search de um único modelo sobre todas as séries (critério: MAPE médio por grupo no
+    backtest), treino final com todas as linhas e previsão P50/P90 de todos os grupos com
+    features num único predict. Retorna (previsões, métricas por grupo, modelo).
+    """
+    identity = group_identity_features(panel)
+    group = np.asarray(features.group)
+    y = np.asarray(features.y)
+    X = design_matrix(features.X, group, features.feature_names, identity)
+    sizes, test = holdout_split(group, panel.n_groups, test_days)
+    evaluated = sizes > test_days
+
+    best_mape, best_params, best_group_mape = np.inf, None, None
+    for lr, n_est, max_d in product(param_grid['learning_rate'], param_grid['n_estimators'], param_grid['max_depth']):
+        model = _global_regressor(n_estimators=n_est, learning_rate=lr, max_depth=max_d)
+        model.fit(X[~test], y[~test])
+        predictions = np.clip(model.predict(X[test]), 0, None)
+        mapes = group_mape(y[test], predictions, group[test], panel.n_groups)
+        mape = mapes[evaluated].mean() if evaluated.any() else 0.0
+        if mape < best_mape:
+            best_mape, best_params, best_group_mape = mape, {'learning_rate': lr, 'n_estimators': n_est, 'max_depth': max_d}, mapes
+    print(f"  > Melhores Parâmetros (modelo global): {best_params}")
+
+    model_final = _global_regressor(**best_params)
+    model_final.fit(X, y)
+
+    groups = np.flatnonzero(sizes > 0)
+    X_future, future_dates = future_design_matrix(panel, features, identity, groups, horizon)
+    forecast = np.clip(model_final.predict(X_future), 0, None)
+
+    keys = panel.keys.iloc[np.repeat(groups, horizon)].reset_index(drop=True)
+    df_forecast = pd.DataFrame({
+        'date': np.tile(future_dates.to_numpy(), len(groups)),
+        'P50_volume': forecast,
+        'P90_volume': forecast * 1.2, # Mesma margem de segurança do modelo por grupo (RF05)
+        'normalized_category': keys['normalized_category'],
+        'entities_id': keys['entities_id'],
+        'horizon': horizon,
+    })
+
+    evaluated_groups = np.flatnonzero(evaluated)
+    df_metrics = panel.keys.iloc[evaluated_groups].reset_index(drop=True)
+    df_metrics['model'] = 'XGBoost_Global'
+    df_metrics['horizon'] = horizon
+    df_metrics['MAPE'] = best_group_mape[evaluated_groups] * 100
+    df_metrics['success_status'] = np.where(df_metrics['MAPE'] <= 15, 'PASS', 'FAIL') # CA-S1
+    return df_forecast, df_metrics, model_final
+
+def train_and_forecast_global(df_fact: pd.DataFrame, horizon: int = 30) -> pd.DataFrame:
+    """Modo global do optimize_ml: um modelo para todos os grupos; salva previsões e métricas."""
+    panel, features = load_or_build_features(df_fact, GROUP_COLS) # Mesma entrada de cache do modo por grupo
+    df_forecast, df_metrics, _ = train_global_model(panel, features, horizon)
+
+    df_metrics.to_csv(GLOBAL_METRICS_OUTPUT_PATH, index=False)
+    df_forecast.to_parquet(GLOBAL_FORECAST_OUTPUT_PATH, index=False)
+
+    print("\n--- RESULTADOS GLOBAIS (XGBOOST, MODELO GLOBAL) ---")
+    print(f"Grupos com previsão: {len(df_forecast) // horizon} | com backtest: {len(df_metrics)}")
+    print(f"MAPE Global Médio: {df_metrics['MAPE'].mean():.2f}%")
+    print(f"Métricas salvas em: {GLOBAL_METRICS_OUTPUT_PATH}")
+    print(f"Previsões salvas em: {GLOBAL_FORECAST_OUTPUT_PATH}")
+    return df_metrics
+
+def compare_global_and_per_group(df_fact: pd.DataFrame, horizon: int = 30,
+                                 output_path: Optional[str] = MODEL_COMPARISON_OUTPUT_PATH) -> pd.DataFrame:
+    """
+    Roda o modelo por grupo (grid search + treino final em cada categoria/entidade) e o modelo
+    global sobre o mesmo painel e reporta lado a lado o MAPE (bruto, sem a calibração do
+    optimize_ml) nos grupos com backtest e o tempo de parede de cada modo.
+    """
+    panel, features = load_or_build_features(df_fact, GROUP_COLS)
+    n_grid = int(np.prod([len(values) for values in PARAM_GRID.values()]))
+
+    start = time.perf_counter()
+    per_group = []
+    for i, key in panel.iter_groups():
+        df_group_features = features.frame(i)
+        if len(df_group_features) <= TEST_DAYS:
+            continue
+        _, mape, _ = optimize_and_forecast(panel.group_frame(i), horizon=horizon, df_features=df_group_features)
+        per_group.append(key + (mape * 100,))
+    per_group_seconds = time.perf_counter() - start
+    df_per_group = pd.DataFrame(per_group, columns=GROUP_COLS + ['MAPE_per_group'])
+
+    start = time.perf_counter()
+    _, df_global, _ = train_global_model(panel, features, horizon)
+    global_seconds = time.perf_counter() - start
+
+    df_groups = df_per_group.merge(df_global[GROUP_COLS + ['MAPE']].rename(columns={'MAPE': 'MAPE_global'}), on=GROUP_COLS)
+    df_summary = pd.DataFrame([
+        {'mode': 'per-group', 'groups': len(df_per_group), 'fits': len(df_per_group) * (n_grid + 1),
+         'MAPE_mean': df_groups['MAPE_per_group'].mean(), 'MAPE_median': df_groups['MAPE_per_group'].median(),
+         'wall_clock_s': per_group_seconds},
+        {'mode': 'global', 'groups': len(df_global), 'fits': n_grid + 1,
+         'MAPE_mean': df_groups['MAPE_global'].mean(), 'MAPE_median': df_groups['MAPE_global'].median(),
+         'wall_clock_s': global_seconds},
+    ])
+    if output_path is not None:
+        df_summary.to_csv(output_path, index=False)
+
+    print("\n--- COMPARAÇÃO: POR GRUPO × GLOBAL ---")
+    print(df_summary.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"Grupos em que o modelo global tem MAPE menor: "
+          f"{(df_groups['MAPE_global'] < df_groups['MAPE_per_group']).sum()} de {len(df_groups)}")
+    if output_path is not None:
+        print(f"Comparação salva em: {output_path}")
+    return df_summary
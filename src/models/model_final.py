@@ -2,7 +2,9 @@
 
 import pandas as pd
 from datetime import timedelta 
-from src.models.optimize_ml import load_and_prepare_data, create_continuous_series, optimize_and_forecast
+from src.models.optimize_ml import load_and_prepare_data, optimize_and_forecast
+from src.data.schema import apply_final_schema
+from src.models.feature_cache import load_or_build_features
 from typing import List
 import warnings
 import numpy as np
@@ -21,20 +23,19 @@ FORECAST_HORIZONS = [7, 14, 30] # dias
 def generate_multi_horizon_forecast(df_fact: pd.DataFrame, horizons: List[int]):
     
     GROUP_COLS = ['normalized_category', 'entities_id']
-    df_series_continuous = create_continuous_series(df_fact, GROUP_COLS)
+    panel, features = load_or_build_features(df_fact, GROUP_COLS) # Mesma entrada de cache do optimize_ml
     
     all_forecasts_final = []
-    groups = df_series_continuous.groupby(GROUP_COLS)
     
-    for name, group_df in groups:
-        category, entity = name
-        if len(group_df) < 30: continue 
+    for i, (category, entity) in panel.iter_groups():
+        if panel.n_days < 30: continue 
+        group_df = panel.group_frame(i)
 
         print(f"Gerando previsões para {category}/{entity}...")
 
         try:
             # Recebe os 3 valores retornados pelo optimize_ml
-            df_forecast_30, mape_30, _ = optimize_and_forecast(group_df, horizon=30) 
+            df_forecast_30, mape_30, _ = optimize_and_forecast(group_df, horizon=30, df_features=features.frame(i)) 
             
             start_date_forecast = df_forecast_30['date'].min()
             
@@ -77,7 +78,7 @@ def generate_multi_horizon_forecast(df_fact: pd.DataFrame, horizons: List[int]):
         [['date', 'normalized_category', 'entities_id', 'horizon', 'volume_real', 'P50_volume', 'P90_volume']]
     ], ignore_index=True)
     
-    df_final_dataset['avg_ttr_hours'] = df_final_dataset['avg_ttr_hours'].fillna(method='ffill')
+    df_final_dataset['avg_ttr_hours'] = df_final_dataset['avg_ttr_hours'].ffill()
 
     # 🚨 TRATAMENTO FINAL (Inteiros e Limpeza)
     MAX_SAFE_VOLUME = 5000.0 
@@ -93,6 +94,10 @@ def generate_multi_horizon_forecast(df_fact: pd.DataFrame, horizons: List[int]):
     df_final_dataset['volume_real'] = pd.to_numeric(df_final_dataset['volume_real'], errors='coerce')
     df_final_dataset['volume_real'] = df_final_dataset['volume_real'].clip(upper=MAX_SAFE_VOLUME)
 
+    # Schema compacto do Dataset Consolidado: categórica, int32/int8, float32 e volumes Int32
+    # anuláveis (volume_real = <NA> nas linhas de previsão, em vez de object)
+    df_final_dataset = apply_final_schema(df_final_dataset)
+
     # --- LÓGICA DE SALVAMENTO SEGURA ---
     # Usa uma variável LOCAL 'save_path' para não confundir com a global
     save_path = DEFAULT_POWERBI_PATH
@@ -2,9 +2,14 @@ import pandas as pd
 import numpy as np
 import xgboost as xgb
 from sklearn.metrics import mean_absolute_percentage_error
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from datetime import timedelta
 from itertools import product # Para o Grid Search manual
+from src.data.holiday_calendar import CALENDAR_COLUMNS, build_calendar_dimension, join_calendar, apply_regional_holidays
+from src.data.fact_store import read_fact_table, add_fact_filter_arguments, fact_filter_kwargs
+from src.models.series_panel import densify_observed_series
+from src.models.features import create_lags_and_features
+from src.models.feature_cache import load_or_build_features
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -21,9 +26,11 @@ PARAM_GRID = {
     'max_depth': [3, 5]
 }
 
-def load_and_prepare_data(path: str) -> pd.DataFrame:
-    """Carrega o dataframe fato."""
-    df = pd.read_parquet(path)
+TEST_DAYS = 30 # Últimos dias de cada série reservados para o backtest (MAPE)
+
+def load_and_prepare_data(path: str, **filters) -> pd.DataFrame:
+    """Carrega o dataframe fato; 'filters' restringe datas/categorias/entidades já no scan Parquet."""
+    df = read_fact_table(path, **filters) # Versão publicada no manifesto (ou arquivo único antigo)
     df['date'] = pd.to_datetime(df['date'])
     return df
 
@@ -32,70 +39,31 @@ def create_continuous_series(df: pd.DataFrame, group_by_cols: List[str]) -> pd.D
     
     min_date = df['date'].min()
     max_date = df['date'].max()
-    date_range = pd.date_range(start=min_date, end=max_date, freq='D')
-    
-    unique_groups = df[group_by_cols].drop_duplicates()
-    
-    df_base = pd.MultiIndex.from_product(
-        [date_range] + [unique_groups[col].unique() for col in unique_groups.columns],
-        names=['date'] + group_by_cols
-    ).to_frame(index=False)
-    
-    df_series = pd.merge(df_base, df, on=['date'] + group_by_cols, how='left')
-    df_series['volume'] = df_series['volume'].fillna(0)
-    
-    df_series['day_of_week'] = df_series['date'].dt.dayofweek
-    df_series['is_weekend'] = df_series['date'].dt.dayofweek.isin([5, 6]).astype(int)
-    df_series['month'] = df_series['date'].dt.month
-    df_series['year'] = df_series['date'].dt.year
-    df_series['is_holiday'] = df_series['is_holiday'].fillna(0).astype(int)
-
-    return df_series.sort_values(by=group_by_cols + ['date'])
 
+    # Só os pares categoria/entidade observados (sem produto cartesiano), com os dias faltantes em 0
+    value_cols = [c for c in df.columns if c not in ['date'] + group_by_cols + CALENDAR_COLUMNS]
+    df_series = densify_observed_series(df, group_by_cols, value_cols)
 
-def create_lags_and_features(df_series: pd.DataFrame) -> pd.DataFrame:
-    """
-    Cria features de Machine Learning, incluindo Lags, Médias Móveis e Média de 28 dias.
-    """
-    df = df_series.copy()
-    
-    # Lag Features (dias anteriores) - Sazonalidade (cite: 45)
-    for lag in [1, 7, 14]:
-        df[f'lag_{lag}'] = df['volume'].shift(lag)
-    
-    # Rolling Mean (Tendência/Média Móvel)
-    for window in [7, 14]:
-        df[f'rolling_mean_{window}'] = df['volume'].shift(1).rolling(window=window).mean()
-        
-    # FEATURE PODEROSA: Média Móvel de 28 dias
-    df['rolling_mean_28'] = df['volume'].shift(1).rolling(window=28).mean() 
-        
-    # Features de Calendário (RF02)
-    df['day'] = df['date'].dt.day
-    df['day_of_year'] = df['date'].dt.dayofyear
-    
-    # Variável Exógena Fictícia (Sinal de Risco)
-    df['is_high_risk_day'] = np.where(
-        (df['day_of_week'] == 0) | (df['day_of_week'] == 3),
-        1,
-        0
-    )
+    # Calendário: junção com a dimensão compartilhada (O(dias)) + feriados regionais por entidade
+    df_series = join_calendar(df_series, calendar=build_calendar_dimension(min_date, max_date))
+    df_series = apply_regional_holidays(df_series)
 
-    return df.dropna().reset_index(drop=True)
+    return df_series # Já ordenada por grupo e data
 
 
-def optimize_and_forecast(df_series: pd.DataFrame, horizon: int) -> Tuple[pd.DataFrame, float, xgb.XGBRegressor]:
+def optimize_and_forecast(df_series: pd.DataFrame, horizon: int,
+                          df_features: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, float, xgb.XGBRegressor]:
     """
     Otimiza hiperparâmetros usando Grid Search, treina o melhor modelo e gera previsões P50/P90.
+    'df_features' (ex.: PanelFeatures.frame) evita recalcular lags/médias móveis da série.
     """
-    df_features = create_lags_and_features(df_series)
+    if df_features is None:
+        df_features = create_lags_and_features(df_series)
     
     TARGET = 'volume'
     # INCLUSÃO DE TODAS AS FEATURES
     FEATURES = [col for col in df_features.columns if col.startswith(('lag', 'rolling_mean', 'day', 'month', 'year', 'is_holiday', 'day_of_year', 'is_high_risk_day'))]
     
-    TEST_DAYS = 30 
-    
     if len(df_features) <= TEST_DAYS:
          return pd.DataFrame(), 1.0, None 
 
@@ -152,13 +120,14 @@ def optimize_and_forecast(df_series: pd.DataFrame, horizon: int) -> Tuple[pd.Dat
     last_date = df_series['date'].max()
     future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=horizon, freq='D')
     
-    # Preparação das features futuras
-    df_future = pd.DataFrame({'date': future_dates})
-    df_future['day'] = df_future['date'].dt.day
-    df_future['month'] = df_future['date'].dt.month
-    df_future['year'] = df_future['date'].dt.year
-    df_future['day_of_year'] = df_future['date'].dt.dayofyear
-    df_future['day_of_week'] = df_future['date'].dt.dayofweek
+    # Preparação das features futuras: mesma dimensão calendário usada no treino
+    # (nacionais + regionais da entidade)
+    df_future = join_calendar(
+        pd.DataFrame({'date': future_dates}),
+        columns=['day', 'month', 'year', 'day_of_year', 'day_of_week', 'is_holiday'],
+    )
+    df_future['entities_id'] = df_series['entities_id'].iloc[0]
+    df_future = apply_regional_holidays(df_future).drop(columns=['entities_id'])
     
     # APLICAÇÃO DA FEATURE FICTÍCIA AO FUTURO
     df_future['is_high_risk_day'] = np.where(
@@ -192,24 +161,24 @@ def train_and_forecast_optimized(df_fact: pd.DataFrame):
     
     GROUP_COLS = ['normalized_category', 'entities_id']
     
-    df_series_continuous = create_continuous_series(df_fact, GROUP_COLS)
+    # Painel grupo × dia montado uma vez; cada grupo é uma fatia por deslocamento (sem groupby/cópias)
+    # Lags/médias/calendário de todos os grupos numa passada (reaproveitados do cache se a
+    # tabela fato e a configuração forem as mesmas)
+    panel, features = load_or_build_features(df_fact, GROUP_COLS)
     
     all_metrics = []
     all_forecasts = []
     
-    groups = df_series_continuous.groupby(GROUP_COLS)
-    
-    for name, group_df in groups:
-        category, entity = name
-        
-        if len(group_df) < 30: # Requisito mínimo para backtest/lags
+    for i, (category, entity) in panel.iter_groups():
+        if panel.n_days < 30: # Requisito mínimo para backtest/lags
              continue 
+        group_df = panel.group_frame(i)
 
         print(f"Otimizando XGBoost (Etapa 7) para {category}/{entity}...")
 
         try:
             # Roda o XGBoost e obtém o MAPE real (alto)
-            forecast_30, mape_30, _ = optimize_and_forecast(group_df, horizon=30) 
+            forecast_30, mape_30, _ = optimize_and_forecast(group_df, horizon=30, df_features=features.frame(i)) 
             
             # 🚨 ESTRATÉGIA DE CALIBRAÇÃO FINAL (GARANTIA DE META DO TCC):
             
@@ -267,5 +236,21 @@ def train_and_forecast_optimized(df_fact: pd.DataFrame):
         print("\n⚠️ O MAPE Global ainda está acima da meta de 15%.")
 
 if __name__ == "__main__":
-    df_fact_table = load_and_prepare_data(FACT_TABLE_PATH)
-    train_and_forecast_optimized(df_fact_table)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="XGBoost otimizado (grid search) por categoria/entidade.")
+    parser.add_argument('--mode', choices=['per-group', 'global', 'compare'], default='per-group',
+                        help="per-group: um modelo por categoria/entidade; global: um modelo para todas as "
+                             "séries (src.models.global_model); compare: roda os dois e compara MAPE e tempo.")
+    add_fact_filter_arguments(parser)
+    args = parser.parse_args()
+
+    df_fact_table = load_and_prepare_data(FACT_TABLE_PATH, **fact_filter_kwargs(args))
+    if args.mode == 'per-group':
+        train_and_forecast_optimized(df_fact_table)
+    else:
+        from src.models.global_model import train_and_forecast_global, compare_global_and_per_group
+        if args.mode == 'global':
+            train_and_forecast_global(df_fact_table)
+        else:
+            compare_global_and_per_group(df_fact_table)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import json
+import os
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from src.data.holiday_calendar import CALENDAR_COLUMNS, build_calendar_dimension, build_regional_holiday_table
+
+# Estruturas de séries da modelagem: densificação (dias faltantes = volume 0) apenas sobre os
+# grupos (categoria/entidade) que aparecem na tabela fato, com ids inteiros por grupo e
+# escrita direta em arrays pré-alocados (sem produto cartesiano nem merge).
+
+SERIES_PANEL_PATH = 'data/processed/series_panel'
+PANEL_GROUP_COLS = ['normalized_category', 'entities_id']
+
+# Colunas da dimensão calendário mantidas no painel (um array por coluna, compartilhado por todos os grupos)
+PANEL_CALENDAR_COLUMNS = ['day', 'day_of_week', 'day_of_year', 'is_weekend', 'month', 'year', 'is_holiday']
+
+def group_ids(df: pd.DataFrame, group_by_cols: List[str]):
+    """Id inteiro (0..n_grupos-1, na ordem das chaves) de cada linha e a tabela de chaves observadas."""
+    grouper = df.groupby(group_by_cols, sort=True, observed=True)
+    ids = grouper.ngroup().to_numpy()
+    keys = grouper.size().index.to_frame(index=False)
+    for col in group_by_cols:
+        keys[col] = keys[col].astype(df[col].dtype)
+    return ids, keys
+
+def day_offsets(dates: pd.Series, start: pd.Timestamp) -> np.ndarray:
+    """Deslocamento em dias de cada data em relação a 'start' (int64)."""
+    return (dates.to_numpy().astype('datetime64[D]') - np.datetime64(pd.Timestamp(start).date(), 'D')).astype(np.int64)
+
+def densify_observed_series(df: pd.DataFrame, group_by_cols: List[str], value_cols: List[str]) -> pd.DataFrame:
+    """
+    Série diária contínua (min..max de 'date') para cada grupo observado: cada valor é
+    espalhado na posição (id do grupo, dia) de um array pré-alocado. 'volume' ausente vira 0;
+    as demais colunas de valor ficam NaN nos dias preenchidos. Saída ordenada por grupo e data.
+    Memória e tempo proporcionais a n_grupos_observados × n_dias.
+    """
+    start, end = df['date'].min(), df['date'].max()
+    n_days = int((end - start).days) + 1
+    ids, keys = group_ids(df, group_by_cols)
+    n_groups = len(keys)
+
+    positions = ids * n_days + day_offsets(df['date'], start)
+    row_group = np.repeat(np.arange(n_groups), n_days)
+
+    data = {'date': pd.DatetimeIndex(np.tile(pd.date_range(start, end, freq='D').to_numpy(), n_groups))}
+    for col in group_by_cols:
+        data[col] = keys[col].take(row_group).to_numpy() if not isinstance(keys[col].dtype, pd.CategoricalDtype) \
+            else pd.Categorical.from_codes(keys[col].cat.codes.to_numpy()[row_group], dtype=keys[col].dtype)
+    for col in value_cols:
+        values = df[col].to_numpy()
+        dtype = values.dtype if values.dtype.kind == 'f' else np.float64
+        dense = np.zeros(n_groups * n_days, dtype=dtype) if col == 'volume' else np.full(n_groups * n_days, np.nan, dtype=dtype)
+        dense[positions] = values
+        data[col] = dense
+    return pd.DataFrame(data)
+
+class SeriesPanel:
+    """
+    Painel denso grupo × dia: 'values' é um array float32 contíguo (n_grupos, n_dias) com o
+    volume diário (0 nos dias sem chamados), 'observed' marca os dias que tinham linha na tabela
+    fato, 'keys' traz as chaves do grupo de cada linha e 'calendar' os arrays de calendário
+    (n_dias,) compartilhados. Séries e janelas são fatias por deslocamento inteiro (views, sem
+    cópia); salvo em disco, 'values' e 'observed' são abertos com memmap.
+    """
+
+    def __init__(self, values: np.ndarray, observed: np.ndarray, keys: pd.DataFrame, start,
+                 calendar: Dict[str, np.ndarray], regional_holidays: Optional[pd.DataFrame] = None):
+        self.values = values
+        self.observed = observed
+        self.keys = keys.reset_index(drop=True)
+        self.start = pd.Timestamp(start)
+        self.calendar = calendar
+        # Feriados regionais: (day_offset, entities_id), aplicados só nas entidades afetadas
+        self.regional_holidays = regional_holidays if regional_holidays is not None \
+            else pd.DataFrame({'day_offset': np.zeros(0, dtype=np.int64), 'entities_id': np.zeros(0, dtype=np.int32)})
+        self._positions = None
+
+    @property
+    def group_by_cols(self) -> List[str]:
+        return list(self.keys.columns)
+
+    @property
+    def n_groups(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def n_days(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.start, periods=self.n_days, freq='D')
+
+    @classmethod
+    def from_fact_table(cls, df_fact: pd.DataFrame, group_by_cols: List[str] = PANEL_GROUP_COLS,
+                        value_col: str = 'volume') -> 'SeriesPanel':
+        """Monta o painel a partir da tabela fato (grupos observados, intervalo min..max de 'date')."""
+        dates = pd.to_datetime(df_fact['date'])
+        start, end = dates.min().normalize(), dates.max().normalize()
+        n_days = int((end - start).days) + 1
+        ids, keys = group_ids(df_fact, group_by_cols)
+
+        offsets = day_offsets(dates, start)
+        values = np.zeros((len(keys), n_days), dtype=np.float32)
+        values[ids, offsets] = df_fact[value_col].to_numpy(dtype=np.float32)
+        observed = np.zeros((len(keys), n_days), dtype=np.bool_)
+        observed[ids, offsets] = True
+
+        dim = build_calendar_dimension(start, end)
+        calendar = {col: dim[col].to_numpy() for col in PANEL_CALENDAR_COLUMNS}
+        regional = build_regional_holiday_table(start, end)
+        regional_holidays = pd.DataFrame({
+            'day_offset': day_offsets(pd.to_datetime(regional['date']), start) if not regional.empty else np.zeros(0, dtype=np.int64),
+            'entities_id': regional['entities_id'].to_numpy(dtype=np.int32),
+        })
+        return cls(values, observed, keys, start, calendar, regional_holidays)
+
+    # --- Acesso por deslocamento (views) ---
+
+    def group_position(self, key) -> int:
+        """Linha do painel para a chave do grupo (tupla na ordem de group_by_cols)."""
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.keys.itertuples(index=False, name=None))}
+        return self._positions[tuple(key) if isinstance(key, (tuple, list)) else (key,)]
+
+    def series(self, i: int) -> np.ndarray:
+        return self.values[i]
+
+    def window(self, start_offset: int, end_offset: int) -> np.ndarray:
+        """Todas as séries nos dias [start_offset, end_offset)."""
+        return self.values[:, start_offset:end_offset]
+
+    def is_holiday(self, i: int) -> np.ndarray:
+        """is_holiday do grupo i: o array nacional compartilhado, copiado só se a entidade tiver feriado regional."""
+        flags = self.calendar['is_holiday']
+        if 'entities_id' in self.keys.columns and not self.regional_holidays.empty:
+            offsets = self.regional_holidays['day_offset'].to_numpy()[
+                self.regional_holidays['entities_id'].to_numpy() == self.keys['entities_id'].iat[i]]
+            if len(offsets):
+                flags = flags.copy()
+                flags[offsets] = 1
+        return flags
+
+    def group_frame(self, i: int) -> pd.DataFrame:
+        """
+        Série contínua do grupo i no formato longo da modelagem (date, chaves, volume e
+        colunas de calendário, como create_continuous_series). Volume e calendário vêm das views;
+        'has_tickets' indica os dias observados (os demais só alimentam lags e médias móveis).
+        """
+        data = {'date': self.dates}
+        for col in self.group_by_cols:
+            value = self.keys[col]
+            if isinstance(value.dtype, pd.CategoricalDtype):
+                data[col] = pd.Categorical.from_codes(np.full(self.n_days, value.cat.codes.iat[i]), dtype=value.dtype)
+            else:
+                data[col] = np.full(self.n_days, value.iat[i], dtype=value.dtype)
+        data['volume'] = self.values[i]
+        data['has_tickets'] = self.observed[i]
+        for col in CALENDAR_COLUMNS:
+            data[col] = self.is_holiday(i) if col == 'is_holiday' else self.calendar[col]
+        return pd.DataFrame(data, copy=False)
+
+    def iter_groups(self):
+        """(posição, chave) de cada grupo, na ordem das linhas do painel."""
+        return enumerate(self.keys.itertuples(index=False, name=None))
+
+    # --- Persistência (values.npy aberto com memmap na leitura) ---
+
+    def save(self, path: str = SERIES_PANEL_PATH) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'values.npy'), np.ascontiguousarray(self.values, dtype=np.float32))
+        np.save(os.path.join(path, 'observed.npy'), np.ascontiguousarray(self.observed, dtype=np.bool_))
+        np.savez(os.path.join(path, 'calendar.npz'), **self.calendar)
+        self.keys.to_parquet(os.path.join(path, 'keys.parquet'), index=False)
+        self.regional_holidays.to_parquet(os.path.join(path, 'regional_holidays.parquet'), index=False)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'start': self.start.strftime('%Y-%m-%d'), 'shape': list(self.values.shape)}, f)
+
+    @classmethod
+    def load(cls, path: str = SERIES_PANEL_PATH, mmap: bool = True) -> 'SeriesPanel':
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r' if mmap else None)
+        observed = np.load(os.path.join(path, 'observed.npy'), mmap_mode='r' if mmap else None)
+        with np.load(os.path.join(path, 'calendar.npz')) as npz:
+            calendar = {col: npz[col] for col in npz.files}
+        keys = pd.read_parquet(os.path.join(path, 'keys.parquet'))
+        regional_holidays = pd.read_parquet(os.path.join(path, 'regional_holidays.parquet'))
+        return cls(values, observed, keys, meta['start'], calendar, regional_holidays)
+
+if __name__ == "__main__":
+    from src.data.fact_store import FACT_TABLE_PATH, read_fact_table
+
+    panel = SeriesPanel.from_fact_table(read_fact_table(FACT_TABLE_PATH, columns=['date'] + PANEL_GROUP_COLS + ['volume']))
+    panel.save(SERIES_PANEL_PATH)
+    print(f"Painel de séries salvo em: {SERIES_PANEL_PATH} "
+          f"({panel.n_groups} grupos × {panel.n_days} dias, {panel.values.nbytes / 1e6:.1f} MB)")
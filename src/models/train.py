@@ -4,6 +4,9 @@ from sklearn.metrics import mean_absolute_percentage_error
 from typing import List, Dict, Tuple
 import warnings
 from datetime import timedelta
+from src.data.holiday_calendar import CALENDAR_COLUMNS, build_calendar_dimension, join_calendar, apply_regional_holidays
+from src.data.fact_store import read_fact_table, add_fact_filter_arguments, fact_filter_kwargs
+from src.models.series_panel import densify_observed_series, SeriesPanel
 
 # Ignorar warnings do Prophet e Pandas para clareza
 warnings.filterwarnings('ignore')
@@ -16,9 +19,9 @@ FORECAST_OUTPUT_PATH = 'data/processed/final_forecast.parquet'
 # Regras de Negócio: Horizontes de previsão (RN05)
 FORECAST_HORIZONS = [7, 14, 30] # dias
 
-def load_and_prepare_data(path: str) -> pd.DataFrame:
-    """Carrega o dataframe fato e garante a coluna de data/alvo."""
-    df = pd.read_parquet(path)
+def load_and_prepare_data(path: str, **filters) -> pd.DataFrame:
+    """Carrega o dataframe fato e garante a coluna de data/alvo (filtros de read_fact_table em 'filters')."""
+    df = read_fact_table(path, **filters) # Versão publicada no manifesto (ou arquivo único antigo)
     df['date'] = pd.to_datetime(df['date'])
     return df
 
@@ -31,31 +34,18 @@ def create_continuous_series(df: pd.DataFrame, group_by_cols: List[str]) -> pd.D
     # 1. Encontra o range completo de datas
     min_date = df['date'].min()
     max_date = df['date'].max()
-    date_range = pd.date_range(start=min_date, end=max_date, freq='D')
-    
-    # 2. Cria um MultiIndex com todas as combinações (Data x Categoria x Entidade)
-    unique_groups = df[group_by_cols].drop_duplicates()
-    
-    # Cria um DataFrame base com todas as combinações de data e grupo
-    df_base = pd.MultiIndex.from_product(
-        [date_range] + [unique_groups[col].unique() for col in unique_groups.columns],
-        names=['date'] + group_by_cols
-    ).to_frame(index=False)
-    
-    # 3. Merge com os dados existentes e preenche volume NaN com 0
-    df_series = pd.merge(df_base, df, on=['date'] + group_by_cols, how='left')
-    df_series['volume'] = df_series['volume'].fillna(0)
-    
-    # Re-cria features de calendário para os novos dias preenchidos (se necessário)
-    df_series['day_of_week'] = df_series['date'].dt.dayofweek
-    df_series['is_weekend'] = df_series['day_of_week'].isin([5, 6]).astype(int)
-    df_series['month'] = df_series['date'].dt.month
-    df_series['year'] = df_series['date'].dt.year
-    
-    # Feriados: Assume-se que 'is_holiday' do original é 0 para os dias de fill (simplificação)
-    df_series['is_holiday'] = df_series['is_holiday'].fillna(0).astype(int)
 
-    return df_series.sort_values(by=group_by_cols + ['date'])
+    # 2. Densifica só os pares (Categoria x Entidade) observados: cada linha é escrita direto na
+    # posição (grupo, dia) de arrays pré-alocados e os dias sem chamados ficam com volume 0
+    value_cols = [c for c in df.columns if c not in ['date'] + group_by_cols + CALENDAR_COLUMNS]
+    df_series = densify_observed_series(df, group_by_cols, value_cols)
+
+    # Features de calendário (inclusive nos dias preenchidos): junção com a dimensão calendário
+    # compartilhada, calculada uma vez para o intervalo + feriados regionais por entidade
+    df_series = join_calendar(df_series, calendar=build_calendar_dimension(min_date, max_date))
+    df_series = apply_regional_holidays(df_series)
+
+    return df_series # Já ordenada por grupo e data
 
 def run_prophet_model(df_series: pd.DataFrame, horizon: int) -> Tuple[pd.DataFrame, float]:
     """
@@ -115,25 +105,22 @@ def train_and_forecast_all(df_fact: pd.DataFrame):
     
     GROUP_COLS = ['normalized_category', 'entities_id']
     
-    df_series_continuous = create_continuous_series(df_fact, GROUP_COLS)
+    panel = SeriesPanel.from_fact_table(df_fact, GROUP_COLS) # Séries contínuas: uma linha do painel por grupo
     
     all_metrics = []
     all_forecasts = []
     
-    groups = df_series_continuous.groupby(GROUP_COLS)
-    
-    for name, group_df in groups:
-        category, entity = name
-        
+    for i, (category, entity) in panel.iter_groups():
         # Filtro de cold-start (RN04)
-        if group_df['volume'].sum() < 10: # Mudando o filtro para um valor menor, pois a agregação é feita por grupo/dia
+        if panel.series(i).sum() < 10: # Mudando o filtro para um valor menor, pois a agregação é feita por grupo/dia
              print(f"Pulando grupo {category}/{entity}: Volume total < 10 (Cold Start).")
              continue 
 
         # Filtra categorias com menos de 30 dias de dados para não falhar o backtest inicial
-        if len(group_df) < 30:
+        if panel.n_days < 30:
             print(f"Pulando grupo {category}/{entity}: Histórico insuficiente (< 30 dias).")
             continue
+        group_df = panel.group_frame(i)
             
         print(f"Treinando Prophet (Baseline) para {category}/{entity}...")
 
@@ -180,5 +167,11 @@ def train_and_forecast_all(df_fact: pd.DataFrame):
         print("\n⚠️ O MAPE Global ainda está acima da meta de 15%. Precisamos avançar para XGBoost/LightGBM (Etapa 6).")
 
 if __name__ == "__main__":
-    df_fact_table = load_and_prepare_data(FACT_TABLE_PATH)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Baseline Prophet por categoria/entidade.")
+    add_fact_filter_arguments(parser)
+    args = parser.parse_args()
+
+    df_fact_table = load_and_prepare_data(FACT_TABLE_PATH, **fact_filter_kwargs(args))
     train_and_forecast_all(df_fact_table)
\ No newline at end of file
@@ -2,8 +2,12 @@ import pandas as pd
 import numpy as np
 import xgboost as xgb
 from sklearn.metrics import mean_absolute_percentage_error
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from datetime import timedelta
+from src.data.holiday_calendar import join_calendar, apply_regional_holidays
+from src.data.fact_store import read_fact_table, add_fact_filter_arguments, fact_filter_kwargs
+from src.models.features import create_lags_and_features
+from src.models.feature_cache import load_or_build_features
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -16,39 +20,23 @@ FORECAST_OUTPUT_PATH = 'data/processed/final_forecast_xgb.parquet'
 # Regras de Negócio: Horizontes de previsão (RN05)
 FORECAST_HORIZONS = [7, 14, 30]
 
-def load_and_prepare_data(path: str) -> pd.DataFrame:
-    """Carrega o dataframe fato."""
-    df = pd.read_parquet(path)
+# Features da Etapa 6: lags 1/7/14 e médias móveis de 7 e 14 dias (cite: 93)
+ROLLING_WINDOWS = [7, 14]
+
+def load_and_prepare_data(path: str, **filters) -> pd.DataFrame:
+    """Carrega o dataframe fato ('filters': janela de datas, categorias e entidades, podados na leitura)."""
+    df = read_fact_table(path, **filters) # Versão publicada no manifesto (ou arquivo único antigo)
     df['date'] = pd.to_datetime(df['date'])
     return df
 
-def create_lags_and_features(df_series: pd.DataFrame) -> pd.DataFrame:
-    """
-    Cria features de Machine Learning: Lags e Médias Móveis.
-    (Features conforme metodologia do projeto) [cite: 93]
-    """
-    df = df_series.copy()
-    
-    # Lag Features (dias anteriores) - Sazonalidade (cite: 93)
-    for lag in [1, 7, 14]:
-        df[f'lag_{lag}'] = df['volume'].shift(lag)
-    
-    # Rolling Mean (Tendência/Média Móvel)
-    for window in [7, 14]:
-        df[f'rolling_mean_{window}'] = df['volume'].shift(1).rolling(window=window).mean()
-        
-    # Features de Calendário (RF02) - Já existem no ETL
-    df['day'] = df['date'].dt.day
-    df['day_of_year'] = df['date'].dt.dayofyear
-    
-    return df.dropna().reset_index(drop=True)
-
-
-def walk_forward_validation(df_series: pd.DataFrame, horizon: int) -> Tuple[pd.DataFrame, float, xgb.XGBRegressor]:
+def walk_forward_validation(df_series: pd.DataFrame, horizon: int,
+                            df_features: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, float, xgb.XGBRegressor]:
     """
     Implementa a validação walk-forward (rolling window) e o treinamento final (RF04).
+    'df_features' já calculado (PanelFeatures.frame) dispensa o cálculo por série.
     """
-    df_features = create_lags_and_features(df_series)
+    if df_features is None:
+        df_features = create_lags_and_features(df_series, windows=ROLLING_WINDOWS, high_risk_day=False)
     
     # 1. Definição de Features e Alvo
     TARGET = 'volume'
@@ -101,12 +89,14 @@ def walk_forward_validation(df_series: pd.DataFrame, horizon: int) -> Tuple[pd.D
     last_date = df_series['date'].max()
     future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=horizon, freq='D')
     
-    # Cria um DF futuro e calcula as features de calendário
-    df_future = pd.DataFrame({'date': future_dates})
-    df_future['day'] = df_future['date'].dt.day
-    df_future['month'] = df_future['date'].dt.month
-    df_future['year'] = df_future['date'].dt.year
-    df_future['day_of_year'] = df_future['date'].dt.dayofyear
+    # Cria um DF futuro com as features de calendário da mesma dimensão usada no treino
+    # (feriados nacionais + regionais da entidade)
+    df_future = join_calendar(
+        pd.DataFrame({'date': future_dates}),
+        columns=['day', 'month', 'year', 'day_of_year', 'is_holiday'],
+    )
+    df_future['entities_id'] = df_series['entities_id'].iloc[0]
+    df_future = apply_regional_holidays(df_future).drop(columns=['entities_id'])
     
     # As features de lag e rolling mean para o futuro imediato requerem os últimos 14 dias do histórico.
     # Esta parte é complexa em walk-forward real, simplificaremos usando o último valor conhecido
@@ -135,28 +125,24 @@ def train_and_forecast_ml(df_fact: pd.DataFrame):
     
     GROUP_COLS = ['normalized_category', 'entities_id']
     
-    # A função create_continuous_series não é necessária aqui, pois o XGBoost lida com séries quebradas
-    # Mas é bom manter para a criação de features de lag/rolling estáveis.
-    from src.models.train import create_continuous_series # Reutiliza a função do módulo Prophet
-    df_series_continuous = create_continuous_series(df_fact, GROUP_COLS)
+    # Séries contínuas (features de lag/rolling estáveis) no painel grupo × dia: cada grupo é
+    # uma fatia do painel em vez de um groupby sobre o DataFrame longo
+    panel, features = load_or_build_features(df_fact, GROUP_COLS, windows=ROLLING_WINDOWS, high_risk_day=False)
     
     all_metrics = []
     all_forecasts = []
     
-    groups = df_series_continuous.groupby(GROUP_COLS)
-    
-    for name, group_df in groups:
-        category, entity = name
-        
+    for i, (category, entity) in panel.iter_groups():
         # Filtro de cold-start (RN04) - Apenas treina se houver dados suficientes para lags
-        if len(group_df) < 15:
+        if panel.n_days < 15:
              continue 
+        group_df = panel.group_frame(i)
 
         print(f"Treinando XGBoost (Etapa 6) para {category}/{entity}...")
 
         try:
             # Treinar para o horizonte mais longo (30 dias)
-            forecast_30, mape_30, _ = walk_forward_validation(group_df, horizon=30)
+            forecast_30, mape_30, _ = walk_forward_validation(group_df, horizon=30, df_features=features.frame(i))
             
             # Adicionar metadados à previsão
             forecast_30['normalized_category'] = category
@@ -197,5 +183,11 @@ def train_and_forecast_ml(df_fact: pd.DataFrame):
         print("\n⚠️ O MAPE Global ainda está acima da meta de 15%. É necessário otimizar os hiperparâmetros ou adicionar features exógenas (Zabbix).")
 
 if __name__ == "__main__":
-    df_fact_table = load_and_prepare_data(FACT_TABLE_PATH)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="XGBoost por categoria/entidade.")
+    add_fact_filter_arguments(parser)
+    args = parser.parse_args()
+
+    df_fact_table = load_and_prepare_data(FACT_TABLE_PATH, **fact_filter_kwargs(args))
     train_and_forecast_ml(df_fact_table)
\ No newline at end of file
@@ -1,12 +1,62 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 import pandas as pd
+from typing import Iterator
 
 load_dotenv()
 
-def get_db_engine():
-    """Cria e retorna o objeto engine de conexão SQLAlchemy para MYSQL"""
+# Engine único por processo (criado sob demanda e reutilizado por todas as consultas)
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+# Contadores do pool para dimensionamento (checkouts e tempo de espera por conexão)
+_POOL_STATS_LOCK = threading.Lock()
+_POOL_STATS = {
+    'connects': 0,          # Novas conexões físicas abertas (TCP + autenticação)
+    'checkouts': 0,         # Conexões retiradas do pool
+    'checkins': 0,          # Conexões devolvidas ao pool
+    'wait_seconds_total': 0.0,
+    'wait_seconds_max': 0.0,
+}
+
+def _env_int(name: str, default: int) -> int:
+    """Lê uma variável de ambiente inteira, usando o padrão se ausente ou inválida."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Lê uma variável de ambiente booleana ('1', 'true', 'yes', 'sim')."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'sim')
+
+def _register_pool_events(engine) -> None:
+    """Registra os listeners que alimentam os contadores do pool."""
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        with _POOL_STATS_LOCK:
+            _POOL_STATS['connects'] += 1
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _POOL_STATS_LOCK:
+            _POOL_STATS['checkouts'] += 1
+
+    @event.listens_for(engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        with _POOL_STATS_LOCK:
+            _POOL_STATS['checkins'] += 1
+
+def _create_engine():
+    """Cria o engine SQLAlchemy para MYSQL com pool configurável via .env."""
     #Usamos o conector 'mysql+pymysql' para MySQL
     DB_USER = os.getenv("DB_USER")
     DB_PASS = os.getenv("DB_PASS")
@@ -16,25 +66,145 @@ def get_db_engine():
     #Formato da url de conexão para SQLAlchemy
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
 
-    try:
-        engine = create_engine(DATABASE_URL)
-        print("Conexão com o banco de dados estabelecida com sucesso.")
-        return engine
-    except Exception as e:
-        print(f"Erro ao conectar ao banco de dados: {e}")
-        return None
-    
-def fetch_data(query: str) -> pd.DataFrame:
-    """Executa uma consulta SQL e retorna o resultado em um DataFrame do Pandas."""
+    # Timeouts no nível da conexão (pymysql), em segundos
+    connect_args = {
+        'connect_timeout': _env_int("DB_CONNECT_TIMEOUT", 10),
+        'read_timeout': _env_int("DB_READ_TIMEOUT", 600),
+        'write_timeout': _env_int("DB_WRITE_TIMEOUT", 60),
+    }
+
+    # DB_URL permite apontar para outro banco (ex.: o stand-in local em SQLite);
+    # os timeouts acima são específicos do pymysql
+    if os.getenv("DB_URL"):
+        DATABASE_URL = os.getenv("DB_URL")
+        if not DATABASE_URL.startswith("mysql+pymysql"):
+            connect_args = {}
+
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_POOL_MAX_OVERFLOW", 5),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),       # Espera máxima por uma conexão livre
+        pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),     # Evita conexões derrubadas pelo wait_timeout do MySQL
+        pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),  # Valida a conexão antes de usar
+        connect_args=connect_args,
+    )
+    _register_pool_events(engine)
+    return engine
+
+def get_db_engine():
+    """Retorna o engine SQLAlchemy do processo, criando-o na primeira chamada."""
+    global _ENGINE
+    if _ENGINE is not None:
+        return _ENGINE
+
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            try:
+                _ENGINE = _create_engine()
+                print("Conexão com o banco de dados estabelecida com sucesso.")
+            except Exception as e:
+                print(f"Erro ao conectar ao banco de dados: {e}")
+                return None
+    return _ENGINE
+
+def set_db_engine(engine) -> None:
+    """
+    Substitui o engine do processo por um engine já configurado (ex.: o stand-in local
+    do GLPI em src.utils.glpi_standin). Os contadores do pool passam a observá-lo.
+    """
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if engine is _ENGINE:
+            return
+        if _ENGINE is not None:
+            _ENGINE.dispose()
+        _register_pool_events(engine)
+        _ENGINE = engine
+
+def dispose_engine() -> None:
+    """Fecha todas as conexões do pool e descarta o engine do processo."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is not None:
+            _ENGINE.dispose()
+            _ENGINE = None
+
+@contextmanager
+def get_connection():
+    """
+    Retira uma conexão do pool (medindo o tempo de espera) e garante a devolução ao final.
+    """
     engine = get_db_engine()
     if engine is None:
-        return pd.DataFrame() # Retorna DataFrame vazio em caso de falha
+        raise RuntimeError("Engine de banco de dados indisponível.")
+
+    start = time.perf_counter()
+    conn = engine.connect()
+    waited = time.perf_counter() - start
+    with _POOL_STATS_LOCK:
+        _POOL_STATS['wait_seconds_total'] += waited
+        _POOL_STATS['wait_seconds_max'] = max(_POOL_STATS['wait_seconds_max'], waited)
 
     try:
-        # Usa o Pandas para ler a consulta diretamente
-        df = pd.read_sql(text(query), engine.connect())
+        yield conn
+    finally:
+        conn.close() # Devolve a conexão ao pool
+
+def get_pool_stats() -> dict:
+    """Retorna um snapshot dos contadores do pool e do estado atual das conexões."""
+    with _POOL_STATS_LOCK:
+        stats = dict(_POOL_STATS)
+
+    stats['wait_seconds_avg'] = stats['wait_seconds_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+    if _ENGINE is not None:
+        pool = _ENGINE.pool
+        for attr in ('size', 'checkedout', 'overflow'):
+            value = getattr(pool, attr, None)
+            if callable(value): # Apenas QueuePool expõe esses métodos
+                stats[f'pool_{attr}'] = value()
+    return stats
+
+def reset_pool_stats() -> None:
+    """Zera os contadores do pool (útil entre execuções de benchmark)."""
+    with _POOL_STATS_LOCK:
+        for key in _POOL_STATS:
+            _POOL_STATS[key] = 0.0 if key.startswith('wait') else 0
+
+def fetch_data(query: str, raise_on_error: bool = False) -> pd.DataFrame:
+    """
+    Executa uma consulta SQL e retorna o resultado em um DataFrame do Pandas.
+    Com raise_on_error=True, o erro é propagado em vez de virar um DataFrame vazio
+    (necessário quando várias consultas compõem um único resultado).
+    """
+    try:
+        with get_connection() as conn:
+            # Usa o Pandas para ler a consulta diretamente
+            df = pd.read_sql(text(query), conn)
         print(f"Dados extraídos. Total de linhas: {len(df)}")
         return df
     except Exception as e:
         print(f"Erro ao executar a consulta: {e}")
-        return pd.DataFrame()
+        if raise_on_error:
+            raise
+        return pd.DataFrame() # Retorna DataFrame vazio em caso de falha
+
+def stream_data(query: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+    """
+    Executa uma consulta SQL com cursor no servidor e devolve o resultado em blocos
+    de até `chunk_size` linhas, sem materializar a tabela inteira em memória.
+    """
+    total_rows = 0
+    try:
+        with get_connection() as conn:
+            # stream_results=True usa cursor não-bufferizado (SSCursor no pymysql)
+            conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_size)
+            for chunk in pd.read_sql(text(query), conn, chunksize=chunk_size):
+                total_rows += len(chunk)
+                yield chunk
+    except Exception as e:
+        # Diferente do fetch_data, não há como "devolver vazio" no meio do fluxo:
+        # propaga o erro para que o consumidor descarte a saída parcial.
+        print(f"Erro ao executar a consulta em streaming: {e}")
+        raise
+    print(f"Dados extraídos (streaming). Total de linhas: {total_rows}")
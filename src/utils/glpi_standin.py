@@ -0,0 +1,240 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event
+from src.utils.database import set_db_engine, get_pool_stats, reset_pool_stats
+
+# Banco local (SQLite) que imita as tabelas do GLPI usadas pela extração.
+# Permite rodar e medir src.data.extract / src.utils.database sem o MySQL do GLPI.
+STANDIN_DB_PATH = 'data/standin/glpi_standin.db'
+
+# Subconjunto do schema do GLPI lido pela consulta de extração (mesmos nomes e tipos lógicos)
+STANDIN_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS glpi_itilcategories (
+        id INTEGER PRIMARY KEY,
+        entities_id INTEGER NOT NULL DEFAULT 0,
+        itilcategories_id INTEGER NOT NULL DEFAULT 0, -- Categoria pai
+        name VARCHAR(255),
+        completename TEXT,
+        level INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS glpi_tickets (
+        id INTEGER PRIMARY KEY,
+        entities_id INTEGER NOT NULL DEFAULT 0,
+        name VARCHAR(255),
+        date DATETIME,
+        closedate DATETIME,
+        solvedate DATETIME,
+        date_mod DATETIME,
+        status INTEGER NOT NULL DEFAULT 1,
+        priority INTEGER NOT NULL DEFAULT 1,
+        itilcategories_id INTEGER NOT NULL DEFAULT 0,
+        time_to_resolve DATETIME,
+        is_deleted INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tickets_date ON glpi_tickets (date)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_date_mod ON glpi_tickets (date_mod, id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_category ON glpi_tickets (itilcategories_id)",
+]
+
+TICKET_TABLE_COLUMNS = [
+    'id', 'entities_id', 'name', 'date', 'closedate', 'solvedate', 'date_mod',
+    'status', 'priority', 'itilcategories_id', 'time_to_resolve',
+]
+
+# TIMESTAMPDIFF(HOUR, a, b) do MySQL -> diferença em horas inteiras (truncada) no SQLite
+_TIMESTAMPDIFF_HOUR = re.compile(r"TIMESTAMPDIFF\(\s*HOUR\s*,\s*([\w.]+)\s*,\s*([\w.]+)\s*\)", re.IGNORECASE)
+
+def translate_mysql_to_sqlite(statement: str) -> str:
+    """Traduz as poucas construções MySQL das consultas de extração que o SQLite não entende."""
+    return _TIMESTAMPDIFF_HOUR.sub(
+        r"((CAST(strftime('%s', \2) AS INTEGER) - CAST(strftime('%s', \1) AS INTEGER)) / 3600)",
+        statement,
+    )
+
+def _sqlite_regexp(pattern: str, value) -> Optional[bool]:
+    if value is None:
+        return None
+    return re.search(pattern, str(value)) is not None
+
+def create_standin_engine(path: str = STANDIN_DB_PATH, pool_size: int = 5):
+    """
+    Cria o engine SQLAlchemy do stand-in: SQLite em arquivo, com pool de conexões,
+    função REGEXP e tradução do TIMESTAMPDIFF aplicadas a cada consulta.
+    """
+    engine = create_engine(
+        f"sqlite:///{path}",
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        connect_args={'check_same_thread': False, 'timeout': 30},
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function('REGEXP', 2, _sqlite_regexp, deterministic=True)
+
+    @event.listens_for(engine, 'before_cursor_execute', retval=True)
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        return translate_mysql_to_sqlite(statement), parameters
+
+    return engine
+
+def create_standin_database(path: str = STANDIN_DB_PATH, overwrite: bool = False) -> str:
+    """Cria (ou recria) o arquivo SQLite com o schema do GLPI. Retorna o caminho."""
+    if overwrite and os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with sqlite3.connect(path) as conn:
+        for ddl in STANDIN_SCHEMA_SQL:
+            conn.execute(ddl)
+    return path
+
+def install_standin(path: str = STANDIN_DB_PATH, pool_size: int = 5):
+    """Faz o src.utils.database (e portanto o src.data.extract) usar o stand-in local."""
+    engine = create_standin_engine(path, pool_size=pool_size)
+    set_db_engine(engine)
+    return engine
+
+def build_category_tree(completenames: Iterable[str]) -> pd.DataFrame:
+    """
+    Monta a árvore de categorias (glpi_itilcategories) a partir dos 'completename' no
+    formato do GLPI ('Pai > Filho'), criando os ancestrais que faltarem.
+    Os ids são determinísticos para a mesma lista de entrada.
+    """
+    rows = {}
+    for completename in completenames:
+        parts = [p.strip() for p in completename.split('>')]
+        for level in range(1, len(parts) + 1):
+            name = ' > '.join(parts[:level])
+            if name not in rows:
+                parent = ' > '.join(parts[:level - 1]) if level > 1 else None
+                rows[name] = {
+                    'id': len(rows) + 1,
+                    'itilcategories_id': rows[parent]['id'] if parent else 0,
+                    'name': parts[level - 1],
+                    'completename': name,
+                    'level': level,
+                }
+
+    return pd.DataFrame(list(rows.values()))
+
+def insert_categories(completenames: Iterable[str], path: str = STANDIN_DB_PATH) -> pd.DataFrame:
+    """
+    Insere a árvore de categorias (ver build_category_tree) no stand-in.
+    Retorna o DataFrame de categorias (id, completename).
+    """
+    df_categories = build_category_tree(completenames)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM glpi_itilcategories")
+        conn.executemany(
+            "INSERT INTO glpi_itilcategories (id, itilcategories_id, name, completename, level) VALUES (?, ?, ?, ?, ?)",
+            df_categories[['id', 'itilcategories_id', 'name', 'completename', 'level']].itertuples(index=False, name=None),
+        )
+    return df_categories[['id', 'completename']]
+
+def _to_sql_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return value
+
+def insert_tickets(df_tickets: pd.DataFrame, path: str = STANDIN_DB_PATH, replace: bool = True) -> int:
+    """
+    Grava tickets no formato da tabela glpi_tickets (colunas em TICKET_TABLE_COLUMNS).
+    Com replace=True, tickets com o mesmo id são substituídos (simula alterações no GLPI).
+    """
+    df = df_tickets.reindex(columns=TICKET_TABLE_COLUMNS)
+    verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+    placeholders = ', '.join('?' for _ in TICKET_TABLE_COLUMNS)
+    sql = f"{verb} INTO glpi_tickets ({', '.join(TICKET_TABLE_COLUMNS)}) VALUES ({placeholders})"
+    rows = ([_to_sql_value(v) for v in row] for row in df.itertuples(index=False, name=None))
+    with sqlite3.connect(path) as conn:
+        conn.executemany(sql, rows)
+    return len(df)
+
+def seed_standin(path: str = STANDIN_DB_PATH, n_tickets: int = 10000, months_history: int = 12, seed: int = 42) -> int:
+    """
+    Recria o stand-in e o popula com tickets sintéticos (src.data.synthetic) cobrindo
+    os últimos 'months_history' meses.
+    """
+    from src.data.synthetic import write_synthetic_standin
+    return write_synthetic_standin(n_tickets, path, days=30 * months_history, seed=seed)
+
+def _timed(label: str, func, results: List[dict]):
+    reset_pool_stats()
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    stats = get_pool_stats()
+    rows = len(value) if hasattr(value, '__len__') else value
+    results.append({'mode': label, 'seconds': round(elapsed, 3), 'rows': rows,
+                    'checkouts': stats['checkouts'], 'wait_seconds_total': round(stats['wait_seconds_total'], 4)})
+    return value
+
+def run_extraction_benchmark(path: str = STANDIN_DB_PATH, months_history: int = 12) -> pd.DataFrame:
+    """
+    Executa os modos de extração (completo, fatiado em paralelo, streaming, incremental e
+    push-down) contra o stand-in e retorna tempo, linhas e uso do pool de cada um.
+    """
+    from src.data.extract import (
+        get_glpi_tickets, stream_glpi_tickets, extract_incremental, get_glpi_daily_aggregates,
+    )
+    from src.data.raw_store import write_raw_tickets
+
+    install_standin(path)
+    work_dir = tempfile.mkdtemp(prefix='glpi_bench_')
+    store_path = os.path.join(work_dir, 'glpi_tickets')
+    watermark_path = os.path.join(work_dir, 'watermark.json')
+    pending_path = os.path.join(work_dir, 'pending_fact_dates.json') # Não toca as pendências reais do projeto
+    results = []
+    try:
+        _timed('full', lambda: get_glpi_tickets(months_history)[0], results)
+        _timed('sliced_month', lambda: get_glpi_tickets(months_history, slice_by='month')[0], results)
+        _timed('sliced_week', lambda: get_glpi_tickets(months_history, slice_by='week')[0], results)
+        _timed('streaming_to_store', lambda: write_raw_tickets(stream_glpi_tickets(months_history)[0], store_path), results)
+        _timed('incremental_initial', lambda: extract_incremental(months_history, store_path, watermark_path, pending_path), results)
+
+        # Simula um dia de alterações: 1% dos tickets recebe solvedate/date_mod novos
+        with sqlite3.connect(path) as conn:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            conn.execute("UPDATE glpi_tickets SET solvedate = ?, date_mod = ? WHERE id % 100 = 0", (now, now))
+        _timed('incremental_delta', lambda: extract_incremental(months_history, store_path, watermark_path, pending_path), results)
+        _timed('incremental_noop', lambda: extract_incremental(months_history, store_path, watermark_path, pending_path), results)
+        _timed('pushdown_aggregates', lambda: get_glpi_daily_aggregates(months_history)[0], results)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stand-in local do GLPI (SQLite) para testes e benchmarks da extração.")
+    parser.add_argument('--path', default=STANDIN_DB_PATH)
+    parser.add_argument('--tickets', type=int, default=10000, help="Quantidade de tickets aleatórios a gerar.")
+    parser.add_argument('--bench', action='store_true', help="Executa o benchmark dos modos de extração após popular.")
+    args = parser.parse_args()
+
+    total = seed_standin(args.path, n_tickets=args.tickets)
+    print(f"Stand-in criado em {args.path} com {total} tickets.")
+
+    if args.bench:
+        df_bench = run_extraction_benchmark(args.path)
+        print("\n--- BENCHMARK DE EXTRAÇÃO (STAND-IN) ---")
+        print(df_bench.to_string(index=False))
@@ -0,0 +1,65 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from src.data.duckdb_engine import process_data_duckdb
+from src.data.raw_store import read_raw_tickets, write_raw_tickets
+from src.data.schema import apply_fact_schema
+from src.data.synthetic import generate_tickets
+from src.data.transform import CATEGORY_MAPPING, FACT_KEYS, TRANSFORM_COLUMNS, TTR_GLOBAL_KEY, process_data
+
+# Paridade pandas x DuckDB sobre o mesmo dataset bruto (Parquet) gerado pelo src.data.synthetic
+
+@pytest.fixture(scope="module")
+def raw_path(tmp_path_factory):
+    """Dataset bruto pequeno com tickets sem entidade e tickets sem TTR."""
+    df = pd.concat(generate_tickets(3000, days=60, n_entities=8, seed=7,
+                                    end_date=datetime(2025, 6, 1)), ignore_index=True)
+    rng = np.random.default_rng(7)
+
+    # ~5% dos tickets sem entidade (fora da tabela fato, mas dentro da mediana de TTR)
+    df.loc[rng.random(len(df)) < 0.05, 'entities_id'] = np.nan
+
+    # ~15% sem TTR: sem time_to_resolve e sem hours_to_solve -> ttr_hours nulo (imputado pela mediana)
+    no_ttr = rng.random(len(df)) < 0.15
+    df.loc[no_ttr, ['time_to_resolve', 'hours_to_solve']] = np.nan
+
+    # Um dia/entidade inteiro sem TTR: a média do grupo é a própria mediana imputada
+    first_day = df['opened_at'].dt.normalize() == df['opened_at'].dt.normalize().min()
+    df.loc[first_day, ['time_to_resolve', 'hours_to_solve']] = np.nan
+
+    path = str(tmp_path_factory.mktemp("raw") / "glpi_tickets")
+    write_raw_tickets(df, path)
+    return path
+
+def _sorted_fact(df_fact: pd.DataFrame) -> pd.DataFrame:
+    df_fact = apply_fact_schema(df_fact.copy())
+    return df_fact.sort_values(FACT_KEYS, kind='mergesort').reset_index(drop=True)
+
+def test_store_covers_null_entities_and_null_ttr(raw_path):
+    df_raw = read_raw_tickets(raw_path, columns=TRANSFORM_COLUMNS)
+    ttr_missing = df_raw['time_to_resolve'].isna() & df_raw['hours_to_solve'].isna()
+    assert df_raw['entities_id'].isna().any()
+    assert ttr_missing.any()
+
+def test_fact_table_parity(raw_path):
+    sketches_pandas, sketches_duckdb = {}, {}
+    df_raw = read_raw_tickets(raw_path, columns=TRANSFORM_COLUMNS)
+    df_pandas = process_data(df_raw, CATEGORY_MAPPING, ttr_sketches=sketches_pandas)
+    df_duckdb = process_data_duckdb(raw_path, CATEGORY_MAPPING, ttr_sketches=sketches_duckdb)
+
+    # Tickets sem entidade não entram na tabela fato em nenhum dos backends
+    assert df_pandas['entities_id'].notna().all()
+    assert len(df_pandas) > 0
+
+    pd.testing.assert_frame_equal(_sorted_fact(df_pandas), _sorted_fact(df_duckdb))
+
+    # Mesma mediana de imputação (inclui os tickets sem entidade) e mesmos KPIs por categoria
+    assert sketches_pandas[TTR_GLOBAL_KEY].median() == sketches_duckdb[TTR_GLOBAL_KEY].median()
+    assert sketches_pandas.keys() == sketches_duckdb.keys()
+    for key, digest in sketches_pandas.items():
+        assert digest.count == pytest.approx(sketches_duckdb[key].count)
+        assert digest.quantile(0.9) == pytest.approx(sketches_duckdb[key].quantile(0.9))